@@ -0,0 +1,215 @@
+import os
+import io
+import json
+import tarfile
+import argparse
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from .IO import ReadWavInfo, ToFloat
+
+##############################################################################################################################
+
+# Index written next to the shards: {Prefix}_Index.json
+IndexSuffix = '_Index.json'
+
+##############################################################################################################################
+
+class ShardWriter:
+    '''
+    Pack many small files (the clips of the slicer) into tar shards of bounded size instead of one file each,
+    with a JSON index of where every member's data starts so that readers can seek to it or go through the shards in order
+    '''
+    def __init__(self, OutputDir: str, Prefix: str = 'Clips', MaxSize: float = 1024.):
+        self.OutputDir = OutputDir
+        self.Prefix = Prefix
+        self.MaxBytes = int(MaxSize * 1024 ** 2)
+        self.Shards = []
+        self.Members = []
+        self.Names = set()
+        self.Tar = None
+        self.Lock = threading.Lock()
+        os.makedirs(OutputDir, exist_ok = True)
+
+    @property
+    def IndexPath(self):
+        return Path(self.OutputDir).joinpath(self.Prefix + IndexSuffix).as_posix()
+
+    def closeShard(self):
+        '''
+        Finish the current shard and get it onto the disk
+        '''
+        if self.Tar is None:
+            return
+        self.Tar.close() # Leaves the file it was given open
+        self.Tar.fileobj.flush()
+        os.fsync(self.Tar.fileobj.fileno())
+        self.Tar.fileobj.close()
+        self.Tar = None
+
+    def openShard(self):
+        self.closeShard()
+        Name = f"{self.Prefix}_{len(self.Shards):05d}.tar"
+        self.Tar = tarfile.open(fileobj = open(Path(self.OutputDir).joinpath(Name), mode = 'wb'), mode = 'w', format = tarfile.PAX_FORMAT)
+        self.Shards.append(Name)
+
+    def add(self, Name: str, *Parts):
+        '''
+        Add a member made of the given byte strings (or buffers), returns its name in the archive
+        '''
+        Size = sum(memoryview(Part).nbytes for Part in Parts)
+        with self.Lock:
+            if Name in self.Names:
+                raise Exception(f"{Name} is already in the archive")
+            if self.Tar is None or (self.Tar.offset > 0 and self.Tar.offset + Size > self.MaxBytes):
+                self.openShard()
+            Info = tarfile.TarInfo(Name)
+            Info.size = Size
+            Start = self.Tar.offset
+            self.Tar.addfile(Info, io.BytesIO(b''.join(Parts)))
+            self.Members.append({'Name': Name, 'Shard': len(self.Shards) - 1, 'Offset': Start + len(Info.tobuf(self.Tar.format, self.Tar.encoding, self.Tar.errors)), 'Size': Size})
+            self.Names.add(Name)
+        return Name
+
+    def remove(self, Names: list):
+        '''
+        Drop members from the index (their bytes stay in the shards), for the clips of a file that failed half way
+        '''
+        with self.Lock:
+            Names = set(Names) & self.Names
+            self.Members = [Member for Member in self.Members if Member['Name'] not in Names]
+            self.Names -= Names
+
+    def addFile(self, FilePath: str, Name: Optional[str] = None):
+        with open(FilePath, mode = 'rb') as File:
+            return self.add(Name or Path(FilePath).name, File.read())
+
+    def close(self):
+        '''
+        Finish the last shard and write the index, both synced to the disk before returning
+        '''
+        with self.Lock:
+            self.closeShard()
+            with open(self.IndexPath, mode = 'w', encoding = 'utf-8') as File:
+                json.dump({'Shards': self.Shards, 'Members': self.Members}, File, ensure_ascii = False)
+                File.flush()
+                os.fsync(File.fileno())
+        return self.IndexPath
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ShardReader:
+    '''
+    Read the members of tar shards through their index, one at a time by name or all of them in storage order
+    '''
+    def __init__(self, IndexPath: str):
+        self.IndexPath = IndexPath
+        self.Dir = Path(IndexPath).parent.as_posix()
+        with open(IndexPath, mode = 'r', encoding = 'utf-8') as File:
+            Index = json.load(File)
+        self.Shards = [Path(self.Dir).joinpath(Shard).as_posix() for Shard in Index['Shards']]
+        self.Members = {Member['Name']: Member for Member in Index['Members']}
+
+    def names(self):
+        return list(self.Members.keys())
+
+    def read(self, Name: str):
+        Member = self.Members[Name]
+        with open(self.Shards[Member['Shard']], mode = 'rb') as File:
+            File.seek(Member['Offset'])
+            return File.read(Member['Size'])
+
+    def readAudio(self, Name: str):
+        '''
+        Return a WAV member as float32 (frames, channels) and its sample rate, mapped from the shard without extracting it
+        '''
+        Member = self.Members[Name]
+        ShardPath = self.Shards[Member['Shard']]
+        Info = ReadWavInfo(ShardPath, Member['Offset'], Member['Size'])
+        if Info['Frames'] == 0:
+            return np.zeros((0, Info['Channels']), dtype = np.float32), Info['SampleRate']
+        DType = {'PCM_U8': 'u1', 'PCM_16': '<i2', 'PCM_24': 'u1', 'PCM_32': '<i4', 'FLOAT': '<f4', 'DOUBLE': '<f8'}[Info['Subtype']]
+        Shape = (Info['Frames'], Info['Channels'], 3) if Info['Subtype'] == 'PCM_24' else (Info['Frames'], Info['Channels'])
+        return ToFloat(np.memmap(ShardPath, dtype = DType, mode = 'r', offset = Info['DataOffset'], shape = Shape), Info['Subtype']), Info['SampleRate']
+
+    def __iter__(self):
+        '''
+        Go through the members shard by shard in the order they were written, reading every shard sequentially
+        '''
+        for ShardIndex, ShardPath in enumerate(self.Shards):
+            with open(ShardPath, mode = 'rb') as File:
+                for Member in sorted((Member for Member in self.Members.values() if Member['Shard'] == ShardIndex), key = lambda Member: Member['Offset']):
+                    File.seek(Member['Offset'])
+                    yield Member['Name'], File.read(Member['Size'])
+
+    def extract(self, OutputDir: str, Names: Optional[list] = None):
+        '''
+        Write members out as plain files for the tools that only take a dir
+        '''
+        Wanted = set(self.Members.keys() if Names is None else Names)
+        OutputPaths = []
+        for Name, Data in self:
+            if Name in Wanted:
+                OutputPath = Path(OutputDir).joinpath(Name)
+                os.makedirs(OutputPath.parent, exist_ok = True)
+                OutputPath.write_bytes(Data)
+                OutputPaths.append(OutputPath.as_posix())
+        return OutputPaths
+
+
+def FindIndexes(Dir: str):
+    return sorted(IndexPath.as_posix() for IndexPath in Path(Dir).glob('*' + IndexSuffix))
+
+
+def PackDir(InputDir: str, OutputDir: str, Prefix: str = 'Clips', MaxSize: float = 1024., Remove: bool = False):
+    '''
+    Pack the files of a dir into shards, named by their paths relative to it, and optionally remove the packed files
+    once every shard and the index are on disk, so that an interrupted pack loses nothing
+    '''
+    Files = sorted(File for File in Path(InputDir).rglob('*') if File.is_file() and not File.name.endswith(IndexSuffix) and File.suffix != '.tar')
+    with ShardWriter(OutputDir, Prefix, MaxSize) as Writer:
+        for File in Files:
+            Writer.addFile(File.as_posix(), File.relative_to(InputDir).as_posix())
+    for File in Files:
+        File.unlink() if Remove else None
+    return Writer.IndexPath
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Archive", description = "Pack clips into tar shards with an index, or read them back")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    parser_pack = subparsers.add_parser("pack", help = "pack the files of a dir into shards")
+    parser_pack.add_argument("input",        help = "dir of the files to pack")
+    parser_pack.add_argument("--output",     help = "dir to write the shards to", required = True)
+    parser_pack.add_argument("--prefix",     help = "name of the shards and their index", default = 'Clips')
+    parser_pack.add_argument("--shard-size", help = "largest shard in MB", type = float, default = 1024.)
+    parser_pack.add_argument("--remove",     help = "remove the files once packed", action = "store_true")
+
+    parser_list = subparsers.add_parser("list", help = "list the members of shards")
+    parser_list.add_argument("index",        help = "index of the shards")
+
+    parser_unpack = subparsers.add_parser("unpack", help = "write the members of shards out as files")
+    parser_unpack.add_argument("index",      help = "index of the shards")
+    parser_unpack.add_argument("--output",   help = "dir to write the files to", required = True)
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        print(PackDir(args.input, args.output, args.prefix, args.shard_size, args.remove), flush = True)
+    if args.command == "list":
+        Reader = ShardReader(args.index)
+        for Member in Reader.Members.values():
+            print(f"{Member['Shard']:>5} {Member['Offset']:>12} {Member['Size']:>10}  {Member['Name']}", flush = True)
+        print(f"{len(Reader.Members)} member(s) in {len(Reader.Shards)} shard(s)", flush = True)
+    if args.command == "unpack":
+        print(f"{len(ShardReader(args.index).extract(args.output))} file(s) written", flush = True)
+
+##############################################################################################################################
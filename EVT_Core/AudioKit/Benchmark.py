@@ -0,0 +1,368 @@
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from .Slicer import Slicer, getRMS
+
+##############################################################################################################################
+
+def SynthSpeech(Minutes: float, SampleRate: int = 16000, Seed: int = 0):
+    '''
+    Speech-like test audio: syllable bursts with short gaps, longer pauses between phrases and a low noise floor
+    '''
+    Rng = np.random.default_rng(Seed)
+    Length = int(Minutes * 60 * SampleRate)
+    Gain = np.zeros(Length, dtype = np.float32)
+    Pos = 0
+    while Pos < Length:
+        for _ in range(Rng.integers(3, 15)):
+            Voiced = int(SampleRate * Rng.uniform(0.08, 0.3))
+            Gain[Pos : Pos + Voiced] = Rng.uniform(0.05, 0.4)
+            Pos += Voiced + int(SampleRate * Rng.uniform(0.02, 0.15))
+        Pos += int(SampleRate * Rng.uniform(0.3, 2.))
+    Audio = Rng.standard_normal(Length, dtype = np.float32) * (Gain + 0.003)
+    return Audio
+
+
+def SynthNoisy(Minutes: float, SampleRate: int = 44100, NoiseLevel: float = 0.02, Seed: int = 0):
+    '''
+    Voiced test audio (harmonics under the syllable envelope of SynthSpeech) with white noise on top,
+    returns the clean and the noisy audio
+    '''
+    Rng = np.random.default_rng(Seed)
+    Envelope = np.abs(SynthSpeech(Minutes, SampleRate, Seed))
+    Envelope = np.convolve(Envelope, np.ones(256, dtype = np.float32) / 256, mode = 'same') * 4
+    Time = np.arange(len(Envelope), dtype = np.float32) / SampleRate
+    Pitch = 2 * np.pi * np.cumsum(120 + 40 * np.sin(2 * np.pi * 0.5 * Time)) / SampleRate
+    Clean = (sum(np.sin(Pitch * Harmonic) / Harmonic for Harmonic in range(1, 8)) * np.clip(Envelope, 0, 1) * 0.3).astype(np.float32)
+    return Clean, Clean + Rng.standard_normal(len(Clean), dtype = np.float32) * NoiseLevel
+
+
+def SNR(Clean: np.ndarray, Audio: np.ndarray):
+    return 10 * np.log10(np.sum(Clean.astype(np.float64) ** 2) / max(np.sum((Audio - Clean).astype(np.float64) ** 2), 1e-20))
+
+
+def Profiled(Function: object, *Args):
+    '''
+    Return the result of a call, its time and the peak of the memory it allocated (numpy arrays included)
+    '''
+    tracemalloc.start()
+    Start = time.perf_counter()
+    Result = Function(*Args)
+    Elapsed = time.perf_counter() - Start
+    Peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return Result, Elapsed, Peak
+
+
+def Timed(Function: object, *Args, Repeat: int = 3):
+    '''
+    Return the result of a call and its best time over a few runs
+    '''
+    Best = None
+    for _ in range(Repeat):
+        Start = time.perf_counter()
+        Result = Function(*Args)
+        Elapsed = time.perf_counter() - Start
+        Best = Elapsed if Best is None else min(Best, Elapsed)
+    return Result, Best
+
+##############################################################################################################################
+
+# Tools: Slicer
+
+def LoopRMS(Samples: np.ndarray, WinSize: int, HopSize: int):
+    '''
+    Frame RMS as the slicer did it before: every frame is copied out and squared on its own
+    '''
+    Padded = np.pad(Samples, (WinSize // 2, WinSize // 2), mode = 'constant')
+    Count = (len(Padded) - WinSize) // HopSize + 1
+    RMS = np.empty(Count, dtype = np.float32)
+    for Start in range(0, Count, 4096):
+        Stop = min(Start + 4096, Count)
+        Frames = np.lib.stride_tricks.as_strided(
+            Padded[Start * HopSize:],
+            shape = (Stop - Start, WinSize),
+            strides = (Padded.strides[0] * HopSize, Padded.strides[0]),
+            writeable = False
+        )
+        RMS[Start:Stop] = np.sqrt(np.mean(np.square(Frames), axis = 1))
+    return RMS
+
+
+def LoopTags(SlicerItem: Slicer, RMSList: np.ndarray):
+    '''
+    Silence scan as the slicer did it before: one Python step per frame
+    '''
+    ArgMin = lambda Begin, End: int(RMSList[Begin : End + 1].argmin()) + Begin
+    Tags = []
+    SilenceStart = None
+    ClipStart = 0
+    for Index, RMS in enumerate(RMSList):
+        if RMS < SlicerItem.Threshold:
+            SilenceStart = Index if SilenceStart is None else SilenceStart
+            continue
+        if SilenceStart is None:
+            continue
+        Tag = SlicerItem.checkSilence(SilenceStart, Index, ClipStart, ArgMin)
+        if Tag is not None:
+            Tags.append(Tag)
+            ClipStart = Tag[1]
+        SilenceStart = None
+    if SilenceStart is not None:
+        Tag = SlicerItem.getTrailingTag(SilenceStart, RMSList.shape[0], ArgMin)
+        Tags.append(Tag) if Tag is not None else None
+    return Tags
+
+
+def BenchSlicer(Durations: list, SampleRate: int, Params: dict):
+    print(f"{'Minutes':>8} {'Frames':>9} {'Loop RMS':>10} {'Loop scan':>10} {'Vec RMS':>10} {'Vec scan':>10} {'Speedup':>8}  Same", flush = True)
+    for Minutes in Durations:
+        Audio = SynthSpeech(Minutes, SampleRate)
+        SlicerItem = Slicer(SampleRate, **Params)
+        LoopRMSList, LoopRMSTime = Timed(LoopRMS, Audio, SlicerItem.WinSize, SlicerItem.HopSize)
+        LoopTagList, LoopScanTime = Timed(LoopTags, SlicerItem, LoopRMSList)
+        RMSList, RMSTime = Timed(getRMS, Audio, SlicerItem.WinSize, SlicerItem.HopSize)
+        TagList, ScanTime = Timed(SlicerItem.getTags, RMSList)
+        Same = np.array_equal(LoopRMSList, RMSList) and LoopTagList == TagList
+        Speedup = (LoopRMSTime + LoopScanTime) / (RMSTime + ScanTime)
+        print(
+            f"{Minutes:>8g} {len(RMSList):>9} {LoopRMSTime:>9.3f}s {LoopScanTime:>9.3f}s {RMSTime:>9.3f}s {ScanTime:>9.3f}s {Speedup:>7.1f}x  {Same}",
+            flush = True
+        )
+
+##############################################################################################################################
+
+# Tools: Denoise
+
+def BenchDenoise(Clips: int, Seconds: float, SampleRate: int, ModelPath: Optional[str], Options: dict):
+    '''
+    Real-time factor (processing time over audio time, lower is faster) of the denoise engines on the same clips
+    '''
+    from .Denoise import LoadDenoiser
+    Pairs = [SynthNoisy(Seconds / 60, SampleRate, Seed = Seed) for Seed in range(Clips)]
+    Duration = Clips * Seconds
+    SNRIn = np.mean([SNR(Clean, Noisy) for Clean, Noisy in Pairs])
+    print(f"{Clips} clip(s) of {Seconds:g}s at {SampleRate} Hz, input SNR {SNRIn:.1f} dB", flush = True)
+    print(f"{'Engine':>14} {'Time':>9} {'RTF':>8} {'SNR out':>8}", flush = True)
+    for Engine in ['SpectralGate', 'UVR']:
+        if Engine == 'UVR' and ModelPath is None:
+            print(f"{Engine:>14}  skipped, pass --model to time it", flush = True)
+            continue
+        try:
+            Denoiser = LoadDenoiser(Engine, ModelPath, **(Options if Engine == 'UVR' else {}))
+        except Exception as e:
+            print(f"{Engine:>14}  skipped, {e}", flush = True)
+            continue
+        Denoiser(Pairs[0][1][:SampleRate], SampleRate) # Warm up
+        Start = time.perf_counter()
+        Outputs = [Denoiser(Noisy, SampleRate) for _, Noisy in Pairs]
+        Elapsed = time.perf_counter() - Start
+        SNROut = np.mean([SNR(Clean, Output) for (Clean, _), Output in zip(Pairs, Outputs)])
+        print(f"{Engine:>14} {Elapsed:>8.2f}s {Elapsed / Duration:>8.4f} {SNROut:>7.1f}dB", flush = True)
+
+##############################################################################################################################
+
+# Tools: Chain
+
+def StepwiseConvert(InputPath: str, OutputDir: str, SampleRate: int, SliceParams: dict, Normalize: str, Target: float):
+    '''
+    Conversion as separate steps over whole arrays: decode, mix down, resample, slice, normalize and encode one after another
+    '''
+    from .IO import AudioReader, AudioWriter
+    from .Separate import Resample
+    from .Chain import Gain
+    with AudioReader(InputPath) as Reader:
+        Audio, FileRate = Reader.read(0), Reader.SampleRate
+    Audio = Audio.mean(axis = 1, keepdims = True)
+    Audio = Resample(Audio, FileRate, SampleRate)
+    OutputPaths = []
+    for Index, Clip in enumerate(Slicer(SampleRate, **SliceParams).slice(Audio)):
+        Clip = Clip * Gain(Clip, Normalize, Target, SampleRate)
+        OutputPaths.append(Path(OutputDir).joinpath(f"{Path(InputPath).stem}_{Index}.wav").as_posix())
+        with AudioWriter(OutputPaths[-1], SampleRate, 1) as Writer:
+            Writer.write(Clip)
+    return OutputPaths
+
+
+def BenchChain(Durations: list, FileRate: int, SampleRate: int, Normalize: str, Target: float):
+    '''
+    Time and peak memory per file of the fused single-pass chain against the same conversion done step by step
+    '''
+    from .IO import AudioWriter
+    from .Chain import ConvertFile
+    SliceParams = dict(Threshold = -34., Audio_Length_Min = 4000, Silent_Interval_Min = 300, Hop_Size = 10, Silence_Kept_Max = 500)
+    WorkDir = tempfile.mkdtemp(prefix = 'EVT_Bench_')
+    print(f"{FileRate} Hz stereo in, {SampleRate} Hz mono clips out, {Normalize} normalized to {Target:g} dBFS", flush = True)
+    print(f"{'Minutes':>8} {'Stepwise':>10} {'Peak mem':>10} {'Fused':>10} {'Peak mem':>10} {'Clips':>11}", flush = True)
+    try:
+        for Minutes in Durations:
+            InputPath = Path(WorkDir).joinpath(f"Input_{Minutes:g}.wav").as_posix()
+            with AudioWriter(InputPath, FileRate, 2) as Writer:
+                for Start in range(int(np.ceil(Minutes))):
+                    Speech = SynthSpeech(min(1, Minutes - Start), FileRate, Seed = Start)
+                    Writer.write(np.stack([Speech, Speech * 0.8], axis = 1))
+            Before, BeforeTime, BeforePeak = Profiled(StepwiseConvert, InputPath, Path(WorkDir, 'Stepwise').as_posix(), SampleRate, SliceParams, Normalize, Target)
+            After, AfterTime, AfterPeak = Profiled(
+                lambda: ConvertFile(InputPath, Path(WorkDir, 'Fused').as_posix(), SampleRate, True, '16', 'wav', SliceParams, Normalize, Target)
+            )
+            print(
+                f"{Minutes:>8g} {BeforeTime:>9.2f}s {BeforePeak / 1024 ** 2:>8.1f}MB {AfterTime:>9.2f}s {AfterPeak / 1024 ** 2:>8.1f}MB {len(Before):>5}/{len(After):<5}",
+                flush = True
+            )
+            shutil.rmtree(Path(WorkDir, 'Stepwise'), ignore_errors = True)
+            shutil.rmtree(Path(WorkDir, 'Fused'), ignore_errors = True)
+            Path(InputPath).unlink()
+    finally:
+        shutil.rmtree(WorkDir, ignore_errors = True)
+
+##############################################################################################################################
+
+# Tools: Embeddings
+
+class StandInTDNN:
+    '''
+    NumPy stand-in of a small TDNN speaker model (frame layers with context, statistics pooling, an embedding layer)
+    to time the batching engine when no exported model is given
+    '''
+    def __init__(self, Bins: int, Channels: int = 256, Dim: int = 192, Contexts: list = [5, 3, 1], Seed: int = 0):
+        Rng = np.random.default_rng(Seed)
+        Sizes = [Bins] + [Channels] * len(Contexts)
+        self.Layers = [
+            (Rng.standard_normal((Sizes[Index] * Context, Sizes[Index + 1]), dtype = np.float32) / np.sqrt(Sizes[Index] * Context), Context)
+            for Index, Context in enumerate(Contexts)
+        ]
+        self.Output = Rng.standard_normal((2 * Channels, Dim), dtype = np.float32) / np.sqrt(2 * Channels)
+
+    def __call__(self, Features: np.ndarray):
+        Hidden = Features
+        for Weight, Context in self.Layers:
+            if Context > 1:
+                Hidden = np.lib.stride_tricks.sliding_window_view(Hidden, Context, axis = 1)
+                Hidden = Hidden.reshape(Hidden.shape[0], Hidden.shape[1], -1)
+            Hidden = np.maximum(Hidden.reshape(-1, Hidden.shape[-1]) @ Weight, 0).reshape(Hidden.shape[0], Hidden.shape[1], -1) # One GEMM for the whole batch
+        return np.concatenate([Hidden.mean(axis = 1), Hidden.std(axis = 1)], axis = 1) @ self.Output
+
+
+def BenchEmbed(Clips: int, MinSeconds: float, MaxSeconds: float, BatchSizes: list, Duration: float, Feature_Method: str, ModelPath: Optional[str], Threads: Optional[int]):
+    '''
+    Throughput (clips per second, features included) of speaker embedding one clip at a time against length-bucketed batches
+    '''
+    from .Embeddings import SampleRate, BatchEmbedder
+    Rng = np.random.default_rng(0)
+    Audio = [SynthSpeech(Rng.uniform(MinSeconds, MaxSeconds) / 60, SampleRate, Seed = Seed) for Seed in range(Clips)]
+    Model = ModelPath or StandInTDNN(80 if Feature_Method.lower() == 'melspectrogram' else 257)
+    print(f"{Clips} clip(s) of {MinSeconds:g}-{MaxSeconds:g}s, {Feature_Method}, cropped at {Duration:g}s, {'model ' + ModelPath if ModelPath else 'NumPy stand-in model'}", flush = True)
+    print(f"{'Batch size':>10} {'Time':>9} {'Clips/s':>9} {'Speedup':>8} {'Max diff':>9}", flush = True)
+    Reference, Baseline = None, None
+    for BatchSize in [1] + [Size for Size in BatchSizes if Size != 1]:
+        Embedder = BatchEmbedder(Model, Feature_Method, Duration, BatchSize, Threads, BucketStep = 0.5)
+        if BatchSize == 1:
+            Embedder.Step = 1 # One clip at a time at its own length, as it was done before
+        Embedder.embedClips(Audio[:2]) # Warm up
+        Start = time.perf_counter()
+        Embeddings = Embedder.embedClips(Audio)
+        Elapsed = time.perf_counter() - Start
+        Reference = Embeddings if Reference is None else Reference
+        Baseline = Elapsed if Baseline is None else Baseline
+        Normed = lambda Array: Array / np.linalg.norm(Array, axis = 1, keepdims = True)
+        Difference = float(np.abs((Normed(Embeddings) * Normed(Reference)).sum(axis = 1) - 1).max()) # Cosine lost to bucketing
+        print(f"{BatchSize if BatchSize > 1 else '1 (exact)':>10} {Elapsed:>8.2f}s {Clips / Elapsed:>9.1f} {Baseline / Elapsed:>7.2f}x {Difference:>9.4f}", flush = True)
+
+# Tools: Search
+
+def BenchSearch(References: int, Queries: int, Speakers: int, Dim: int, K: int, ProbesList: list, Spread: float):
+    '''
+    Time and recall of IVF search against exact chunked matrix multiply search on synthetic embeddings of enrolled speakers
+    '''
+    from .Search import ExactIndex, IVFIndex, Recall
+    Rng = np.random.default_rng(0)
+    Centers = Rng.standard_normal((Speakers, Dim), dtype = np.float32)
+    Owners = Rng.integers(0, Speakers, References)
+    Refs = Centers[Owners] + Spread * Rng.standard_normal((References, Dim), dtype = np.float32)
+    Probes = Refs[Rng.integers(0, References, Queries)] + Spread * Rng.standard_normal((Queries, Dim), dtype = np.float32)
+    print(f"{References} reference(s) of {Speakers} speaker(s), {Queries} quer(ies), dim {Dim}, top-{K}", flush = True)
+    Exact = ExactIndex(Refs)
+    Start = time.perf_counter()
+    Exact.search(Probes, K)
+    ExactTime = time.perf_counter() - Start
+    Start = time.perf_counter()
+    Index = IVFIndex(Refs)
+    print(f"{'Exact':>10} {ExactTime:>8.3f}s {1.:>9.4f}    IVF with {Index.Lists} lists built in {time.perf_counter() - Start:.2f}s", flush = True)
+    print(f"{'Probes':>10} {'Time':>9} {'Recall@' + str(K):>9} {'Speedup':>8}", flush = True)
+    for Probes_ in ProbesList:
+        Start = time.perf_counter()
+        Index.search(Probes, K, Probes_)
+        Elapsed = time.perf_counter() - Start
+        print(f"{Probes_:>10} {Elapsed:>8.3f}s {Recall(Index, Probes, K, Exact, Probes = Probes_):>9.4f} {ExactTime / Elapsed:>7.2f}x", flush = True)
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Benchmark", description = "Time the audio engines on synthetic audio")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    parser_slicer = subparsers.add_parser("slicer", help = "frame RMS and silence scan, per-frame loop against vectorized")
+    parser_slicer.add_argument("--minutes",     help = "lengths of audio to time", type = float, nargs = '+', default = [1, 10, 60])
+    parser_slicer.add_argument("--sample-rate", help = "sample rate of the audio", type = int,   default = 16000)
+    parser_slicer.add_argument("--threshold",   help = "RMS threshold in dB",      type = float, default = -34.)
+    parser_slicer.add_argument("--hop-size",    help = "frame length in ms",       type = int,   default = 10)
+    parser_denoise = subparsers.add_parser("denoise", help = "real-time factor of the denoise engines on the same noisy clips")
+    parser_denoise.add_argument("--clips",         help = "number of clips",              type = int,   default = 8)
+    parser_denoise.add_argument("--seconds",       help = "length of every clip",         type = float, default = 30.)
+    parser_denoise.add_argument("--sample-rate",   help = "sample rate of the clips",     type = int,   default = 44100)
+    parser_denoise.add_argument("--model",         help = "UVR model to time against",    default = None)
+    parser_denoise.add_argument("--batch-size",    help = "chunks per forward pass",      type = int,   default = 4)
+    parser_denoise.add_argument("--intra-threads", help = "threads inside an operator",   type = int,   default = None)
+    parser_chain = subparsers.add_parser("chain", help = "time and peak memory of the fused conversion chain against separate steps")
+    parser_chain.add_argument("--minutes",      help = "lengths of the files to convert", type = float, nargs = '+', default = [1, 10, 30])
+    parser_chain.add_argument("--file-rate",    help = "sample rate of the files",        type = int,   default = 44100)
+    parser_chain.add_argument("--sample-rate",  help = "sample rate to convert to",       type = int,   default = 16000)
+    parser_chain.add_argument("--normalize",    help = "normalization of the clips",      choices = ['Peak', 'Loudness'], default = 'Peak')
+    parser_chain.add_argument("--target",       help = "level to normalize to in dBFS",   type = float, default = -1.)
+    parser_embed = subparsers.add_parser("embed", help = "clips per second of speaker embedding at different batch sizes")
+    parser_embed.add_argument("--clips",          help = "number of clips",                    type = int,   default = 256)
+    parser_embed.add_argument("--min-seconds",    help = "shortest clip",                      type = float, default = 1.)
+    parser_embed.add_argument("--max-seconds",    help = "longest clip",                       type = float, default = 8.)
+    parser_embed.add_argument("--batch-sizes",    help = "batch sizes to time",                type = int,   nargs = '+', default = [8, 32, 64])
+    parser_embed.add_argument("--duration",       help = "longest audio per clip in seconds",  type = float, default = 3.)
+    parser_embed.add_argument("--feature-method", help = "feature method of the model",        choices = ['spectrogram', 'melspectrogram'], default = 'melspectrogram')
+    parser_embed.add_argument("--model",          help = "ONNX or TorchScript speaker model to time instead of the stand-in", default = None)
+    parser_embed.add_argument("--threads",        help = "threads of the model",               type = int,   default = None)
+    parser_search = subparsers.add_parser("search", help = "time and recall of IVF search against exact search of speaker embeddings")
+    parser_search.add_argument("--references", help = "number of reference embeddings",     type = int,   default = 100000)
+    parser_search.add_argument("--queries",    help = "number of query embeddings",         type = int,   default = 10000)
+    parser_search.add_argument("--speakers",   help = "speakers the references belong to",  type = int,   default = 2000)
+    parser_search.add_argument("--dim",        help = "size of the embeddings",             type = int,   default = 192)
+    parser_search.add_argument("--top",        help = "references returned per query",      type = int,   default = 10)
+    parser_search.add_argument("--probes",     help = "lists probed per query to time",     type = int,   nargs = '+', default = [1, 4, 8, 16, 32])
+    parser_search.add_argument("--spread",     help = "spread of the embeddings of a speaker", type = float, default = 1.)
+    args = parser.parse_args()
+
+    if args.command == "slicer":
+        BenchSlicer(
+            args.minutes,
+            args.sample_rate,
+            dict(Threshold = args.threshold, Audio_Length_Min = 4000, Silent_Interval_Min = 300, Hop_Size = args.hop_size, Silence_Kept_Max = 500)
+        )
+    if args.command == "denoise":
+        BenchDenoise(
+            args.clips,
+            args.seconds,
+            args.sample_rate,
+            args.model,
+            dict(BatchSize = args.batch_size, IntraThreads = args.intra_threads)
+        )
+    if args.command == "chain":
+        BenchChain(args.minutes, args.file_rate, args.sample_rate, args.normalize, args.target)
+    if args.command == "embed":
+        BenchEmbed(args.clips, args.min_seconds, args.max_seconds, args.batch_sizes, args.duration, args.feature_method, args.model, args.threads)
+    if args.command == "search":
+        BenchSearch(args.references, args.queries, args.speakers, args.dim, args.top, args.probes, args.spread)
+
+##############################################################################################################################
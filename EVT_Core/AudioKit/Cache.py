@@ -0,0 +1,206 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from .IO import AudioReader
+from .Separate import Resample
+
+##############################################################################################################################
+
+# Where the cache lives unless told otherwise
+DefaultCacheDir = os.environ.get('EVT_PCM_CACHE_DIR') or Path(tempfile.gettempdir()).joinpath('EVT_PCM_Cache').as_posix()
+
+# Size cap of the cache in GB unless told otherwise
+DefaultCacheSize = float(os.environ.get('EVT_PCM_CACHE_SIZE') or 10.)
+
+# Name of the record of file hashes kept in the cache dir
+HashesName = 'Hashes.jsonl'
+
+##############################################################################################################################
+
+def HashFile(FilePath: str, ChunkSize: int = 1024 * 1024):
+    Hash = hashlib.sha256()
+    with open(FilePath, mode = 'rb') as File:
+        for Chunk in iter(lambda: File.read(ChunkSize), b''):
+            Hash.update(Chunk)
+    return Hash.hexdigest()
+
+
+def DecodeFile(FilePath: str, SampleRate: Optional[int], Channels: Optional[int]):
+    '''
+    Decode a whole file into float32 (frames, channels) at the given sample rate and channel count (None keeps them)
+    '''
+    try:
+        with AudioReader(FilePath) as Reader:
+            Audio, FileRate = Reader.read(0), Reader.SampleRate
+    except Exception:
+        if shutil.which('ffmpeg') is None:
+            raise
+        from .Decode import Probe, DecodeBlocks # Formats only ffmpeg can read, resampled by ffmpeg on the way
+        Info = Probe(FilePath)
+        FileRate = SampleRate or Info['SampleRate']
+        Audio = np.concatenate(list(DecodeBlocks(FilePath, FileRate, Channels or Info['Channels'])) or [np.zeros((0, Channels or Info['Channels']), dtype = np.float32)])
+    if Channels == 1 and Audio.shape[1] > 1:
+        Audio = Audio.mean(axis = 1, keepdims = True)
+    elif Channels is not None and Audio.shape[1] != Channels:
+        Audio = np.repeat(Audio[:, :1], Channels, axis = 1) if Audio.shape[1] == 1 else Audio[:, :Channels]
+    return Resample(Audio, FileRate, SampleRate) if SampleRate is not None else Audio
+
+
+class FileHashes:
+    '''
+    Hashes of files remembered by path, size and modification time in an append-only record,
+    so that a file is only read again once it changed
+    '''
+    def __init__(self, RecordPath: str):
+        self.RecordPath = RecordPath
+        self.Hashes = {}
+        self.Lock = threading.Lock()
+        if not Path(RecordPath).exists():
+            return
+        with open(RecordPath, mode = 'r', encoding = 'utf-8') as File:
+            for Line in File:
+                try:
+                    Entry = json.loads(Line)
+                except ValueError:
+                    continue
+                self.Hashes[(Entry['Path'], Entry['Size'], Entry['MTime'])] = Entry['Hash']
+
+    def get(self, FilePath: str):
+        Stat = os.stat(FilePath)
+        Key = (Path(FilePath).resolve().as_posix(), Stat.st_size, Stat.st_mtime_ns)
+        if Key not in self.Hashes:
+            self.Hashes[Key] = HashFile(FilePath)
+            with self.Lock, open(self.RecordPath, mode = 'a', encoding = 'utf-8') as File:
+                File.write(json.dumps({'Path': Key[0], 'Size': Key[1], 'MTime': Key[2], 'Hash': self.Hashes[Key]}) + '\n')
+        return self.Hashes[Key]
+
+
+class PCMCache:
+    '''
+    Content-addressed cache of decoded audio shared by the tools: every entry is a .npy file keyed by the hash of the source file,
+    the sample rate and the channel count, so that later stages map it without copying instead of decoding it again.
+    The least recently used entries are dropped once the cache grows past its size cap
+    '''
+    def __init__(self, CacheDir: Optional[str] = None, MaxSize: Optional[float] = None):
+        self.CacheDir = CacheDir or DefaultCacheDir
+        self.MaxBytes = int((MaxSize if MaxSize is not None else DefaultCacheSize) * 1024 ** 3)
+        self.Hits = 0
+        self.Misses = 0
+        os.makedirs(self.CacheDir, exist_ok = True)
+        self.Hashes = FileHashes(Path(self.CacheDir).joinpath(HashesName).as_posix())
+
+    def getEntryPath(self, FilePath: str, SampleRate: Optional[int], Channels: Optional[int], DType: str):
+        Name = f"{self.Hashes.get(FilePath)}_{SampleRate or 'src'}_{Channels or 'src'}_{DType}.npy"
+        return Path(self.CacheDir).joinpath(Name[:2], Name).as_posix()
+
+    def get(self, FilePath: str, SampleRate: Optional[int] = None, Channels: Optional[int] = None, DType: str = 'float32'):
+        '''
+        Return the audio of a file as a read-only memory map of shape (frames, channels), decoding it only on a miss.
+        int16 entries take half the space, scale them by 1 / 32768 to get floats
+        '''
+        EntryPath = self.getEntryPath(FilePath, SampleRate, Channels, DType)
+        if Path(EntryPath).exists():
+            try:
+                Audio = np.load(EntryPath, mmap_mode = 'r')
+                os.utime(EntryPath) # Mark as recently used
+                self.Hits += 1
+                return Audio
+            except (ValueError, OSError):
+                Path(EntryPath).unlink(missing_ok = True) # Cut off by a crash
+        self.Misses += 1
+        Audio = DecodeFile(FilePath, SampleRate, Channels)
+        if DType == 'int16':
+            Audio = np.clip(np.round(Audio * 32768), -32768, 32767).astype(np.int16)
+        else:
+            Audio = Audio.astype(np.float32, copy = False)
+        self.put(EntryPath, Audio)
+        return np.load(EntryPath, mmap_mode = 'r')
+
+    def put(self, EntryPath: str, Audio: np.ndarray):
+        '''
+        Write an entry under a temporary name and move it in place, so that readers never see half of it
+        '''
+        os.makedirs(Path(EntryPath).parent, exist_ok = True)
+        TempPath = f"{EntryPath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(TempPath, mode = 'wb') as File:
+            np.save(File, Audio)
+        os.replace(TempPath, EntryPath)
+        self.evict(Keep = EntryPath)
+
+    def entries(self):
+        return [Entry for Entry in Path(self.CacheDir).glob('*/*.npy')]
+
+    def evict(self, Keep: Optional[str] = None):
+        '''
+        Drop the least recently used entries until the cache fits its size cap
+        '''
+        Entries = []
+        for Entry in self.entries():
+            try:
+                Stat = Entry.stat()
+            except FileNotFoundError:
+                continue # Dropped by another process
+            Entries.append((Stat.st_mtime_ns, Stat.st_size, Entry))
+        Total = sum(Size for _, Size, _ in Entries)
+        Removed = 0
+        for _, Size, Entry in sorted(Entries, key = lambda Item: Item[0]):
+            if Total <= self.MaxBytes:
+                break
+            if Keep is not None and Entry.as_posix() == Path(Keep).as_posix():
+                continue
+            Entry.unlink(missing_ok = True) # Maps already open stay valid
+            Total -= Size
+            Removed += 1
+        return Removed
+
+    def stats(self):
+        Sizes = [Entry.stat().st_size for Entry in self.entries()]
+        return {'Entries': len(Sizes), 'Bytes': sum(Sizes), 'MaxBytes': self.MaxBytes, 'Hits': self.Hits, 'Misses': self.Misses}
+
+    def clear(self):
+        shutil.rmtree(self.CacheDir, ignore_errors = True)
+        os.makedirs(self.CacheDir, exist_ok = True)
+        self.Hashes = FileHashes(self.Hashes.RecordPath)
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Cache", description = "Manage the shared cache of decoded audio")
+    parser.add_argument("--cache", help = "dir of the cache", default = None)
+    parser.add_argument("--size",  help = "size cap of the cache in GB", type = float, default = None)
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    parser_warm = subparsers.add_parser("warm", help = "decode audio files into the cache ahead of the stages that read them")
+    parser_warm.add_argument("inputs",        nargs = '+', help = "audio files or dirs of them")
+    parser_warm.add_argument("--sample-rate", help = "sample rate to store at", type = int, default = None)
+    parser_warm.add_argument("--mono",        help = "store a mono mix", action = "store_true")
+    parser_warm.add_argument("--int16",       help = "store 16-bit integers instead of floats", action = "store_true")
+
+    subparsers.add_parser("stats", help = "show the size of the cache")
+    subparsers.add_parser("clear", help = "empty the cache")
+    args = parser.parse_args()
+
+    Cache = PCMCache(args.cache, args.size)
+    if args.command == "warm":
+        Files = []
+        for Input in args.inputs:
+            Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.is_file()) if Path(Input).is_dir() else [Input])
+        for FilePath in Files:
+            try:
+                Audio = Cache.get(FilePath, args.sample_rate, 1 if args.mono else None, 'int16' if args.int16 else 'float32')
+                print(f"{FilePath}: {Audio.shape[0]} frame(s)", flush = True)
+            except Exception as e:
+                print(f"{FilePath}: {e}", flush = True)
+    if args.command == "clear":
+        Cache.clear()
+    print(json.dumps(Cache.stats()), flush = True)
+
+##############################################################################################################################
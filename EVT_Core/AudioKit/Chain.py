@@ -0,0 +1,247 @@
+import os
+import math
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .IO import AudioReader, OutputStems
+from .Decode import SampleWidths, Probe, DecodeBlocks, StreamClipper
+
+##############################################################################################################################
+
+class Resampler:
+    '''
+    Streaming polyphase resampler: a windowed-sinc low-pass filter is split into one short filter per output phase,
+    so that every output sample costs Taps multiply-adds and no upsampled signal is ever built.
+    Blocks of (frames[, channels]) go in and out, the filter delay is taken out so the output lines up with the input
+    '''
+    def __init__(self, FromRate: int, ToRate: int, Taps: int = 32, Rolloff: float = 0.95, Beta: float = 8.):
+        Divisor = math.gcd(FromRate, ToRate)
+        self.Up, self.Down = ToRate // Divisor, FromRate // Divisor
+        self.Taps = Taps + Taps % 2
+        Length = self.Up * self.Taps - 1 # Odd, so that the delay is a whole number of upsampled samples
+        self.Delay = (Length - 1) // 2
+        Cutoff = Rolloff * 0.5 / max(self.Up, self.Down) # In cycles per upsampled sample
+        Time = np.arange(Length) - self.Delay
+        Filter = 2 * Cutoff * np.sinc(2 * Cutoff * Time) * np.kaiser(Length, Beta) * self.Up
+        Filter = np.concatenate([Filter, [0.]])
+        # Phases[p, j] weighs input sample (base - Taps + 1 + j) for outputs of phase p
+        self.Phases = Filter.reshape(self.Taps, self.Up).T[:, ::-1].astype(np.float32).copy()
+        self.Buffer = None
+        self.BufferStart = -(self.Taps - 1)
+        self.Next = 0
+        self.Received = 0
+
+    def run(self, Available: int, Stop: Optional[int] = None):
+        '''
+        Produce every output whose newest input sample is below Available (and whose index is below Stop)
+        '''
+        End = max(self.Next, -(-(Available * self.Up - self.Delay) // self.Down))
+        End = min(End, Stop) if Stop is not None else End
+        if End <= self.Next:
+            return np.zeros((0,) + self.Buffer.shape[1:], dtype = np.float32)
+        Positions = np.arange(self.Next, End, dtype = np.int64) * self.Down + self.Delay
+        Bases, Phases = Positions // self.Up, Positions % self.Up
+        Windows = np.lib.stride_tricks.sliding_window_view(self.Buffer, self.Taps, axis = 0)[Bases - self.Taps + 1 - self.BufferStart]
+        Output = np.einsum('n...t,nt->n...', Windows, self.Phases[Phases], optimize = True).astype(np.float32)
+        self.Next = End
+        Drop = (self.Next * self.Down + self.Delay) // self.Up - self.Taps + 1 - self.BufferStart # Keep what the next output needs
+        if Drop > 0:
+            self.Buffer = self.Buffer[Drop:]
+            self.BufferStart += Drop
+        return Output
+
+    def process(self, Block: np.ndarray):
+        Block = np.asarray(Block, dtype = np.float32)
+        if self.Up == self.Down:
+            return Block
+        if self.Buffer is None:
+            self.Buffer = np.zeros((self.Taps - 1,) + Block.shape[1:], dtype = np.float32)
+        self.Buffer = np.concatenate([self.Buffer, Block])
+        self.Received += len(Block)
+        return self.run(self.BufferStart + len(self.Buffer))
+
+    def flush(self):
+        '''
+        The last outputs, computed against silence after the end of the input
+        '''
+        if self.Up == self.Down or self.Buffer is None:
+            return np.zeros((0,), dtype = np.float32) if self.Buffer is None else self.Buffer[:0]
+        Total = -(-self.Received * self.Up // self.Down)
+        self.Buffer = np.concatenate([self.Buffer, np.zeros((self.Delay // self.Up + self.Taps,) + self.Buffer.shape[1:], dtype = np.float32)])
+        return self.run(self.BufferStart + len(self.Buffer), Total)
+
+##############################################################################################################################
+
+class Meter:
+    '''
+    Level of audio fed block by block, in dBFS: its peak, or for 'Loudness' the mean power of its 400 ms windows
+    above the gate (gated like EBU R128, without the K-weighting)
+    '''
+    def __init__(self, Mode: str, SampleRate: int, Gate: float = -70.):
+        self.Mode = Mode
+        self.Size = max(1, round(0.4 * SampleRate))
+        self.Gate = Gate
+        self.Peak = 0.
+        self.Powers = []
+        self.Carry = np.zeros(0, dtype = np.float32)
+
+    def feed(self, Block: np.ndarray):
+        Block = Block.reshape(len(Block), -1)
+        self.Peak = max(self.Peak, float(np.abs(Block).max())) if len(Block) else self.Peak
+        if self.Mode == 'Peak':
+            return
+        Power = np.concatenate([self.Carry, np.square(Block).mean(axis = 1)])
+        Whole = len(Power) // self.Size * self.Size
+        self.Powers.append(Power[:Whole].reshape(-1, self.Size).mean(axis = 1))
+        self.Carry = Power[Whole:]
+
+    def level(self):
+        if self.Mode == 'Peak':
+            return 20 * np.log10(self.Peak) if self.Peak > 0 else -np.inf
+        Windows = np.concatenate(self.Powers + ([self.Carry.mean(keepdims = True)] if len(self.Carry) else []))
+        Loud = Windows[10 * np.log10(np.maximum(Windows, 1e-20)) > self.Gate]
+        return 10 * np.log10(float(Loud.mean())) if len(Loud) else -np.inf
+
+    def gain(self, Target: float):
+        '''
+        Linear gain that brings the level to the target, kept from clipping when normalizing loudness
+        '''
+        Current = self.level()
+        if not np.isfinite(Current):
+            return 1.
+        Factor = 10 ** ((Target - Current) / 20)
+        return Factor if self.Mode == 'Peak' else min(Factor, 0.999 / self.Peak)
+
+
+def Gain(Audio: np.ndarray, Mode: str, Target: float, SampleRate: int):
+    Measurer = Meter(Mode, SampleRate)
+    Measurer.feed(Audio)
+    return Measurer.gain(Target)
+
+
+def ReadBlocks(InputPath: str, ToMono: bool, BlockSize: int):
+    with AudioReader(InputPath) as Reader:
+        for Block in Reader.blocks(BlockSize):
+            yield Block.mean(axis = 1, keepdims = True) if ToMono and Block.shape[1] > 1 else Block
+
+
+def ConvertFile(
+    InputPath: str,
+    OutputDir: str,
+    SampleRate: Optional[int] = None,
+    ToMono: bool = False,
+    SampleWidth: str = '16',
+    Media_Format_Output: str = 'wav',
+    SliceParams: Optional[dict] = None,
+    Normalize: Optional[str] = None,
+    Target: float = -1.,
+    BlockSize: int = 65536,
+    Archive: Optional[object] = None,
+    Stem: Optional[str] = None
+):
+    '''
+    Convert one file in a single pass over its blocks: decode, mix down, resample, slice, normalize and encode,
+    with nothing but the block at hand and the pending clip in memory.
+    Normalize is 'Peak' or 'Loudness' with Target in dBFS, applied to every clip, or to the whole file when not slicing
+    (which takes one more pass over the file to measure it). Returns the output paths
+    '''
+    Subtype = SampleWidths.get(str(SampleWidth), 'PCM_16')
+    Suffix = '.' + Media_Format_Output.lstrip('.')
+    try:
+        with AudioReader(InputPath) as Reader:
+            FileRate, Channels = Reader.SampleRate, (1 if ToMono else Reader.Channels)
+        Source = lambda: ReadBlocks(InputPath, ToMono, BlockSize)
+    except Exception: # Left to ffmpeg, which mixes down and resamples on the way
+        Info = Probe(InputPath)
+        FileRate, Channels = SampleRate or Info['SampleRate'], (1 if ToMono else Info['Channels'])
+        Source = lambda: DecodeBlocks(InputPath, FileRate, Channels, BlockSize)
+    OutputRate = SampleRate or FileRate
+
+    Scale = 1.
+    if Normalize is not None and SliceParams is None:
+        Measurer = Meter(Normalize, FileRate) # Whole files need their level before the first block is written
+        for Block in Source():
+            Measurer.feed(Block)
+        Scale = Measurer.gain(Target)
+    Clipper = StreamClipper(
+        InputPath, OutputDir, OutputRate, Channels, Subtype, Suffix, SliceParams, Archive,
+        Transform = (lambda Clip: Clip * Gain(Clip, Normalize, Target, OutputRate)) if Normalize is not None and SliceParams is not None else None,
+        Stem = Stem
+    )
+    Converter = Resampler(FileRate, OutputRate) if OutputRate != FileRate else None
+    try:
+        for Block in Source():
+            Block = Converter.process(Block) if Converter is not None else Block
+            Clipper.feed(Block * Scale if Scale != 1. else Block)
+        if Converter is not None:
+            Block = Converter.flush()
+            Clipper.feed(Block * Scale if Scale != 1. else Block)
+        return Clipper.finish()
+    except BaseException:
+        Clipper.abort()
+        raise
+
+
+def ConvertFiles(Files: list, OutputDir: str, Workers: Optional[int] = None, **Options):
+    '''
+    Run ConvertFile over many files at once, returns {FilePath: OutputPaths or Exception}
+    '''
+    Stems = OutputStems(Files)
+    def Convert(FilePath: str):
+        try:
+            return ConvertFile(FilePath, OutputDir, **Options, Stem = Stems[FilePath])
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers = max(1, min(Workers or os.cpu_count() or 1, len(Files) or 1))) as Executor:
+        Results = dict(zip(Files, Executor.map(Convert, Files)))
+    for FilePath, Result in Results.items():
+        print(f"{FilePath}: {Result if isinstance(Result, Exception) else f'{len(Result)} file(s)'}", flush = True)
+    return Results
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Chain", description = "Convert, slice and normalize audio files in a single pass each")
+    parser.add_argument("inputs",           nargs = '+', help = "audio files or dirs of them")
+    parser.add_argument("--output",         help = "dir to write the audio to", required = True)
+    parser.add_argument("--workers",        help = "files converted at once", type = int, default = None)
+    parser.add_argument("--sample-rate",    help = "sample rate to resample to", type = int, default = None)
+    parser.add_argument("--mono",           help = "mix down to one channel", action = "store_true")
+    parser.add_argument("--sample-width",   help = "sample width of the output", choices = list(SampleWidths.keys()), default = '16')
+    parser.add_argument("--format",         help = "format of the output", default = 'wav')
+    parser.add_argument("--normalize",      help = "normalize every clip (or file) by its peak or loudness", choices = ['Peak', 'Loudness'], default = None)
+    parser.add_argument("--target",         help = "level to normalize to in dBFS", type = float, default = -1.)
+    parser.add_argument("--slice",          help = "cut the audio at its silent parts", action = "store_true")
+    parser.add_argument("--threshold",      help = "RMS threshold in dB", type = float, default = -40.)
+    parser.add_argument("--min-length",     help = "shortest clip in ms", type = int, default = 5000)
+    parser.add_argument("--min-interval",   help = "shortest silence to cut at in ms", type = int, default = 300)
+    parser.add_argument("--hop-size",       help = "frame length in ms", type = int, default = 20)
+    parser.add_argument("--max-silence-kept", help = "longest silence kept around a clip in ms", type = int, default = 5000)
+    args = parser.parse_args()
+
+    Files = []
+    for Input in args.inputs:
+        Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.is_file()) if Path(Input).is_dir() else [Input])
+    ConvertFiles(
+        Files,
+        args.output,
+        Workers = args.workers,
+        SampleRate = args.sample_rate,
+        ToMono = args.mono,
+        SampleWidth = args.sample_width,
+        Media_Format_Output = args.format,
+        SliceParams = dict(
+            Threshold = args.threshold,
+            Audio_Length_Min = args.min_length,
+            Silent_Interval_Min = args.min_interval,
+            Hop_Size = args.hop_size,
+            Silence_Kept_Max = args.max_silence_kept
+        ) if args.slice else None,
+        Normalize = args.normalize,
+        Target = args.target
+    )
+
+##############################################################################################################################
@@ -0,0 +1,461 @@
+import os
+import json
+import queue
+import argparse
+import threading
+import subprocess
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .IO import AudioWriter, WavView, WavBytes, ReadWavInfo, OutputStems
+from .Slicer import StreamingSlicer, SliceFile
+from .Archive import ShardWriter
+
+##############################################################################################################################
+
+# Containers an audio stream can be copied into as it is: {Codec: Suffix}
+CopyContainers = {
+    'aac': '.m4a',
+    'alac': '.m4a',
+    'mp3': '.mp3',
+    'opus': '.opus',
+    'vorbis': '.ogg',
+    'flac': '.flac',
+    'ac3': '.ac3',
+    'eac3': '.eac3',
+    'pcm_s16le': '.wav',
+    'pcm_s24le': '.wav',
+    'pcm_s32le': '.wav',
+    'pcm_f32le': '.wav'
+}
+
+# Sample widths of Audio_Processing: {SampleWidth: Subtype}
+SampleWidths = {
+    '8': 'PCM_U8',
+    '16': 'PCM_16',
+    '24': 'PCM_24',
+    '32': 'PCM_32',
+    '32 (Float)': 'FLOAT'
+}
+
+##############################################################################################################################
+
+def Probe(FilePath: str):
+    '''
+    Read the first audio stream of a media file without decoding anything
+    '''
+    Result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=index,codec_name,sample_rate,channels:format=duration',
+            '-of', 'json',
+            FilePath
+        ],
+        capture_output = True,
+        text = True,
+        encoding = 'utf-8',
+        errors = 'replace'
+    )
+    if Result.returncode != 0:
+        raise Exception(f"Failed to probe {FilePath}: {Result.stderr.strip()}")
+    Info = json.loads(Result.stdout)
+    if not Info.get('streams'):
+        raise Exception(f"No audio stream found in {FilePath}")
+    Stream = Info['streams'][0]
+    return {
+        'Codec': Stream.get('codec_name'),
+        'SampleRate': int(Stream['sample_rate']),
+        'Channels': int(Stream['channels']),
+        'Duration': float(Info.get('format', {}).get('duration') or 0.)
+    }
+
+
+def Extract(FilePath: str, OutputDir: str, Info: Optional[dict] = None, Stem: Optional[str] = None):
+    '''
+    Take the audio stream out of a media file, copied as it is if its codec has a container to go in or as FLAC otherwise
+    '''
+    Info = Probe(FilePath) if Info is None else Info
+    Suffix = CopyContainers.get(Info['Codec'])
+    OutputPath = Path(OutputDir).joinpath((Stem or Path(FilePath).stem) + (Suffix or '.flac')).as_posix()
+    os.makedirs(OutputDir, exist_ok = True)
+    Result = subprocess.run(
+        ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-i', FilePath, '-map', '0:a:0', '-vn', '-sn', '-dn'] +
+        (['-c:a', 'copy'] if Suffix is not None else ['-c:a', 'flac']) +
+        [OutputPath],
+        capture_output = True,
+        text = True,
+        encoding = 'utf-8',
+        errors = 'replace'
+    )
+    if Result.returncode != 0:
+        raise Exception(f"Failed to extract audio from {FilePath}: {Result.stderr.strip()}")
+    return OutputPath
+
+
+def DecodeBlocks(
+    FilePath: str,
+    SampleRate: int,
+    Channels: int,
+    BlockSize: int = 65536,
+    Stop: Optional[threading.Event] = None
+):
+    '''
+    Decode the first audio stream of a media file through ffmpeg into float32 blocks of shape (frames, channels),
+    resampled and downmixed by ffmpeg on the way
+    '''
+    Process = subprocess.Popen(
+        [
+            'ffmpeg', '-nostdin', '-v', 'error',
+            '-i', FilePath,
+            '-map', '0:a:0', '-vn', '-sn', '-dn',
+            '-f', 'f32le', '-acodec', 'pcm_f32le',
+            '-ar', str(SampleRate), '-ac', str(Channels),
+            'pipe:1'
+        ],
+        stdout = subprocess.PIPE,
+        stderr = subprocess.PIPE
+    )
+    Error = []
+    Reader = threading.Thread(target = lambda: Error.append(Process.stderr.read()), daemon = True) # Keep stderr from filling up
+    Reader.start()
+    BlockBytes = BlockSize * Channels * 4
+    try:
+        while Stop is None or not Stop.is_set():
+            Data = Process.stdout.read(BlockBytes)
+            if not Data:
+                break
+            Data = Data[:len(Data) - len(Data) % (Channels * 4)]
+            yield np.frombuffer(Data, dtype = '<f4').reshape(-1, Channels)
+    finally:
+        Process.kill() if Process.poll() is None and Stop is not None and Stop.is_set() else None
+        Process.stdout.close()
+        ReturnCode = Process.wait()
+        Reader.join()
+    if ReturnCode != 0 and not (Stop is not None and Stop.is_set()):
+        raise Exception(f"Failed to decode {FilePath}: {b''.join(Error).decode('utf-8', errors = 'replace').strip()}")
+
+
+class DecodePool:
+    '''
+    Decode many media files with several ffmpeg processes at once,
+    handing their blocks to the consumer through a bounded queue so that fast decoders wait for a slow consumer.
+    Iterating gives (FilePath, Kind, Payload) where Kind is 'Start' (with the format), 'Block', 'End' or 'Error'
+    '''
+    def __init__(self,
+        Files: list,
+        Workers: Optional[int] = None,
+        SampleRate: Optional[int] = None,
+        Channels: Optional[int] = None,
+        BlockSize: int = 65536,
+        QueueSize: int = 64
+    ):
+        self.Files = list(Files)
+        self.Workers = max(1, min(Workers or os.cpu_count() or 1, len(self.Files) or 1))
+        self.SampleRate = SampleRate
+        self.Channels = Channels
+        self.BlockSize = BlockSize
+        self.Queue = queue.Queue(maxsize = QueueSize)
+        self.Pending = queue.Queue()
+        self.Stop = threading.Event()
+
+    def put(self, Item: tuple):
+        while not self.Stop.is_set():
+            try:
+                self.Queue.put(Item, timeout = 0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode(self):
+        while not self.Stop.is_set():
+            try:
+                FilePath = self.Pending.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                Info = Probe(FilePath)
+                Info['SampleRate'] = self.SampleRate or Info['SampleRate']
+                Info['Channels'] = self.Channels or Info['Channels']
+                if not self.put((FilePath, 'Start', Info)):
+                    break
+                Blocks = DecodeBlocks(FilePath, Info['SampleRate'], Info['Channels'], self.BlockSize, self.Stop)
+                try:
+                    for Block in Blocks:
+                        if not self.put((FilePath, 'Block', Block)):
+                            break
+                    else:
+                        self.put((FilePath, 'End', None))
+                finally:
+                    Blocks.close() # Ends ffmpeg right away when stopping half way
+            except Exception as e:
+                self.put((FilePath, 'Error', e))
+        self.put((None, 'Done', None))
+
+    def __iter__(self):
+        for FilePath in self.Files:
+            self.Pending.put(FilePath)
+        Threads = [threading.Thread(target = self.decode, daemon = True) for _ in range(self.Workers)]
+        for Thread in Threads:
+            Thread.start()
+        try:
+            Running = len(Threads)
+            while Running > 0:
+                Item = self.Queue.get()
+                if Item[1] == 'Done':
+                    Running -= 1
+                    continue
+                yield Item
+        finally:
+            self.Stop.set()
+            for Thread in Threads:
+                Thread.join()
+
+##############################################################################################################################
+
+class StreamClipper:
+    '''
+    Write the decoded blocks of one file out as it comes in, either whole or cut into clips by a streaming slicer.
+    Only the samples from the start of the next clip on are kept, less the middle of long silences that are sure to be cut away,
+    so memory is bounded by the longest clip rather than the file. Transform (if given) is applied to every clip of a sliced file before it is written
+    '''
+    def __init__(self,
+        FilePath: str,
+        OutputDir: str,
+        SampleRate: int,
+        Channels: int,
+        Subtype: str = 'PCM_16',
+        Suffix: str = '.wav',
+        SliceParams: Optional[dict] = None,
+        Archive: Optional[object] = None,
+        Transform: Optional[object] = None,
+        Stem: Optional[str] = None
+    ):
+        if Archive is not None and (SliceParams is None or Suffix != '.wav'):
+            raise Exception("Only sliced WAV clips can be written into shards")
+        self.Stem = Stem or Path(FilePath).stem
+        self.OutputDir = OutputDir
+        self.SampleRate = SampleRate
+        self.Channels = Channels
+        self.Subtype = Subtype
+        self.Suffix = Suffix
+        self.Slicer = StreamingSlicer(SampleRate, **SliceParams) if SliceParams is not None else None
+        self.Writer = AudioWriter(self.getPath(), SampleRate, Channels, Subtype) if self.Slicer is None else None
+        self.Archive = Archive
+        self.Transform = Transform
+        self.Blocks = [] # (Start, Block) of the samples kept
+        self.Position = 0
+        self.OutputPaths = []
+
+    def getPath(self):
+        Name = self.Stem if self.Slicer is None else f"{self.Stem}_{len(self.OutputPaths)}"
+        return Path(self.OutputDir).joinpath(Name + self.Suffix).as_posix()
+
+    def take(self, Begin: int, End: int):
+        return np.concatenate(
+            [Block[max(Begin - Start, 0) : End - Start] for Start, Block in self.Blocks if Start < End and Start + len(Block) > Begin] or
+            [np.zeros((0, self.Channels), dtype = np.float32)]
+        )
+
+    def write(self, Ranges: list):
+        for Begin, End in Ranges:
+            Clip = self.take(Begin, End) if End > Begin else None
+            Clip = self.Transform(Clip) if Clip is not None and self.Transform is not None else Clip
+            if Clip is not None and self.Archive is not None:
+                self.OutputPaths.append(self.Archive.add(Path(self.getPath()).name, WavBytes(Clip, self.SampleRate, self.Subtype)))
+            elif Clip is not None:
+                OutputPath = self.getPath()
+                with AudioWriter(OutputPath, self.SampleRate, self.Channels, self.Subtype) as Writer:
+                    Writer.write(Clip)
+                self.OutputPaths.append(OutputPath)
+            self.Blocks = [(Start, Block) for Start, Block in self.Blocks if Start + len(Block) > End]
+
+    def drop(self, Begin: int, End: int):
+        '''
+        Let go of the kept samples in [Begin, End)
+        '''
+        Blocks = []
+        for Start, Block in self.Blocks:
+            if Start + len(Block) <= Begin or Start >= End:
+                Blocks.append((Start, Block))
+                continue
+            Blocks.append((Start, Block[:Begin - Start])) if Start < Begin else None
+            Blocks.append((End, Block[End - Start:])) if Start + len(Block) > End else None
+        self.Blocks = Blocks
+
+    def feed(self, Block: np.ndarray):
+        if self.Slicer is None:
+            self.Writer.write(Block)
+            return
+        self.Blocks.append((self.Position, Block))
+        self.Position += len(Block)
+        self.write(self.Slicer.feed(Block))
+        Unneeded = self.Slicer.unneeded()
+        self.drop(*Unneeded) if Unneeded is not None else None
+
+    def finish(self):
+        if self.Slicer is None:
+            self.Writer.close()
+            self.OutputPaths.append(self.Writer.FilePath)
+        else:
+            self.write(self.Slicer.finish())
+            self.Blocks = []
+        return self.OutputPaths
+
+    def abort(self):
+        '''
+        Drop what has been written of a file that failed half way
+        '''
+        if self.Writer is not None:
+            self.Writer.close()
+            self.OutputPaths.append(self.Writer.FilePath)
+        if self.Archive is not None:
+            self.Archive.remove(self.OutputPaths)
+            self.OutputPaths = []
+        for OutputPath in self.OutputPaths:
+            Path(OutputPath).unlink() if Path(OutputPath).exists() else None
+        self.Blocks = []
+
+
+def Copyable(FilePath: str, SampleRate: Optional[int], ToMono: bool, Subtype: str, Suffix: str):
+    '''
+    Whether a file is a WAV file already in the output format, so that its clips can be copied out of it without converting
+    '''
+    if Suffix.lower() != '.wav' or Path(FilePath).suffix.lower() != '.wav':
+        return False
+    try:
+        Info = ReadWavInfo(FilePath)
+    except Exception:
+        return False
+    return (SampleRate is None or Info['SampleRate'] == SampleRate) and (not ToMono or Info['Channels'] == 1) and Info['Subtype'] == Subtype
+
+
+def CopyClips(FilePath: str, OutputDir: str, SliceParams: Optional[dict] = None, Archive: Optional[object] = None, Stem: Optional[str] = None):
+    '''
+    Write a conforming WAV file out whole or sliced, copying the bytes of its samples
+    '''
+    if SliceParams is not None:
+        return SliceFile(FilePath, OutputDir, **SliceParams, Archive = Archive, Stem = Stem)
+    with WavView(FilePath) as View:
+        return [View.write(Path(OutputDir).joinpath((Stem or Path(FilePath).stem) + '.wav').as_posix())]
+
+
+def ConvertMedia(
+    Files: list,
+    OutputDir: str,
+    Workers: Optional[int] = None,
+    SampleRate: Optional[int] = None,
+    ToMono: bool = False,
+    SampleWidth: str = '16',
+    Media_Format_Output: str = 'wav',
+    SliceParams: Optional[dict] = None,
+    QueueSize: int = 64,
+    Archive: Optional[object] = None
+):
+    '''
+    Decode media files (video included) in parallel and write their audio out, optionally sliced,
+    without a full-length intermediate file on disk. WAV files already in the output format skip ffmpeg and have their clips copied out.
+    Clips go into the tar shards of Archive (a ShardWriter) instead of files of their own if given.
+    Returns {FilePath: OutputPaths (member names with an archive) or Exception}
+    '''
+    Subtype = SampleWidths.get(str(SampleWidth), 'PCM_16')
+    Suffix = '.' + Media_Format_Output.lstrip('.')
+    Stems = OutputStems(Files)
+    Clippers = {}
+    Results = {}
+    Copied = [FilePath for FilePath in Files if Copyable(FilePath, SampleRate, ToMono, Subtype, Suffix)]
+    Files = [FilePath for FilePath in Files if FilePath not in Copied]
+    Executor = ThreadPoolExecutor(max_workers = Workers or os.cpu_count())
+    Futures = {FilePath: Executor.submit(CopyClips, FilePath, OutputDir, SliceParams, Archive, Stems[FilePath]) for FilePath in Copied}
+    def Fail(FilePath: str, Error: Exception):
+        Clippers.pop(FilePath).abort() if FilePath in Clippers else None
+        if not isinstance(Results.get(FilePath), Exception): # The first error of a file is the one that counts
+            Results[FilePath] = Error
+            print(f"{FilePath}: {Error}", flush = True)
+    try:
+        for FilePath, Kind, Payload in DecodePool(Files, Workers, SampleRate, 1 if ToMono else None, QueueSize = QueueSize):
+            if Kind == 'Error':
+                Fail(FilePath, Payload)
+            elif Kind != 'Start' and FilePath not in Clippers:
+                continue # The rest of a file that already failed
+            else:
+                try:
+                    if Kind == 'Start':
+                        Clippers[FilePath] = StreamClipper(FilePath, OutputDir, Payload['SampleRate'], Payload['Channels'], Subtype, Suffix, SliceParams, Archive, Stem = Stems[FilePath])
+                    elif Kind == 'Block':
+                        Clippers[FilePath].feed(Payload)
+                    elif Kind == 'End':
+                        Results[FilePath] = Clippers[FilePath].finish()
+                        Clippers.pop(FilePath)
+                        print(f"{FilePath}: {len(Results[FilePath])} file(s)", flush = True)
+                except Exception as e:
+                    Fail(FilePath, e)
+    finally:
+        for FilePath in list(Clippers):
+            Clippers.pop(FilePath).abort() # Partial outputs of files cut short by an interrupt
+    for FilePath, Future in Futures.items():
+        try:
+            Results[FilePath] = Future.result()
+            print(f"{FilePath}: {len(Results[FilePath])} file(s) copied", flush = True)
+        except Exception as e:
+            Results[FilePath] = e
+            print(f"{FilePath}: {e}", flush = True)
+    Executor.shutdown()
+    return Results
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Decode", description = "Decode media files with parallel ffmpeg processes")
+    parser.add_argument("inputs",           nargs = '+', help = "media files or dirs of them")
+    parser.add_argument("--output",         help = "dir to write the audio to", required = True)
+    parser.add_argument("--workers",        help = "ffmpeg processes to run at once", type = int, default = None)
+    parser.add_argument("--extract",        help = "only take the audio stream out, copied as it is where possible", action = "store_true")
+    parser.add_argument("--sample-rate",    help = "sample rate to resample to", type = int, default = None)
+    parser.add_argument("--mono",           help = "mix down to one channel", action = "store_true")
+    parser.add_argument("--sample-width",   help = "sample width of the output", choices = list(SampleWidths.keys()), default = '16')
+    parser.add_argument("--format",         help = "format of the output", default = 'wav')
+    parser.add_argument("--slice",          help = "cut the audio at its silent parts", action = "store_true")
+    parser.add_argument("--threshold",      help = "RMS threshold in dB", type = float, default = -40.)
+    parser.add_argument("--min-length",     help = "shortest clip in ms", type = int, default = 5000)
+    parser.add_argument("--min-interval",   help = "shortest silence to cut at in ms", type = int, default = 300)
+    parser.add_argument("--hop-size",       help = "frame length in ms", type = int, default = 20)
+    parser.add_argument("--max-silence-kept", help = "longest silence kept around a clip in ms", type = int, default = 5000)
+    parser.add_argument("--shard-size",     help = "pack the clips into tar shards of at most this many MB instead of a file each", type = float, default = None)
+    args = parser.parse_args()
+    if args.shard_size is not None and not args.slice:
+        parser.error("--shard-size needs --slice, only sliced clips can be written into shards")
+
+    Files = []
+    for Input in args.inputs:
+        Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.is_file()) if Path(Input).is_dir() else [Input])
+    if args.extract:
+        Stems = OutputStems(Files)
+        with ThreadPoolExecutor(max_workers = args.workers or os.cpu_count()) as Executor:
+            for FilePath, OutputPath in zip(Files, Executor.map(lambda FilePath: Extract(FilePath, args.output, Stem = Stems[FilePath]), Files)):
+                print(f"{FilePath}: {OutputPath}", flush = True)
+    else:
+        Archive = ShardWriter(args.output, MaxSize = args.shard_size) if args.shard_size is not None else None
+        ConvertMedia(
+            Files,
+            args.output,
+            Workers = args.workers,
+            SampleRate = args.sample_rate,
+            ToMono = args.mono,
+            SampleWidth = args.sample_width,
+            Media_Format_Output = args.format,
+            SliceParams = dict(
+                Threshold = args.threshold,
+                Audio_Length_Min = args.min_length,
+                Silent_Interval_Min = args.min_interval,
+                Hop_Size = args.hop_size,
+                Silence_Kept_Max = args.max_silence_kept
+            ) if args.slice else None,
+            Archive = Archive
+        )
+        print(f"Index of the shards: {Archive.close()}", flush = True) if Archive is not None else None
+
+##############################################################################################################################
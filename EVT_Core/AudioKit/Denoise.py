@@ -0,0 +1,223 @@
+import inspect
+import argparse
+import importlib
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from .IO import AudioReader, AudioWriter, OutputStems
+from .Slicer import Slicer, getRMS, SilentRuns
+
+##############################################################################################################################
+
+# Denoise engines: {Engine: (Module, Loader, Denoiser class)}, a loader takes (ModelPath, Target, **Options)
+# and returns a denoiser that maps (Audio, SampleRate) to audio of the same shape, the options are those of the class.
+# Engines are picked here (python -m AudioKit.Denoise), Audio_Processing jobs keep the AudioProcessor submodule's own denoiser
+Engines = {
+    'UVR': ('Separate', 'LoadSeparator', 'Separator'),
+    'SpectralGate': ('Gate', 'LoadGate', 'SpectralGate')
+}
+
+
+def LoadDenoiser(Engine: str, ModelPath: Optional[str] = None, Target: str = 'Vocal', **Options):
+    '''
+    Get a denoiser of the given engine, which maps audio of shape (frames, channels) to audio of the same shape.
+    Options the engine doesn't take are left out with a warning
+    '''
+    if Engine not in Engines:
+        raise Exception(f"Unknown denoise engine '{Engine}', choose from {list(Engines.keys())}")
+    Module, Loader, Class = Engines[Engine]
+    Module = importlib.import_module(f'.{Module}', __package__ or 'AudioKit')
+    Accepted = inspect.signature(getattr(Module, Class)).parameters
+    Ignored = [Name for Name in Options if Name not in Accepted or Name in ('ModelPath', 'Target')]
+    print(f"Warning: the {Engine} engine doesn't take {', '.join(Ignored)}, ignored", flush = True) if Ignored else None
+    return getattr(Module, Loader)(ModelPath, Target, **{Name: Value for Name, Value in Options.items() if Name not in Ignored})
+
+##############################################################################################################################
+
+def FindVoicedRegions(
+    Samples: np.ndarray,
+    SampleRate: int,
+    Threshold: float = -50.,
+    Hop_Size: int = 20,
+    Padding: int = 500
+):
+    '''
+    Cheap energy pass over a mono signal: return the [Begin, End) sample ranges whose frame RMS reaches the threshold,
+    widened by the padding (in ms) on both sides and merged where they meet
+    '''
+    HopSize = round(SampleRate * Hop_Size / 1000)
+    RMSList = getRMS(Samples, 4 * HopSize, HopSize)
+    Voiced = RMSList >= 10 ** (Threshold / 20.)
+    Starts, Ends = SilentRuns(Voiced) # Runs of voiced frames
+    Pad = round(SampleRate * Padding / 1000)
+    Regions = []
+    for Start, End in zip(Starts.tolist(), Ends.tolist()):
+        Begin, Stop = max(0, Start * HopSize - Pad), min(len(Samples), End * HopSize + Pad)
+        if Regions and Begin <= Regions[-1][1]:
+            Regions[-1] = (Regions[-1][0], max(Regions[-1][1], Stop))
+        else:
+            Regions.append((Begin, Stop))
+    return Regions
+
+
+def RunDenoiser(Denoiser: object, Segments: list, SampleRate: int):
+    '''
+    Denoise a list of segments, all in one go if the denoiser can share its batches between them
+    '''
+    if hasattr(Denoiser, 'separateMany'):
+        return Denoiser.separateMany(Segments, SampleRate)
+    return [Denoiser(Segment, SampleRate) for Segment in Segments]
+
+
+def PasteRegions(Audio: np.ndarray, Regions: list, Segments: list, SampleRate: int, Fade: int = 10):
+    '''
+    Put the denoised regions back in place and leave the rest silent,
+    the edges of every region are faded so that no clicks are left where it meets the silence
+    '''
+    Output = np.zeros_like(Audio, dtype = np.float32)
+    FadeSize = round(SampleRate * Fade / 1000)
+    for (Begin, End), Segment in zip(Regions, Segments):
+        Segment = np.array(Segment, dtype = np.float32)[:End - Begin]
+        Size = min(FadeSize, len(Segment) // 2)
+        if Size > 0:
+            Ramp = np.linspace(0., 1., Size, dtype = np.float32).reshape((-1,) + (1,) * (Segment.ndim - 1))
+            Segment[:Size] *= Ramp if Begin > 0 else 1.
+            Segment[len(Segment) - Size:] *= Ramp[::-1] if End < len(Audio) else 1.
+        Output[Begin : Begin + len(Segment)] = Segment
+    return Output
+
+
+def DenoiseVoiced(
+    Audio: np.ndarray,
+    SampleRate: int,
+    Denoiser: object,
+    Threshold: float = -50.,
+    Padding: int = 500,
+    Fade: int = 10
+):
+    '''
+    Run the denoiser only on the voiced regions of the audio (frames, channels) and leave the rest silent.
+    Returns the denoised audio and the share of the audio that went through the denoiser
+    '''
+    Regions = FindVoicedRegions(Audio.mean(axis = 1) if Audio.ndim > 1 else Audio, SampleRate, Threshold, Padding = Padding)
+    Segments = RunDenoiser(Denoiser, [Audio[Begin:End] for Begin, End in Regions], SampleRate)
+    Share = sum(End - Begin for Begin, End in Regions) / max(len(Audio), 1)
+    return PasteRegions(Audio, Regions, Segments, SampleRate, Fade), Share
+
+
+def DenoiseFiles(
+    InputPaths: list,
+    OutputDir: str,
+    Denoiser: object,
+    VoicedOnly: bool = True,
+    Threshold: float = -50.,
+    Padding: int = 500,
+    SliceParams: Optional[dict] = None,
+    FilesPerPass: int = 8
+):
+    '''
+    Denoise audio files (only their voiced regions if asked to) and then slice them,
+    in that order so that the slicer sees the denoised audio as it would with a full pass.
+    The segments of FilesPerPass files at a time go to the denoiser together so that short files fill its batches
+    '''
+    Stems = OutputStems(InputPaths)
+    OutputPaths = {}
+    for Start in range(0, len(InputPaths), FilesPerPass):
+        Group = {}
+        for InputPath in InputPaths[Start : Start + FilesPerPass]:
+            with AudioReader(InputPath) as Reader:
+                Audio = Reader.read(0)
+                SampleRate = Reader.SampleRate
+            Regions = FindVoicedRegions(Audio.mean(axis = 1), SampleRate, Threshold, Padding = Padding) if VoicedOnly else [(0, len(Audio))]
+            Group[InputPath] = (Audio, SampleRate, Regions)
+        for SampleRate in set(Item[1] for Item in Group.values()):
+            Paths = [InputPath for InputPath, Item in Group.items() if Item[1] == SampleRate]
+            Segments = RunDenoiser(
+                Denoiser,
+                [Group[InputPath][0][Begin:End] for InputPath in Paths for Begin, End in Group[InputPath][2]],
+                SampleRate
+            )
+            for InputPath in Paths:
+                Audio, _, Regions = Group[InputPath]
+                Output = PasteRegions(Audio, Regions, Segments[:len(Regions)], SampleRate) if VoicedOnly else np.asarray(Segments[0], dtype = np.float32)[:len(Audio)]
+                Segments = Segments[len(Regions):]
+                Share = sum(End - Begin for Begin, End in Regions) / max(len(Audio), 1)
+                print(f"{InputPath}: denoised {Share:.1%} of the audio", flush = True)
+                Clips = Slicer(SampleRate, **SliceParams).slice(Output) if SliceParams is not None else [Output]
+                OutputPaths[InputPath] = []
+                for Index, Clip in enumerate(Clips):
+                    Name = f"{Stems[InputPath]}_{Index}.wav" if SliceParams is not None else f"{Stems[InputPath]}.wav"
+                    OutputPath = Path(OutputDir).joinpath(Name).as_posix()
+                    with AudioWriter(OutputPath, SampleRate, Audio.shape[1]) as Writer:
+                        Writer.write(Clip)
+                    OutputPaths[InputPath].append(OutputPath)
+    return OutputPaths
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Denoise", description = "Denoise audio files, optionally only their voiced regions")
+    parser.add_argument("inputs",             nargs = '+', help = "audio files to denoise")
+    parser.add_argument("--output",           help = "dir to write the results to", default = None)
+    parser.add_argument("--engine",           help = "denoise engine", default = 'UVR')
+    parser.add_argument("--model",            help = "model of the engine", default = None)
+    parser.add_argument("--target",           help = "sound to keep", choices = ['Vocal', 'Instrumental'], default = 'Vocal')
+    parser.add_argument("--batch-size",       help = "chunks run through the model at once", type = int, default = None)
+    parser.add_argument("--overlap",          help = "overlap between chunks (0 to 1)", type = float, default = None)
+    parser.add_argument("--intra-threads",    help = "threads used inside an operator", type = int, default = None)
+    parser.add_argument("--inter-threads",    help = "operators run at once", type = int, default = None)
+    parser.add_argument("--files-per-pass",   help = "files whose segments share the batches", type = int, default = 8)
+    parser.add_argument("--voiced-only",      help = "find the voiced regions first and denoise only them", action = "store_true")
+    parser.add_argument("--vad-threshold",    help = "RMS threshold in dB of the voiced regions", type = float, default = -50.)
+    parser.add_argument("--padding",          help = "context kept around the voiced regions in ms", type = int, default = 500)
+    parser.add_argument("--analyze",          help = "only report how much of the audio is voiced", action = "store_true")
+    parser.add_argument("--slice",            help = "slice the denoised audio", action = "store_true")
+    parser.add_argument("--threshold",        help = "RMS threshold in dB of the slicer", type = float, default = -40.)
+    parser.add_argument("--min-length",       help = "shortest clip in ms", type = int, default = 5000)
+    parser.add_argument("--min-interval",     help = "shortest silence to cut at in ms", type = int, default = 300)
+    parser.add_argument("--hop-size",         help = "frame length in ms", type = int, default = 20)
+    parser.add_argument("--max-silence-kept", help = "longest silence kept around a clip in ms", type = int, default = 5000)
+    args = parser.parse_args()
+
+    if args.analyze:
+        for InputPath in args.inputs:
+            with AudioReader(InputPath) as Reader:
+                Audio = Reader.read(0)
+                Regions = FindVoicedRegions(Audio.mean(axis = 1), Reader.SampleRate, args.vad_threshold, Padding = args.padding)
+            Share = sum(End - Begin for Begin, End in Regions) / max(len(Audio), 1)
+            print(f"{InputPath}: {len(Regions)} voiced region(s), {Share:.1%} of the audio would be denoised", flush = True)
+    else:
+        if args.output is None:
+            raise Exception("--output is needed to denoise")
+        Denoiser = LoadDenoiser(
+            args.engine,
+            args.model,
+            args.target,
+            **{
+                Name: Value for Name, Value in dict(
+                    BatchSize = args.batch_size,
+                    Overlap = args.overlap,
+                    IntraThreads = args.intra_threads,
+                    InterThreads = args.inter_threads
+                ).items() if Value is not None
+            }
+        )
+        DenoiseFiles(
+            args.inputs,
+            args.output,
+            Denoiser,
+            VoicedOnly = args.voiced_only,
+            Threshold = args.vad_threshold,
+            Padding = args.padding,
+            SliceParams = dict(
+                Threshold = args.threshold,
+                Audio_Length_Min = args.min_length,
+                Silent_Interval_Min = args.min_interval,
+                Hop_Size = args.hop_size,
+                Silence_Kept_Max = args.max_silence_kept
+            ) if args.slice else None,
+            FilesPerPass = args.files_per_pass
+        )
+
+##############################################################################################################################
@@ -0,0 +1,373 @@
+import os
+import json
+import hashlib
+import secrets
+import argparse
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from .Cache import FileHashes, HashFile, HashesName, DecodeFile, PCMCache
+from .Separate import GetSession, DefaultThreads
+
+##############################################################################################################################
+
+# Where the embeddings are kept unless told otherwise
+DefaultStoreDir = os.environ.get('EVT_EMBEDDING_DIR') or Path(tempfile.gettempdir()).joinpath('EVT_Embeddings').as_posix()
+
+# Name of the record of which segment row holds the embedding of which file hash, kept in every namespace dir
+IndexName = 'Index.jsonl'
+
+# Name of the description of a namespace: model hash, feature method, duration and embedding size
+MetaName = 'Meta.json'
+
+# Speaker models take mono audio at this sample rate
+SampleRate = 16000
+
+# Feature methods of the speaker models
+FeatureMethods = ['spectrogram', 'melspectrogram']
+
+##############################################################################################################################
+
+def ModelHash(Model_Path: str):
+    '''
+    Hash of a model file, or of every file of a model dir along with their relative paths
+    '''
+    if Path(Model_Path).is_file():
+        return HashFile(Model_Path)
+    Hash = hashlib.sha256()
+    for File in sorted(File for File in Path(Model_Path).rglob('*') if File.is_file()):
+        Hash.update(f"{File.relative_to(Model_Path).as_posix()}:{HashFile(File.as_posix())}\n".encode('utf-8'))
+    return Hash.hexdigest()
+
+
+class EmbeddingStore:
+    '''
+    Speaker embeddings of audio files kept on disk by the hash of the file, the hash of the model, the feature method
+    and the duration of audio they were computed with, so that only the files never seen with these settings get embedded.
+    Every namespace (model, feature method, duration) is a dir of .npy segments, one per batch of rows added,
+    mapped without copying when read, and an append-only record of which row holds which file hash
+    '''
+    def __init__(self, Model_Path: str, Feature_Method: str, Duration_of_Audio: float, StoreDir: Optional[str] = None, Model_Hash: Optional[str] = None):
+        self.StoreDir = StoreDir or DefaultStoreDir
+        os.makedirs(self.StoreDir, exist_ok = True)
+        self.Hashes = FileHashes(Path(self.StoreDir).joinpath(HashesName).as_posix())
+        self.Meta = {
+            'Model_Hash': Model_Hash or ModelHash(Model_Path),
+            'Feature_Method': str(Feature_Method),
+            'Duration_of_Audio': float(Duration_of_Audio)
+        }
+        Key = f"{self.Meta['Model_Hash']}|{self.Meta['Feature_Method']}|{self.Meta['Duration_of_Audio']}"
+        self.Dir = Path(self.StoreDir).joinpath(hashlib.sha256(Key.encode('utf-8')).hexdigest()[:16]).as_posix()
+        os.makedirs(self.Dir, exist_ok = True)
+        self.Lock = threading.Lock()
+        self.Segments = {}
+        self.reload()
+
+    def reload(self):
+        '''
+        Read the record of rows again, to see what other processes added
+        '''
+        MetaPath = Path(self.Dir).joinpath(MetaName)
+        if MetaPath.exists():
+            with open(MetaPath, mode = 'r', encoding = 'utf-8') as File:
+                self.Meta['Dim'] = json.load(File).get('Dim')
+        self.Rows = {}
+        IndexPath = Path(self.Dir).joinpath(IndexName)
+        if not IndexPath.exists():
+            return
+        with open(IndexPath, mode = 'r', encoding = 'utf-8') as File:
+            for Line in File:
+                try:
+                    Entry = json.loads(Line)
+                except ValueError:
+                    continue # Cut off by a crash
+                self.Rows[Entry['Hash']] = (Entry['Segment'], Entry['Row'])
+
+    def getSegment(self, Name: str):
+        if Name not in self.Segments:
+            self.Segments[Name] = np.load(Path(self.Dir).joinpath(Name), mmap_mode = 'r')
+        return self.Segments[Name]
+
+    def __len__(self):
+        return len(self.Rows)
+
+    def __contains__(self, FileHash: str):
+        return FileHash in self.Rows
+
+    def lookup(self, Hashes: list):
+        '''
+        Return the embeddings of the given file hashes as float32 (count, dim), with zero rows where they are missing,
+        and the positions of the missing ones
+        '''
+        Missing = [Position for Position, FileHash in enumerate(Hashes) if FileHash not in self.Rows]
+        Embeddings = np.zeros((len(Hashes), self.Meta.get('Dim') or 0), dtype = np.float32)
+        BySegment = {}
+        for Position, FileHash in enumerate(Hashes):
+            if FileHash in self.Rows:
+                Segment, Row = self.Rows[FileHash]
+                BySegment.setdefault(Segment, ([], []))
+                BySegment[Segment][0].append(Position)
+                BySegment[Segment][1].append(Row)
+        for Segment, (Positions, Rows) in BySegment.items():
+            Embeddings[Positions] = self.getSegment(Segment)[Rows]
+        return Embeddings, Missing
+
+    def add(self, Hashes: list, Embeddings: np.ndarray):
+        '''
+        Write the embeddings of the given file hashes as a new segment, then record their rows
+        '''
+        if len(Hashes) == 0:
+            return
+        Embeddings = np.asarray(Embeddings, dtype = np.float32).reshape(len(Hashes), -1)
+        with self.Lock:
+            if self.Meta.get('Dim') is None:
+                self.Meta['Dim'] = Embeddings.shape[1]
+                MetaPath = Path(self.Dir).joinpath(MetaName).as_posix()
+                with open(f"{MetaPath}.{os.getpid()}.tmp", mode = 'w', encoding = 'utf-8') as File:
+                    json.dump(self.Meta, File, indent = 4)
+                os.replace(f"{MetaPath}.{os.getpid()}.tmp", MetaPath)
+            if Embeddings.shape[1] != self.Meta['Dim']:
+                raise Exception(f"Embeddings of size {Embeddings.shape[1]} don't fit a store of size {self.Meta['Dim']}")
+            Name = f"Segment_{secrets.token_hex(8)}.npy"
+            SegmentPath = Path(self.Dir).joinpath(Name).as_posix()
+            with open(f"{SegmentPath}.tmp", mode = 'wb') as File:
+                np.save(File, Embeddings)
+            os.replace(f"{SegmentPath}.tmp", SegmentPath)
+            with open(Path(self.Dir).joinpath(IndexName), mode = 'a', encoding = 'utf-8') as File:
+                File.write(''.join(json.dumps({'Hash': FileHash, 'Segment': Name, 'Row': Row}) + '\n' for Row, FileHash in enumerate(Hashes)))
+            for Row, FileHash in enumerate(Hashes):
+                self.Rows[FileHash] = (Name, Row)
+
+    def hashFiles(self, Files: list, Workers: Optional[int] = None):
+        with ThreadPoolExecutor(max_workers = max(1, min(Workers or 4 * (os.cpu_count() or 1), len(Files) or 1))) as Executor:
+            return list(Executor.map(self.Hashes.get, Files))
+
+    def get(self, Files: list, Embed: Callable, BatchSize: int = 64, Workers: Optional[int] = None):
+        '''
+        Return the embeddings of files as float32 (count, dim) in their order, computing only the missing ones.
+        Embed takes a list of file paths and returns their embeddings, every batch of it is stored as soon as it is done
+        so that an interrupted run keeps what it got through. Files Embed gives NaN rows for (couldn't read them) aren't stored
+        and come back as zero rows
+        '''
+        Hashes = self.hashFiles(Files, Workers)
+        Embeddings, Missing = self.lookup(Hashes)
+        Computed = {}
+        Pending = list(dict.fromkeys(Hashes[Position] for Position in Missing)) # The same content under several paths is embedded once
+        First = {}
+        for Position in Missing:
+            First.setdefault(Hashes[Position], Files[Position])
+        for Start in range(0, len(Pending), BatchSize):
+            Batch = Pending[Start : Start + BatchSize]
+            Result = np.asarray(Embed([First[FileHash] for FileHash in Batch]), dtype = np.float32).reshape(len(Batch), -1)
+            Embedded = np.isfinite(Result).all(axis = 1) & (Result.shape[1] > 0)
+            Batch, Result = [FileHash for FileHash, Done in zip(Batch, Embedded.tolist()) if Done], Result[Embedded]
+            self.add(Batch, Result)
+            Computed.update(zip(Batch, Result))
+        if Missing:
+            Embeddings = Embeddings if Embeddings.shape[1] else np.zeros((len(Files), self.Meta.get('Dim') or 0), dtype = np.float32)
+            for Position in Missing:
+                Embeddings[Position] = Computed[Hashes[Position]] if Hashes[Position] in Computed else 0.
+        return Embeddings
+
+    def compact(self):
+        '''
+        Merge every segment into one, for stores that grew by many small runs
+        '''
+        with self.Lock:
+            self.reload()
+            Hashes = list(self.Rows.keys())
+            if len(set(Segment for Segment, _ in self.Rows.values())) < 2:
+                return len(Hashes)
+            Embeddings = self.lookup(Hashes)[0]
+            Old = set(Path(self.Dir).glob('Segment_*.npy'))
+            Name = f"Segment_{secrets.token_hex(8)}.npy"
+            SegmentPath = Path(self.Dir).joinpath(Name).as_posix()
+            with open(f"{SegmentPath}.tmp", mode = 'wb') as File:
+                np.save(File, Embeddings)
+            os.replace(f"{SegmentPath}.tmp", SegmentPath)
+            IndexPath = Path(self.Dir).joinpath(IndexName).as_posix()
+            with open(f"{IndexPath}.tmp", mode = 'w', encoding = 'utf-8') as File:
+                File.write(''.join(json.dumps({'Hash': FileHash, 'Segment': Name, 'Row': Row}) + '\n' for Row, FileHash in enumerate(Hashes)))
+            os.replace(f"{IndexPath}.tmp", IndexPath)
+            self.Segments = {}
+            for Segment in Old:
+                Segment.unlink(missing_ok = True) # Maps already open stay valid
+            self.reload()
+            return len(Hashes)
+
+
+def MelFilters(Bins: int, Mels: int = 80, FMin: float = 20., FMax: Optional[float] = None):
+    '''
+    Triangular mel filterbank of shape (mels, bins)
+    '''
+    ToMel = lambda Hz: 2595 * np.log10(1 + Hz / 700)
+    Points = 700 * (10 ** (np.linspace(ToMel(FMin), ToMel(FMax or SampleRate / 2), Mels + 2) / 2595) - 1)
+    Freqs = np.linspace(0, SampleRate / 2, Bins)
+    Lower, Center, Upper = Points[:-2, None], Points[1:-1, None], Points[2:, None]
+    return np.maximum(0, np.minimum((Freqs - Lower) / (Center - Lower), (Upper - Freqs) / (Upper - Center))).astype(np.float32)
+
+
+def Featurize(Batch: np.ndarray, Feature_Method: str, NFFT: int = 512, WinLength: int = 400, Hop: int = 160, Mels: int = 80):
+    '''
+    Log spectrogram or log mel spectrogram of a batch of equal length clips (count, samples) at 16 kHz,
+    with the mean of every bin over time taken out. Returns float32 (count, frames, bins)
+    '''
+    if Feature_Method.lower() not in FeatureMethods:
+        raise Exception(f"Unknown feature method '{Feature_Method}', choose from {FeatureMethods}")
+    Batch = np.asarray(Batch, dtype = np.float32)
+    if Batch.shape[1] < WinLength:
+        Batch = np.pad(Batch, ((0, 0), (0, WinLength - Batch.shape[1])))
+    Frames = np.lib.stride_tricks.sliding_window_view(Batch, WinLength, axis = 1)[:, ::Hop]
+    Power = np.square(np.abs(np.fft.rfft(Frames * np.hamming(WinLength).astype(np.float32), n = NFFT, axis = -1))).astype(np.float32)
+    if Feature_Method.lower() == 'melspectrogram':
+        Power = Power @ MelFilters(NFFT // 2 + 1, Mels).T
+    Feature = np.log(Power + 1e-6)
+    return Feature - Feature.mean(axis = 1, keepdims = True)
+
+
+class BatchEmbedder:
+    '''
+    Speaker embeddings of many clips at once: clips are sorted by length and cropped or (repeat) padded up to buckets
+    of BucketStep seconds no longer than Duration_of_Audio, so that every forward pass takes BatchSize clips of one length
+    and spends nothing on padding beyond a bucket step. The model maps features (count, frames, bins) to embeddings (count, dim),
+    given as the path of an ONNX or TorchScript export or as any callable. Files are decoded through Cache (a PCMCache) if given
+    '''
+    def __init__(self,
+        Model: object,
+        Feature_Method: str,
+        Duration_of_Audio: float,
+        BatchSize: int = 32,
+        Threads: Optional[int] = None,
+        BucketStep: float = 0.5,
+        Cache: Optional[PCMCache] = None
+    ):
+        if isinstance(Model, str):
+            try:
+                Model = GetSession(Model, Threads).run
+            except Exception:
+                raise Exception(f"{Model} is neither an ONNX nor a TorchScript model, export the speaker model to one of them first")
+        self.Model = getattr(Model, 'run', Model)
+        self.Feature_Method = Feature_Method
+        self.MaxLength = int(Duration_of_Audio * SampleRate) if Duration_of_Audio and Duration_of_Audio > 0 else None
+        self.BatchSize = max(1, BatchSize)
+        self.Threads = Threads or DefaultThreads()
+        self.Step = max(1, int(BucketStep * SampleRate))
+        self.Cache = Cache
+
+    def getLength(self, Length: int):
+        '''
+        Length in samples a clip is cropped or padded to: the next bucket step, at most Duration_of_Audio
+        '''
+        Length = max(self.Step, -(-Length // self.Step) * self.Step)
+        return min(Length, self.MaxLength) if self.MaxLength is not None else Length
+
+    def embedClips(self, Clips: list):
+        '''
+        Embeddings of mono 16 kHz clips, float32 (count, dim) in their order
+        '''
+        Lengths = [self.getLength(len(Clip)) for Clip in Clips]
+        Order = sorted(range(len(Clips)), key = lambda Index: Lengths[Index])
+        Embeddings = [None] * len(Clips)
+        Start = 0
+        while Start < len(Order):
+            Stop = Start + 1
+            while Stop < len(Order) and Stop - Start < self.BatchSize and Lengths[Order[Stop]] == Lengths[Order[Start]]:
+                Stop += 1
+            Length = Lengths[Order[Start]]
+            Batch = np.stack([
+                Clips[Index][:Length] if len(Clips[Index]) >= Length else np.pad(Clips[Index], (0, Length - len(Clips[Index])), mode = 'wrap' if len(Clips[Index]) else 'constant')
+                for Index in Order[Start:Stop]
+            ])
+            for Index, Embedding in zip(Order[Start:Stop], np.asarray(self.Model(Featurize(Batch, self.Feature_Method)), dtype = np.float32).reshape(Stop - Start, -1)):
+                Embeddings[Index] = Embedding
+            Start = Stop
+        return np.stack(Embeddings) if Embeddings else np.zeros((0, 0), dtype = np.float32)
+
+    def __call__(self, Files: list):
+        '''
+        Embeddings of audio files, decoded by a pool of threads while the model runs, float32 (count, dim) in their order.
+        Files that can't be decoded are reported and skipped, their rows are NaN
+        '''
+        Decode = self.Cache.get if self.Cache is not None else DecodeFile
+        def Load(FilePath: str):
+            try:
+                return Decode(FilePath, SampleRate, 1)[:, 0]
+            except Exception as e:
+                print(f"{FilePath}: {e}", flush = True)
+                return None
+        with ThreadPoolExecutor(max_workers = max(1, min(self.Threads, len(Files) or 1))) as Executor:
+            Clips = list(Executor.map(Load, Files))
+        Decoded = [Index for Index, Clip in enumerate(Clips) if Clip is not None]
+        Embeddings = self.embedClips([Clips[Index] for Index in Decoded])
+        Result = np.full((len(Files), Embeddings.shape[1]), np.nan, dtype = np.float32)
+        Result[Decoded] = Embeddings
+        return Result
+
+##############################################################################################################################
+
+def Namespaces(StoreDir: Optional[str] = None):
+    '''
+    Description and row count of every namespace of a store dir
+    '''
+    Result = []
+    for MetaPath in sorted(Path(StoreDir or DefaultStoreDir).glob(f'*/{MetaName}')):
+        with open(MetaPath, mode = 'r', encoding = 'utf-8') as File:
+            Meta = json.load(File)
+        IndexPath = MetaPath.parent.joinpath(IndexName)
+        Rows = set()
+        if IndexPath.exists():
+            with open(IndexPath, mode = 'r', encoding = 'utf-8') as File:
+                for Line in File:
+                    try:
+                        Rows.add(json.loads(Line)['Hash'])
+                    except ValueError:
+                        continue
+        Meta.update(Dir = MetaPath.parent.as_posix(), Rows = len(Rows), Bytes = sum(Segment.stat().st_size for Segment in MetaPath.parent.glob('Segment_*.npy')))
+        Result.append(Meta)
+    return Result
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Embeddings", description = "Manage the store of speaker embeddings")
+    parser.add_argument("--store", help = "dir of the store", default = None)
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    subparsers.add_parser("stats", help = "show the namespaces of the store")
+
+    parser_embed = subparsers.add_parser("embed", help = "embed audio files into the store ahead of identifying them")
+    parser_embed.add_argument("inputs",           nargs = '+', help = "audio files or dirs of them")
+    parser_embed.add_argument("--model",          help = "ONNX or TorchScript export of the speaker model", required = True)
+    parser_embed.add_argument("--feature-method", help = "feature method of the model", choices = FeatureMethods, required = True)
+    parser_embed.add_argument("--duration",       help = "longest audio per clip in seconds, 0 for no limit", type = float, default = 3.)
+    parser_embed.add_argument("--batch-size",     help = "clips per forward pass", type = int, default = 32)
+    parser_embed.add_argument("--threads",        help = "threads of the model and of decoding", type = int, default = None)
+    parser_embed.add_argument("--cache",          help = "decode through the shared PCM cache", action = "store_true")
+
+    parser_compact = subparsers.add_parser("compact", help = "merge the segments of a namespace into one")
+    parser_compact.add_argument("--model",           help = "path of the model", required = True)
+    parser_compact.add_argument("--feature-method",  help = "feature method of the model", required = True)
+    parser_compact.add_argument("--duration",        help = "duration of audio the embeddings were taken over", type = float, required = True)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for Meta in Namespaces(args.store):
+            print(json.dumps(Meta), flush = True)
+    if args.command == "embed":
+        from .Speakers import AudioSuffixes
+        Files = []
+        for Input in args.inputs:
+            Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.suffix.lower() in AudioSuffixes) if Path(Input).is_dir() else [Input])
+        Store = EmbeddingStore(args.model, args.feature_method, args.duration, args.store)
+        Before = len(Store)
+        Store.get(Files, BatchEmbedder(args.model, args.feature_method, args.duration, args.batch_size, args.threads, Cache = PCMCache() if args.cache else None), BatchSize = 32 * args.batch_size)
+        print(f"{len(Files)} file(s), {len(Store) - Before} embedded, {len(Store)} in {Store.Dir}", flush = True)
+    if args.command == "compact":
+        Store = EmbeddingStore(args.model, args.feature_method, args.duration, args.store)
+        print(f"{Store.compact()} embedding(s) in {Store.Dir}", flush = True)
+
+##############################################################################################################################
@@ -0,0 +1,244 @@
+import os
+import json
+import argparse
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .Cache import FileHashes, DecodeFile, PCMCache
+
+##############################################################################################################################
+
+# Where the fingerprints are kept unless told otherwise
+DefaultIndexDir = os.environ.get('EVT_FINGERPRINT_DIR') or Path(tempfile.gettempdir()).joinpath('EVT_Fingerprints').as_posix()
+
+# Fingerprints are taken from mono audio at this sample rate
+SampleRate = 8000
+
+##############################################################################################################################
+
+def MaxFilter(Array: np.ndarray, Size: int, Axis: int):
+    '''
+    Largest value in a centred window of the given size along an axis
+    '''
+    Pad = [(Size // 2, Size // 2) if Index == Axis else (0, 0) for Index in range(Array.ndim)]
+    Padded = np.pad(Array, Pad, mode = 'constant', constant_values = -np.inf)
+    return np.lib.stride_tricks.sliding_window_view(Padded, Size, axis = Axis).max(axis = -1)
+
+
+def Landmarks(
+    Audio: np.ndarray,
+    NFFT: int = 1024,
+    Hop: int = 256,
+    PeakTime: int = 15,
+    PeakFreq: int = 15,
+    PeakLevel: float = 26.,
+    PeaksPerSecond: int = 20,
+    FanOut: int = 5,
+    MaxDelta: int = 63
+):
+    '''
+    Landmark hashes of mono audio at 8 kHz: spectral peaks standing PeakLevel dB over the median level are paired
+    with the next few peaks after them, and each pair is hashed from the two frequencies and the time between them.
+    Returns (count, 2) uint32 of (hash, frame of the first peak)
+    '''
+    Audio = np.asarray(Audio, dtype = np.float32).reshape(-1)
+    if len(Audio) < NFFT:
+        return np.zeros((0, 2), dtype = np.uint32)
+    Window = np.hanning(NFFT).astype(np.float32)
+    Frames = np.lib.stride_tricks.sliding_window_view(Audio, NFFT)[::Hop]
+    Spec = 20 * np.log10(np.abs(np.fft.rfft(Frames * Window, axis = -1))[:, :NFFT // 2] + 1e-6) # (frames, bins)
+    Peaks = (Spec == MaxFilter(MaxFilter(Spec, PeakTime, 0), PeakFreq, 1)) & (Spec > np.median(Spec) + PeakLevel)
+    Times, Freqs = np.nonzero(Peaks)
+    # Keep the strongest peaks of every second
+    Second = Times // max(1, SampleRate // Hop)
+    Order = np.lexsort((-Spec[Times, Freqs], Second))
+    Times, Freqs, Second = Times[Order], Freqs[Order], Second[Order]
+    First = np.searchsorted(Second, Second, side = 'left')
+    Keep = np.arange(len(Second)) - First < PeaksPerSecond
+    Order = np.lexsort((Freqs[Keep], Times[Keep]))
+    Times, Freqs = Times[Keep][Order], Freqs[Keep][Order] // 2 # Half resolution in frequency for robustness
+    Hashes = []
+    for Offset in range(1, FanOut + 1):
+        Delta = Times[Offset:] - Times[:-Offset]
+        Valid = (Delta >= 1) & (Delta <= MaxDelta)
+        Hash = (Freqs[:-Offset][Valid].astype(np.uint32) << 14) | (Freqs[Offset:][Valid].astype(np.uint32) << 6) | Delta[Valid].astype(np.uint32)
+        Hashes.append(np.stack([Hash, Times[:-Offset][Valid].astype(np.uint32)], axis = 1))
+    return np.concatenate(Hashes) if Hashes else np.zeros((0, 2), dtype = np.uint32)
+
+
+class FingerprintIndex:
+    '''
+    On-disk fingerprints of audio files, kept by the hash of the file so that every file is only fingerprinted once.
+    Files are decoded through Cache (a PCMCache) if given
+    '''
+    def __init__(self, IndexDir: Optional[str] = None, Cache: Optional[PCMCache] = None):
+        self.IndexDir = IndexDir or DefaultIndexDir
+        self.Cache = Cache
+        os.makedirs(self.IndexDir, exist_ok = True)
+        self.Hashes = FileHashes(Path(self.IndexDir).joinpath('Hashes.jsonl').as_posix())
+
+    def get(self, FilePath: str):
+        '''
+        Return the file hash, the landmarks and the duration (s) of a file
+        '''
+        FileHash = self.Hashes.get(FilePath)
+        EntryPath = Path(self.IndexDir).joinpath(FileHash[:2], f"{FileHash}.npz")
+        if EntryPath.exists():
+            try:
+                with np.load(EntryPath) as Entry:
+                    return FileHash, Entry['Landmarks'], float(Entry['Duration'])
+            except (ValueError, OSError, KeyError):
+                pass # Cut off by a crash, taken again
+        Audio = (self.Cache.get if self.Cache is not None else DecodeFile)(FilePath, SampleRate, 1)[:, 0]
+        Marks, Duration = Landmarks(Audio), len(Audio) / SampleRate
+        os.makedirs(EntryPath.parent, exist_ok = True)
+        TempPath = f"{EntryPath.as_posix()}.{os.getpid()}.tmp.npz"
+        np.savez(TempPath, Landmarks = Marks, Duration = Duration)
+        os.replace(TempPath, EntryPath)
+        return FileHash, Marks, Duration
+
+##############################################################################################################################
+
+def MatchLandmarks(Landmarks: list, MaxPostings: int = 200):
+    '''
+    Count the time-aligned landmark matches between every pair of fingerprints through one sorted table of all hashes.
+    Returns {(A, B): matches} for A < B
+    '''
+    Hashes = np.concatenate([Marks[:, 0] for Marks in Landmarks] or [np.zeros(0, dtype = np.uint32)])
+    Times = np.concatenate([Marks[:, 1] for Marks in Landmarks] or [np.zeros(0, dtype = np.uint32)]).astype(np.int64)
+    Owners = np.repeat(np.arange(len(Landmarks)), [len(Marks) for Marks in Landmarks])
+    Order = np.argsort(Hashes, kind = 'stable')
+    Hashes, Times, Owners = Hashes[Order], Times[Order], Owners[Order]
+    Matches = {}
+    for A, Marks in enumerate(Landmarks):
+        if len(Marks) == 0:
+            continue
+        Lo = np.searchsorted(Hashes, Marks[:, 0], side = 'left')
+        Hi = np.searchsorted(Hashes, Marks[:, 0], side = 'right')
+        Counts = np.where(Hi - Lo <= MaxPostings, Hi - Lo, 0) # Hashes found nearly everywhere tell nothing
+        Total = int(Counts.sum())
+        if Total == 0:
+            continue
+        Starts = np.repeat(Lo, Counts)
+        Index = Starts + np.arange(Total) - np.repeat(np.cumsum(Counts) - Counts, Counts)
+        Others = Owners[Index]
+        Deltas = (Times[Index] - np.repeat(Marks[:, 1].astype(np.int64), Counts)) // 2 # Allow a frame of jitter
+        Later = Others > A
+        if not Later.any():
+            continue
+        Keys, KeyCounts = np.unique(Others[Later].astype(np.int64) * (1 << 34) + (Deltas[Later] + (1 << 32)), return_counts = True)
+        Pairs = Keys >> 34
+        Bounds = np.flatnonzero(np.diff(Pairs, prepend = -1))
+        for B, Best in zip(Pairs[Bounds].tolist(), np.maximum.reduceat(KeyCounts, Bounds).tolist()):
+            Matches[(A, B)] = Best
+    return Matches
+
+
+def FindDuplicates(
+    Files: list,
+    Index: Optional[FingerprintIndex] = None,
+    MinScore: float = 0.2,
+    MinMatches: int = 10,
+    Workers: Optional[int] = None
+):
+    '''
+    Group files that are exact (same bytes) or near (same audio, re-encoded, trimmed or with a different gain) duplicates.
+    Two files are near duplicates if at least MinScore of the landmarks of the shorter one match at one time offset.
+    Returns a list of groups of two or more files as dicts of Representative (the longest file) and Members
+    '''
+    Index = Index or FingerprintIndex()
+    def Get(FilePath: str):
+        try:
+            return Index.get(FilePath)
+        except Exception as e:
+            print(f"{FilePath}: {e}", flush = True)
+            return None
+    with ThreadPoolExecutor(max_workers = max(1, min(Workers or os.cpu_count() or 1, len(Files) or 1))) as Executor:
+        Results = list(Executor.map(Get, Files))
+    Known = [(FilePath, Result) for FilePath, Result in zip(Files, Results) if Result is not None]
+
+    Parent = list(range(len(Known)))
+    def Find(Item: int):
+        while Parent[Item] != Item:
+            Parent[Item] = Parent[Parent[Item]]
+            Item = Parent[Item]
+        return Item
+    Links = {}
+    First = {}
+    for Item, (_, (FileHash, _, _)) in enumerate(Known):
+        if FileHash in First:
+            Links[(First[FileHash], Item)] = ('Exact', 1.)
+            Parent[Find(Item)] = Find(First[FileHash])
+        else:
+            First[FileHash] = Item
+    Unique = list(First.values())
+    for (A, B), Count in MatchLandmarks([Known[Item][1][1] for Item in Unique]).items():
+        A, B = Unique[A], Unique[B]
+        Score = Count / max(1, min(len(Known[A][1][1]), len(Known[B][1][1])))
+        if Count >= MinMatches and Score >= MinScore:
+            Links[(A, B)] = ('Near', round(Score, 3))
+            Parent[Find(B)] = Find(A)
+
+    Groups = {}
+    for Item in range(len(Known)):
+        Groups.setdefault(Find(Item), []).append(Item)
+    Duplicates = []
+    for Items in Groups.values():
+        if len(Items) < 2:
+            continue
+        Representative = max(Items, key = lambda Item: (Known[Item][1][2], -Item))
+        Members = []
+        for Item in Items:
+            if Item == Representative:
+                continue
+            Kind, Score = Links.get((min(Item, Representative), max(Item, Representative))) or max(
+                (Link for Pair, Link in Links.items() if Item in Pair), key = lambda Link: Link[1]
+            )
+            Members.append({'Path': Known[Item][0], 'Kind': Kind, 'Score': Score})
+        Duplicates.append({'Representative': Known[Representative][0], 'Members': Members})
+    return Duplicates
+
+
+def Representatives(Files: list, Duplicates: list):
+    '''
+    The files left once every duplicate group is cut down to its representative, in the original order
+    '''
+    Dropped = set(Member['Path'] for Group in Duplicates for Member in Group['Members'])
+    return [FilePath for FilePath in Files if FilePath not in Dropped]
+
+
+def Summarize(Files: list, Duplicates: list):
+    Exact = sum(1 for Group in Duplicates for Member in Group['Members'] if Member['Kind'] == 'Exact')
+    Near = sum(1 for Group in Duplicates for Member in Group['Members'] if Member['Kind'] == 'Near')
+    return f"{len(Files)} file(s), {len(Duplicates)} duplicate group(s), {Exact} exact and {Near} near duplicate(s)"
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Fingerprint", description = "Find exact and near duplicates among audio files")
+    parser.add_argument("inputs",        nargs = '+', help = "media files or dirs of them")
+    parser.add_argument("--index",       help = "dir to keep the fingerprints in", default = None)
+    parser.add_argument("--report",      help = "JSON file to write the duplicate groups to", default = None)
+    parser.add_argument("--min-score",   help = "share of matching landmarks for a near duplicate", type = float, default = 0.2)
+    parser.add_argument("--min-matches", help = "fewest matching landmarks for a near duplicate", type = int, default = 10)
+    parser.add_argument("--workers",     help = "files fingerprinted at once", type = int, default = None)
+    parser.add_argument("--cache",       help = "decode through the shared PCM cache", action = "store_true")
+    args = parser.parse_args()
+
+    Files = []
+    for Input in args.inputs:
+        Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.is_file()) if Path(Input).is_dir() else [Input])
+    Duplicates = FindDuplicates(Files, FingerprintIndex(args.index, PCMCache() if args.cache else None), args.min_score, args.min_matches, args.workers)
+    for Group in Duplicates:
+        print(Group['Representative'], flush = True)
+        for Member in Group['Members']:
+            print(f"    {Member['Kind']:>5} {Member['Score']:>6.3f}  {Member['Path']}", flush = True)
+    if args.report is not None:
+        with open(args.report, mode = 'w', encoding = 'utf-8') as File:
+            json.dump(Duplicates, File, ensure_ascii = False, indent = 4)
+    print(Summarize(Files, Duplicates), flush = True)
+
+##############################################################################################################################
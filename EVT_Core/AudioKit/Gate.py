@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Optional
+
+from .Slicer import getRMS
+from .Separate import OverlapAdd
+
+##############################################################################################################################
+
+class SpectralGate:
+    '''
+    Lightweight CPU denoiser: a per-bin noise threshold is learnt from the quietest frames of the recording,
+    time-frequency cells under it are turned down and the gain mask is smoothed to avoid musical noise.
+    The STFT runs a block of frames at a time so that memory doesn't grow with the length of the recording
+    '''
+    def __init__(self,
+        Target: str = 'Vocal',
+        NFFT: int = 2048,
+        Hop: int = 512,
+        NStd: float = 1.5,
+        PropDecrease: float = 1.,
+        NoiseShare: float = 0.1,
+        SmoothFreq: int = 3,
+        SmoothTime: int = 5,
+        BlockFrames: int = 1024
+    ):
+        self.Target = Target
+        self.NFFT = NFFT
+        self.Hop = Hop
+        self.NStd = NStd
+        self.PropDecrease = PropDecrease
+        self.NoiseShare = NoiseShare
+        self.SmoothFreq = SmoothFreq
+        self.SmoothTime = SmoothTime
+        self.BlockFrames = BlockFrames
+        self.Window = np.hanning(NFFT + 1)[:-1].astype(np.float32) # Periodic
+
+    def frames(self, Padded: np.ndarray, Start: int, Stop: int):
+        '''
+        Spectra of frames [Start, Stop) of a padded (channels, samples) signal
+        '''
+        Frames = np.lib.stride_tricks.sliding_window_view(Padded[:, Start * self.Hop : (Stop - 1) * self.Hop + self.NFFT], self.NFFT, axis = -1)[:, ::self.Hop]
+        return np.fft.rfft(Frames * self.Window, axis = -1) # (channels, frames, bins)
+
+    def getNoiseProfile(self, Padded: np.ndarray, Count: int):
+        '''
+        Mean and spread of the level of every bin over the quietest frames (the detected silence)
+        '''
+        RMSList = getRMS(Padded.mean(axis = 0)[self.NFFT // 2 : Padded.shape[1] - self.NFFT // 2], self.NFFT, self.Hop)[:Count]
+        Quiet = np.sort(np.argsort(RMSList, kind = 'stable')[:max(1, int(Count * self.NoiseShare))])
+        Levels = []
+        for Start in range(0, len(Quiet), self.BlockFrames):
+            Indices = Quiet[Start : Start + self.BlockFrames]
+            Frames = np.stack([Padded[:, Index * self.Hop : Index * self.Hop + self.NFFT] for Index in Indices], axis = 1)
+            Levels.append(20 * np.log10(np.abs(np.fft.rfft(Frames * self.Window, axis = -1)) + 1e-10))
+        Levels = np.concatenate(Levels, axis = 1) # (channels, frames, bins)
+        return Levels.mean(axis = 1, keepdims = True) + self.NStd * Levels.std(axis = 1, keepdims = True)
+
+    def smooth(self, Mask: np.ndarray):
+        '''
+        Moving average of the mask over neighbouring frames and bins
+        '''
+        for Axis, Size in ((1, self.SmoothTime), (2, self.SmoothFreq)):
+            if Size > 1:
+                Padded = np.pad(Mask, [(Size // 2, Size - 1 - Size // 2) if Index == Axis else (0, 0) for Index in range(Mask.ndim)], mode = 'edge')
+                Cumsum = np.cumsum(Padded, axis = Axis, dtype = np.float32)
+                Cumsum = np.concatenate([np.zeros_like(Cumsum.take([0], axis = Axis)), Cumsum], axis = Axis)
+                Mask = (Cumsum.take(np.arange(Size, Cumsum.shape[Axis]), axis = Axis) - Cumsum.take(np.arange(0, Cumsum.shape[Axis] - Size), axis = Axis)) / Size
+        return Mask
+
+    def __call__(self, Audio: np.ndarray, SampleRate: int):
+        Mono = Audio.ndim == 1
+        Signal = (Audio.reshape(-1, 1) if Mono else Audio).T.astype(np.float32) # (channels, samples)
+        Length = Signal.shape[1]
+        if Length == 0:
+            return Audio
+        Tail = self.NFFT // 2 + self.Hop + (-(Length + self.NFFT + self.Hop) % self.Hop) # Whole hops for OverlapAdd
+        Padded = np.pad(Signal, ((0, 0), (self.NFFT // 2, Tail)), mode = 'constant')
+        Count = (Padded.shape[1] - self.NFFT) // self.Hop + 1
+        Threshold = self.getNoiseProfile(Padded, Count)
+        Output = np.zeros_like(Padded)
+        Envelope = np.zeros(Padded.shape[1], dtype = np.float32)
+        Context = self.SmoothTime // 2
+        for Start in range(0, Count, self.BlockFrames):
+            Stop = min(Start + self.BlockFrames, Count)
+            Begin, End = max(0, Start - Context), min(Count, Stop + Context) # Extra frames for smoothing the mask
+            Spectra = self.frames(Padded, Begin, End)
+            Mask = (20 * np.log10(np.abs(Spectra) + 1e-10) > Threshold).astype(np.float32)
+            Gain = 1. - self.PropDecrease * (1. - self.smooth(Mask))
+            Frames = np.fft.irfft(Spectra * Gain, n = self.NFFT, axis = -1)[:, Start - Begin : Stop - Begin] * self.Window
+            OverlapAdd(Output, Frames, Start, self.Hop)
+            OverlapAdd(Envelope, np.tile(self.Window ** 2, (Stop - Start, 1)), Start, self.Hop)
+        Output = (Output / np.where(Envelope > 1e-8, Envelope, 1.))[:, self.NFFT // 2 : self.NFFT // 2 + Length]
+        Output = Output if self.Target == 'Vocal' else Signal - Output
+        return Output[0] if Mono else Output.T
+
+
+def LoadGate(ModelPath: Optional[str] = None, Target: str = 'Vocal', **Options):
+    '''
+    The spectral gate needs no model, the model path is ignored
+    '''
+    return SpectralGate(Target, **Options)
+
+##############################################################################################################################
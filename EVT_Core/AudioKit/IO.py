@@ -0,0 +1,270 @@
+import os
+import struct
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from collections import Counter
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+##############################################################################################################################
+
+# WAV sample formats: {Subtype: (Format tag, Bits)}
+Subtypes = {
+    'PCM_U8': (1, 8),
+    'PCM_16': (1, 16),
+    'PCM_24': (1, 24),
+    'PCM_32': (1, 32),
+    'FLOAT': (3, 32),
+    'DOUBLE': (3, 64)
+}
+
+##############################################################################################################################
+
+def ReadWavInfo(FilePath: str, Offset: int = 0, Size: Optional[int] = None):
+    '''
+    Parse the header of a WAV file and return its format along with where the samples start,
+    Offset and Size locate a WAV file stored inside another file (a tar shard for example)
+    '''
+    with open(FilePath, mode = 'rb') as File:
+        File.seek(Offset)
+        Riff, _, Wave = struct.unpack('<4sI4s', File.read(12))
+        if Riff != b'RIFF' or Wave != b'WAVE':
+            raise Exception(f"Not a WAV file: {FilePath}")
+        Info = {}
+        while True:
+            Header = File.read(8)
+            if len(Header) < 8:
+                break
+            ChunkID, ChunkSize = struct.unpack('<4sI', Header)
+            if ChunkID == b'fmt ':
+                Data = File.read(ChunkSize)
+                FormatTag, Channels, SampleRate, _, BlockAlign, Bits = struct.unpack('<HHIIHH', Data[:16])
+                if FormatTag == 0xFFFE and len(Data) >= 26:
+                    FormatTag = struct.unpack('<H', Data[24:26])[0] # Sub format of WAVE_FORMAT_EXTENSIBLE
+                Info.update(FormatTag = FormatTag, Channels = Channels, SampleRate = SampleRate, BlockAlign = BlockAlign, Bits = Bits)
+            elif ChunkID == b'data':
+                Info.update(DataOffset = File.tell(), DataSize = ChunkSize)
+                break
+            else:
+                File.seek(ChunkSize + ChunkSize % 2, os.SEEK_CUR)
+        if 'FormatTag' not in Info or 'DataOffset' not in Info:
+            raise Exception(f"Incomplete WAV header: {FilePath}")
+        Subtype = {Value: Key for Key, Value in Subtypes.items()}.get((Info['FormatTag'], Info['Bits']))
+        if Subtype is None:
+            raise Exception(f"Unsupported WAV format {Info['FormatTag']} with {Info['Bits']} bits: {FilePath}")
+        DataSize = min(Info['DataSize'], (os.path.getsize(FilePath) if Size is None else Offset + Size) - Info['DataOffset'])
+        Info.update(Subtype = Subtype, Frames = DataSize // Info['BlockAlign'])
+        return Info
+
+
+def ToFloat(Data: np.ndarray, Subtype: str):
+    '''
+    Turn raw samples (frames, channels[, 3 bytes for 24-bit]) into float32 in [-1, 1)
+    '''
+    if Subtype == 'PCM_U8':
+        return (Data.astype(np.float32) - 128) / 128
+    if Subtype == 'PCM_16':
+        return Data.astype(np.float32) / 32768
+    if Subtype == 'PCM_24':
+        Data = Data.astype(np.int32)
+        Data = (Data[..., 0] | (Data[..., 1] << 8) | (Data[..., 2] << 16)) << 8 >> 8
+        return Data.astype(np.float32) / 8388608
+    if Subtype == 'PCM_32':
+        return (Data.astype(np.float64) / 2147483648).astype(np.float32)
+    return Data.astype(np.float32)
+
+
+def FromFloat(Data: np.ndarray, Subtype: str):
+    '''
+    Turn float samples into the bytes of the given subtype
+    '''
+    if Subtype == 'PCM_U8':
+        return (np.clip(np.round(Data * 128) + 128, 0, 255)).astype(np.uint8).tobytes()
+    if Subtype == 'PCM_16':
+        return np.clip(np.round(Data * 32768), -32768, 32767).astype('<i2').tobytes()
+    if Subtype == 'PCM_24':
+        Data = np.clip(np.round(Data.astype(np.float64) * 8388608), -8388608, 8388607).astype('<i4')
+        return Data.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    if Subtype == 'PCM_32':
+        return np.clip(np.round(Data.astype(np.float64) * 2147483648), -2147483648, 2147483647).astype('<i4').tobytes()
+    if Subtype == 'DOUBLE':
+        return Data.astype('<f8').tobytes()
+    return Data.astype('<f4').tobytes()
+
+
+class AudioReader:
+    '''
+    Read an audio file block by block (soundfile if available, or a memory map of a WAV file)
+    '''
+    def __init__(self, FilePath: str):
+        self.FilePath = FilePath
+        if soundfile is not None:
+            self.File = soundfile.SoundFile(FilePath)
+            self.SampleRate, self.Channels, self.Frames, self.Subtype = self.File.samplerate, self.File.channels, self.File.frames, self.File.subtype
+            self.Map = None
+        else:
+            self.File = None
+            Info = ReadWavInfo(FilePath)
+            self.SampleRate, self.Channels, self.Frames, self.Subtype = Info['SampleRate'], Info['Channels'], Info['Frames'], Info['Subtype']
+            DType = {'PCM_U8': 'u1', 'PCM_16': '<i2', 'PCM_24': 'u1', 'PCM_32': '<i4', 'FLOAT': '<f4', 'DOUBLE': '<f8'}[self.Subtype]
+            Shape = (self.Frames, self.Channels, 3) if self.Subtype == 'PCM_24' else (self.Frames, self.Channels)
+            self.Map = np.memmap(FilePath, dtype = DType, mode = 'r', offset = Info['DataOffset'], shape = Shape) if self.Frames > 0 else None
+
+    def read(self, Start: int, Stop: Optional[int] = None):
+        '''
+        Return the frames in [Start, Stop) as float32 of shape (frames, channels)
+        '''
+        Stop = self.Frames if Stop is None else min(Stop, self.Frames)
+        if Stop <= Start:
+            return np.zeros((0, self.Channels), dtype = np.float32)
+        if self.File is not None:
+            self.File.seek(Start)
+            return self.File.read(Stop - Start, dtype = 'float32', always_2d = True)
+        return ToFloat(self.Map[Start:Stop], self.Subtype)
+
+    def blocks(self, BlockSize: int = 65536):
+        for Start in range(0, self.Frames, BlockSize):
+            yield self.read(Start, Start + BlockSize)
+
+    def close(self):
+        self.File.close() if self.File is not None else None
+        self.Map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AudioWriter:
+    '''
+    Write an audio file block by block (soundfile if available, or a plain WAV file)
+    '''
+    def __init__(self, FilePath: str, SampleRate: int, Channels: int, Subtype: str = 'PCM_16'):
+        self.FilePath = FilePath
+        self.SampleRate = SampleRate
+        self.Channels = Channels
+        self.Subtype = Subtype
+        self.Frames = 0
+        os.makedirs(Path(FilePath).parent, exist_ok = True)
+        if soundfile is not None:
+            self.SoundFile = soundfile.SoundFile(FilePath, mode = 'w', samplerate = SampleRate, channels = Channels, subtype = Subtype)
+            self.File = None
+        else:
+            if Path(FilePath).suffix.lower() != '.wav':
+                raise Exception(f"Writing '{Path(FilePath).suffix}' files needs soundfile")
+            self.SoundFile = None
+            self.File = open(FilePath, mode = 'wb')
+            self.File.write(WavHeader(SampleRate, Channels, Subtype, 0))
+
+    def write(self, Block: np.ndarray):
+        Block = Block.reshape(-1, 1) if Block.ndim == 1 else Block
+        if self.SoundFile is not None:
+            self.SoundFile.write(Block)
+        else:
+            self.File.write(FromFloat(Block, self.Subtype))
+        self.Frames += len(Block)
+
+    def close(self):
+        if self.SoundFile is not None:
+            self.SoundFile.close()
+        elif self.File is not None:
+            self.File.seek(0)
+            self.File.write(WavHeader(self.SampleRate, self.Channels, self.Subtype, self.Frames))
+            self.File.close()
+            self.File = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class WavView:
+    '''
+    Memory map of the sample bytes of a WAV file, for writing ranges of frames out as they are (no float conversion)
+    '''
+    def __init__(self, FilePath: str):
+        self.FilePath = FilePath
+        Info = ReadWavInfo(FilePath)
+        self.SampleRate, self.Channels, self.Frames, self.Subtype = Info['SampleRate'], Info['Channels'], Info['Frames'], Info['Subtype']
+        self.BlockAlign = Info['BlockAlign']
+        if self.BlockAlign != self.Channels * Subtypes[self.Subtype][1] // 8:
+            raise Exception(f"Padded WAV samples can't be copied as they are: {FilePath}")
+        self.Map = np.memmap(FilePath, dtype = np.uint8, mode = 'r', offset = Info['DataOffset'], shape = (self.Frames * self.BlockAlign,)) if self.Frames > 0 else None
+
+    def parts(self, Begin: int = 0, End: Optional[int] = None):
+        '''
+        Header and sample bytes of frames [Begin, End) as a WAV file of the same format
+        '''
+        End = self.Frames if End is None else min(End, self.Frames)
+        Frames = max(0, End - Begin)
+        return WavHeader(self.SampleRate, self.Channels, self.Subtype, Frames), self.Map[Begin * self.BlockAlign : End * self.BlockAlign] if Frames > 0 else b''
+
+    def write(self, OutputPath: str, Begin: int = 0, End: Optional[int] = None):
+        '''
+        Write frames [Begin, End) into a new WAV file with the same format
+        '''
+        os.makedirs(Path(OutputPath).parent, exist_ok = True)
+        with open(OutputPath, mode = 'wb') as File:
+            for Part in self.parts(Begin, End):
+                File.write(Part)
+        return OutputPath
+
+    def close(self):
+        self.Map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def WavBytes(Audio: np.ndarray, SampleRate: int, Subtype: str = 'PCM_16'):
+    '''
+    Encode float audio (frames[, channels]) as the bytes of a WAV file
+    '''
+    Audio = Audio.reshape(-1, 1) if Audio.ndim == 1 else Audio
+    return WavHeader(SampleRate, Audio.shape[1], Subtype, len(Audio)) + FromFloat(Audio, Subtype)
+
+
+def WavHeader(SampleRate: int, Channels: int, Subtype: str, Frames: int):
+    FormatTag, Bits = Subtypes[Subtype]
+    BlockAlign = Channels * Bits // 8
+    DataSize = Frames * BlockAlign
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + DataSize, b'WAVE',
+        b'fmt ', 16, FormatTag, Channels, SampleRate, SampleRate * BlockAlign, BlockAlign, Bits,
+        b'data', DataSize
+    )
+
+
+def OutputStems(Files: list):
+    '''
+    Name the outputs of every file after its stem, with the suffix (and then a number) added where files share a stem,
+    so that files from different dirs or of different formats never write over each other's outputs. Returns {FilePath: Stem}
+    '''
+    Stems = {FilePath: Path(FilePath).stem for FilePath in Files}
+    Counts = Counter(Stems.values())
+    Taken = set(Stem for Stem in Stems.values() if Counts[Stem] == 1)
+    for FilePath in Files:
+        if Counts[Path(FilePath).stem] == 1:
+            continue
+        Name = '_'.join(Part for Part in (Path(FilePath).stem, Path(FilePath).suffix.lstrip('.')) if Part)
+        Stem, Index = Name, 1
+        while Stem in Taken:
+            Stem, Index = f"{Name}_{Index}", Index + 1
+        Taken.add(Stem)
+        Stems[FilePath] = Stem
+        print(f"{FilePath}: shares its name with other inputs, written as {Stem}", flush = True)
+    return Stems
+
+##############################################################################################################################
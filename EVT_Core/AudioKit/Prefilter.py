@@ -0,0 +1,163 @@
+import os
+import argparse
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .IO import soundfile, ReadWavInfo
+from .Decode import SampleWidths, Probe
+
+##############################################################################################################################
+
+# Subtypes of the PCM codecs ffprobe reports: {Codec: Subtype}
+CodecSubtypes = {
+    'pcm_u8': 'PCM_U8',
+    'pcm_s16le': 'PCM_16',
+    'pcm_s24le': 'PCM_24',
+    'pcm_s32le': 'PCM_32',
+    'pcm_f32le': 'FLOAT',
+    'pcm_f64le': 'DOUBLE'
+}
+
+# Verdicts of the scan, in the order they are reported
+Verdicts = ['Process', 'Conforming', 'TooShort', 'Unreadable']
+
+##############################################################################################################################
+
+def ReadHeader(FilePath: str):
+    '''
+    Format of an audio or media file read from its header only: Duration (s), SampleRate, Channels, Codec and Subtype (None if unknown)
+    '''
+    if soundfile is not None:
+        try:
+            Info = soundfile.info(FilePath)
+            return {
+                'Duration': Info.frames / Info.samplerate,
+                'SampleRate': Info.samplerate,
+                'Channels': Info.channels,
+                'Codec': Info.format.lower(),
+                'Subtype': Info.subtype
+            }
+        except Exception:
+            pass # Left to ffprobe, video containers for example
+    if Path(FilePath).suffix.lower() == '.wav':
+        try:
+            Info = ReadWavInfo(FilePath)
+            return {
+                'Duration': Info['Frames'] / Info['SampleRate'],
+                'SampleRate': Info['SampleRate'],
+                'Channels': Info['Channels'],
+                'Codec': 'wav',
+                'Subtype': Info['Subtype']
+            }
+        except Exception:
+            pass
+    Info = Probe(FilePath)
+    return {
+        'Duration': Info['Duration'],
+        'SampleRate': Info['SampleRate'],
+        'Channels': Info['Channels'],
+        'Codec': Info['Codec'],
+        'Subtype': CodecSubtypes.get(Info['Codec']) if Path(FilePath).suffix.lower() == '.wav' else None
+    }
+
+
+def ScanHeaders(Files: list, Workers: Optional[int] = None):
+    '''
+    Read the headers of many files at once, returns {FilePath: header or Exception}
+    '''
+    def Read(FilePath: str):
+        try:
+            return ReadHeader(FilePath)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers = max(1, min(Workers or 4 * (os.cpu_count() or 1), len(Files) or 1))) as Executor:
+        return dict(zip(Files, Executor.map(Read, Files)))
+
+
+def Judge(
+    Header: object,
+    Audio_Length_Min: Optional[int] = None,
+    SampleRate: Optional[int] = None,
+    ToMono: bool = False,
+    SampleWidth: Optional[str] = None,
+    Media_Format_Output: Optional[str] = None,
+    Suffix: str = ''
+):
+    '''
+    Tell what to do with a file from its header: 'Unreadable', 'TooShort' (shorter than Audio_Length_Min in ms),
+    'Conforming' (already in the output format, nothing to convert) or 'Process'.
+    Leave Media_Format_Output as None when the files are denoised or sliced, as then they all need decoding anyway
+    '''
+    if isinstance(Header, Exception):
+        return 'Unreadable'
+    if Audio_Length_Min is not None and Header['Duration'] * 1000 < Audio_Length_Min:
+        return 'TooShort'
+    if Media_Format_Output is None:
+        return 'Process'
+    Conforming = (
+        Suffix.lower().lstrip('.') == Media_Format_Output.lower().lstrip('.') and
+        (SampleRate is None or Header['SampleRate'] == SampleRate) and
+        (not ToMono or Header['Channels'] == 1) and
+        (SampleWidth is None or Header['Subtype'] == SampleWidths.get(str(SampleWidth)))
+    )
+    return 'Conforming' if Conforming else 'Process'
+
+
+def Prefilter(
+    Files: list,
+    Audio_Length_Min: Optional[int] = None,
+    SampleRate: Optional[int] = None,
+    ToMono: bool = False,
+    SampleWidth: Optional[str] = None,
+    Media_Format_Output: Optional[str] = None,
+    Workers: Optional[int] = None
+):
+    '''
+    Sort files by their headers before anything is decoded, returns ({Verdict: files}, {FilePath: header or Exception})
+    '''
+    Headers = ScanHeaders(Files, Workers)
+    Groups = {Verdict: [] for Verdict in Verdicts}
+    for FilePath, Header in Headers.items():
+        Groups[Judge(Header, Audio_Length_Min, SampleRate, ToMono, SampleWidth, Media_Format_Output, Path(FilePath).suffix)].append(FilePath)
+    return Groups, Headers
+
+
+def Summarize(Groups: dict, Headers: dict):
+    '''
+    Lines reporting how many files (and how much audio) each verdict got
+    '''
+    Lines = []
+    for Verdict in Verdicts:
+        Duration = sum(Headers[FilePath]['Duration'] for FilePath in Groups[Verdict] if not isinstance(Headers[FilePath], Exception))
+        Lines.append(f"{Verdict:>10}: {len(Groups[Verdict]):>6} file(s), {Duration / 60:>9.1f} min")
+    for FilePath in Groups['Unreadable']:
+        Lines.append(f"{'':>10}  {FilePath}: {Headers[FilePath]}")
+    return Lines
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Prefilter", description = "Sort input files by their headers before decoding them")
+    parser.add_argument("inputs",         nargs = '+', help = "media files or dirs of them")
+    parser.add_argument("--workers",      help = "headers read at once", type = int, default = None)
+    parser.add_argument("--min-length",   help = "shortest file kept in ms", type = int, default = None)
+    parser.add_argument("--sample-rate",  help = "sample rate of the output", type = int, default = None)
+    parser.add_argument("--mono",         help = "the output is mono", action = "store_true")
+    parser.add_argument("--sample-width", help = "sample width of the output", choices = list(SampleWidths.keys()), default = None)
+    parser.add_argument("--format",       help = "format of the output, leave out if the files are denoised or sliced", default = None)
+    parser.add_argument("--table",        help = "also print the header of every file", action = "store_true")
+    args = parser.parse_args()
+
+    Files = []
+    for Input in args.inputs:
+        Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.is_file()) if Path(Input).is_dir() else [Input])
+    Groups, Headers = Prefilter(Files, args.min_length, args.sample_rate, args.mono, args.sample_width, args.format, args.workers)
+    if args.table:
+        Verdict = {FilePath: Verdict for Verdict, Paths in Groups.items() for FilePath in Paths}
+        for FilePath, Header in Headers.items():
+            if not isinstance(Header, Exception):
+                print(f"{Verdict[FilePath]:>10} {Header['Duration']:>9.2f}s {Header['SampleRate']:>6} Hz {Header['Channels']:>2} ch {Header['Codec']:>10} {Header['Subtype'] or '-':>7}  {FilePath}", flush = True)
+    print('\n'.join(Summarize(Groups, Headers)), flush = True)
+
+##############################################################################################################################
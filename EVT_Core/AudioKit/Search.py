@@ -0,0 +1,170 @@
+import numpy as np
+from typing import Optional
+
+##############################################################################################################################
+
+# Reference sets from this size on are searched through an IVF index unless told otherwise
+DefaultANNSize = 4096
+
+##############################################################################################################################
+
+def Normalize(Embeddings: np.ndarray):
+    Embeddings = np.asarray(Embeddings, dtype = np.float32)
+    return Embeddings / np.maximum(np.linalg.norm(Embeddings, axis = -1, keepdims = True), 1e-12)
+
+
+def ScoreChunks(Queries: np.ndarray, References: np.ndarray, ChunkSize: int = 4096, MaxScores: int = 1 << 24):
+    '''
+    Cosine similarity of queries to references as one matrix multiply per chunk of queries, yields (start, scores).
+    Chunks hold at most ChunkSize queries and MaxScores scores, so that large reference sets don't blow up memory
+    '''
+    References = Normalize(References)
+    ChunkSize = max(1, min(ChunkSize, MaxScores // max(1, len(References))))
+    for Start in range(0, len(Queries), ChunkSize):
+        yield Start, Normalize(Queries[Start : Start + ChunkSize]) @ References.T
+
+
+def Similarities(Queries: np.ndarray, References: np.ndarray, ChunkSize: int = 4096, DType: str = 'float32'):
+    '''
+    Full (queries, references) cosine similarity matrix, filled chunk by chunk so that only one chunk is ever held as float32
+    '''
+    Matrix = np.empty((len(Queries), len(References)), dtype = DType)
+    for Start, Scores in ScoreChunks(Queries, References, ChunkSize):
+        Matrix[Start : Start + len(Scores)] = Scores
+    return Matrix
+
+
+def TopK(Scores: np.ndarray, K: int):
+    '''
+    Best K columns of every row, sorted, as (scores, indexes)
+    '''
+    K = min(K, Scores.shape[1])
+    if K == 0:
+        return np.zeros((len(Scores), 0), dtype = np.float32), np.zeros((len(Scores), 0), dtype = np.int64)
+    Indexes = np.argpartition(Scores, -K, axis = 1)[:, -K:] if K < Scores.shape[1] else np.tile(np.arange(Scores.shape[1]), (len(Scores), 1))
+    Top = np.take_along_axis(Scores, Indexes, axis = 1)
+    Order = np.argsort(-Top, axis = 1, kind = 'stable')
+    return np.take_along_axis(Top, Order, axis = 1), np.take_along_axis(Indexes, Order, axis = 1)
+
+
+def Within(Scores: np.ndarray, Indexes: np.ndarray, Threshold: float):
+    '''
+    The (query, reference, score) hits of top-k results that reach the threshold
+    '''
+    Queries, Ranks = np.nonzero(Scores >= Threshold)
+    return [(Query, Index, Score) for Query, Index, Score in zip(Queries.tolist(), Indexes[Queries, Ranks].tolist(), Scores[Queries, Ranks].tolist())]
+
+##############################################################################################################################
+
+class ExactIndex:
+    '''
+    Brute-force cosine search over the references, chunked matrix multiplies
+    '''
+    def __init__(self, References: np.ndarray, ChunkSize: int = 4096):
+        self.References = Normalize(References)
+        self.ChunkSize = ChunkSize
+
+    def __len__(self):
+        return len(self.References)
+
+    def search(self, Queries: np.ndarray, K: int = 1):
+        '''
+        Top-k references of every query as (scores, indexes) of shape (queries, k)
+        '''
+        Results = [TopK(Scores, K) for _, Scores in ScoreChunks(Queries, self.References, self.ChunkSize)]
+        if not Results:
+            return np.zeros((0, min(K, len(self))), dtype = np.float32), np.zeros((0, min(K, len(self))), dtype = np.int64)
+        return np.concatenate([Scores for Scores, _ in Results]), np.concatenate([Indexes for _, Indexes in Results])
+
+    def within(self, Queries: np.ndarray, Threshold: float, K: int = 10):
+        return Within(*self.search(Queries, K), Threshold)
+
+
+class IVFIndex:
+    '''
+    Approximate cosine search for large reference sets: the references are clustered by spherical k-means into Lists
+    inverted lists, and a query only scores the references of the Probes lists whose centroids are closest to it.
+    Queries are grouped by the lists they probe, so every list is scored against all its queries in one matrix multiply
+    '''
+    def __init__(self,
+        References: np.ndarray,
+        Lists: Optional[int] = None,
+        Probes: int = 8,
+        Iterations: int = 10,
+        SampleSize: int = 65536,
+        ChunkSize: int = 4096,
+        Seed: int = 0
+    ):
+        self.References = Normalize(References)
+        self.Lists = max(1, min(Lists or int(np.sqrt(len(self.References))), len(self.References)))
+        self.Probes = max(1, min(Probes, self.Lists))
+        self.ChunkSize = ChunkSize
+        Rng = np.random.default_rng(Seed)
+        Sample = self.References[Rng.choice(len(self.References), min(SampleSize, len(self.References)), replace = False)]
+        self.Centroids = Sample[Rng.choice(len(Sample), self.Lists, replace = False)]
+        for _ in range(Iterations):
+            Assigned = (Sample @ self.Centroids.T).argmax(axis = 1)
+            Sums = np.zeros_like(self.Centroids)
+            np.add.at(Sums, Assigned, Sample)
+            Empty = np.bincount(Assigned, minlength = self.Lists) == 0
+            Sums[Empty] = Sample[Rng.choice(len(Sample), int(Empty.sum()))] # Restart empty lists from random references
+            self.Centroids = Normalize(Sums)
+        Assigned = np.concatenate([Scores.argmax(axis = 1) for _, Scores in ScoreChunks(self.References, self.Centroids, ChunkSize)])
+        Order = np.argsort(Assigned, kind = 'stable')
+        self.Members = np.split(Order, np.cumsum(np.bincount(Assigned, minlength = self.Lists))[:-1])
+
+    def __len__(self):
+        return len(self.References)
+
+    def search(self, Queries: np.ndarray, K: int = 1, Probes: Optional[int] = None):
+        '''
+        Approximate top-k references of every query as (scores, indexes) of shape (queries, k), -inf and -1 where fewer were found
+        '''
+        Probes = max(1, min(Probes or self.Probes, self.Lists))
+        K = min(K, len(self))
+        AllScores, AllIndexes = [], []
+        for Start in range(0, len(Queries), self.ChunkSize):
+            Chunk = Normalize(Queries[Start : Start + self.ChunkSize])
+            Probed = TopK(Chunk @ self.Centroids.T, Probes)[1]
+            BestScores = np.full((len(Chunk), K), -np.inf, dtype = np.float32)
+            BestIndexes = np.full((len(Chunk), K), -1, dtype = np.int64)
+            for List in np.unique(Probed).tolist():
+                Members = self.Members[List]
+                if len(Members) == 0:
+                    continue
+                Rows = np.nonzero((Probed == List).any(axis = 1))[0]
+                Scores, Indexes = TopK(Chunk[Rows] @ self.References[Members].T, K)
+                Scores = np.concatenate([BestScores[Rows], Scores], axis = 1) # Merged with what earlier lists found
+                Indexes = np.concatenate([BestIndexes[Rows], Members[Indexes]], axis = 1)
+                Scores, Picked = TopK(Scores, K)
+                BestScores[Rows], BestIndexes[Rows] = Scores, np.take_along_axis(Indexes, Picked, axis = 1)
+            AllScores.append(BestScores)
+            AllIndexes.append(BestIndexes)
+        if not AllScores:
+            return np.zeros((0, K), dtype = np.float32), np.zeros((0, K), dtype = np.int64)
+        return np.concatenate(AllScores), np.concatenate(AllIndexes)
+
+    def within(self, Queries: np.ndarray, Threshold: float, K: int = 10):
+        return Within(*self.search(Queries, K), Threshold)
+
+
+def BuildIndex(References: np.ndarray, ANNSize: Optional[int] = DefaultANNSize, **Options):
+    '''
+    Exact search for small reference sets, an IVF index from ANNSize references on (None to always search exactly)
+    '''
+    if ANNSize is None or len(References) < ANNSize:
+        return ExactIndex(References, **{Name: Value for Name, Value in Options.items() if Name == 'ChunkSize'})
+    return IVFIndex(References, **Options)
+
+
+def Recall(Index: object, Queries: np.ndarray, K: int = 1, Exact: Optional[ExactIndex] = None, **Options):
+    '''
+    Share of the exact top-k references of the queries that the index also returns (Options go to its search)
+    '''
+    Expected = (Exact or ExactIndex(Index.References)).search(Queries, K)[1]
+    Found = Index.search(Queries, K, **Options)[1]
+    if Expected.size == 0:
+        return 1.
+    return float(np.mean([len(np.intersect1d(Row, Other)) / len(Row) for Row, Other in zip(Expected, Found)]))
+
+##############################################################################################################################
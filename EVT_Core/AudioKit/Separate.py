@@ -0,0 +1,229 @@
+import os
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+##############################################################################################################################
+
+# Sessions kept for the whole job: {(ModelPath, IntraThreads, InterThreads): Session}
+Sessions = {}
+
+
+def DefaultThreads():
+    return int(os.environ.get('EVT_NUM_THREADS') or os.cpu_count() or 1)
+
+
+class OnnxSession:
+    '''
+    ONNX Runtime session of a spectrogram model, with its thread settings
+    '''
+    def __init__(self, ModelPath: str, IntraThreads: int, InterThreads: int):
+        import onnxruntime
+        Options = onnxruntime.SessionOptions()
+        Options.intra_op_num_threads = IntraThreads
+        Options.inter_op_num_threads = InterThreads
+        Options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL if InterThreads > 1 else onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        Options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        Providers = [Provider for Provider in ['CUDAExecutionProvider', 'CPUExecutionProvider'] if Provider in onnxruntime.get_available_providers()]
+        self.Session = onnxruntime.InferenceSession(ModelPath, sess_options = Options, providers = Providers)
+        self.InputName = self.Session.get_inputs()[0].name
+        self.InputShape = self.Session.get_inputs()[0].shape
+
+    def run(self, Spec: np.ndarray):
+        return self.Session.run(None, {self.InputName: Spec})[0]
+
+
+class TorchSession:
+    '''
+    TorchScript session of a spectrogram model, with its thread settings
+    '''
+    def __init__(self, ModelPath: str, IntraThreads: int, InterThreads: int):
+        import torch
+        torch.set_num_threads(IntraThreads)
+        try:
+            torch.set_num_interop_threads(InterThreads)
+        except RuntimeError:
+            pass # Can only be set before the first parallel work of the process
+        try:
+            self.Model = torch.jit.load(ModelPath, map_location = 'cpu').eval()
+        except RuntimeError:
+            raise Exception(f"{ModelPath} is not a TorchScript model, checkpoints of the VR architecture are run by the AudioProcessor")
+        self.Device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.Model.to(self.Device)
+        self.InputShape = None
+
+    def run(self, Spec: np.ndarray):
+        import torch
+        with torch.inference_mode():
+            return self.Model(torch.from_numpy(Spec).to(self.Device)).float().cpu().numpy()
+
+
+def GetSession(ModelPath: str, IntraThreads: Optional[int] = None, InterThreads: int = 1):
+    '''
+    Return the session of a model, creating it only the first time it is asked for in this process
+    '''
+    IntraThreads = IntraThreads or DefaultThreads()
+    Key = (Path(ModelPath).resolve().as_posix(), IntraThreads, InterThreads)
+    if Key not in Sessions:
+        Sessions[Key] = (OnnxSession if Path(ModelPath).suffix.lower() == '.onnx' else TorchSession)(ModelPath, IntraThreads, InterThreads)
+    return Sessions[Key]
+
+##############################################################################################################################
+
+def Resample(Audio: np.ndarray, FromRate: int, ToRate: int):
+    '''
+    Band-limited resampling of (frames, channels) audio through the FFT
+    '''
+    if FromRate == ToRate or len(Audio) == 0:
+        return Audio
+    Length = round(len(Audio) * ToRate / FromRate)
+    Spectrum = np.fft.rfft(Audio, axis = 0)
+    Bins = Length // 2 + 1
+    Spectrum = Spectrum[:Bins] if Bins <= len(Spectrum) else np.concatenate([Spectrum, np.zeros((Bins - len(Spectrum),) + Spectrum.shape[1:], dtype = Spectrum.dtype)])
+    return (np.fft.irfft(Spectrum, n = Length, axis = 0) * (Length / len(Audio))).astype(np.float32)
+
+
+def OverlapAdd(Output: np.ndarray, Frames: np.ndarray, StartFrame: int, Hop: int):
+    '''
+    Add frames (..., count, size) into Output (..., samples) with frame k starting at (StartFrame + k) * Hop,
+    a slice per hop instead of per frame when the frame size is a multiple of the hop
+    '''
+    Count, Size = Frames.shape[-2:]
+    if Size % Hop != 0 or Output.shape[-1] % Hop != 0:
+        for Index in range(Count):
+            Output[..., (StartFrame + Index) * Hop : (StartFrame + Index) * Hop + Size] += Frames[..., Index, :]
+        return Output
+    Hops = Output.reshape(Output.shape[:-1] + (-1, Hop))
+    Parts = Frames.reshape(Frames.shape[:-1] + (Size // Hop, Hop))
+    for Part in range(Size // Hop):
+        Hops[..., StartFrame + Part : StartFrame + Part + Count, :] += Parts[..., Part, :]
+    return Output
+
+
+class Separator:
+    '''
+    MDX-Net style separation (UVR-MDX models, the FoxJoy dereverb model) with one cached session per model.
+    Audio is cut into overlapping chunks, chunks of any number of clips and files are run through the model
+    BatchSize at a time, and the chunk outputs are overlap-added back with crossfade weights
+    '''
+    def __init__(self,
+        ModelPath: str,
+        Target: str = 'Vocal',
+        BatchSize: int = 4,
+        Overlap: float = 0.25,
+        IntraThreads: Optional[int] = None,
+        InterThreads: int = 1,
+        NFFT: Optional[int] = None,
+        Hop: int = 1024,
+        DimF: Optional[int] = None,
+        DimT: Optional[int] = None,
+        Stem: Optional[str] = None,
+        SampleRate: int = 44100,
+        Symmetric: bool = False
+    ):
+        self.Session = GetSession(ModelPath, IntraThreads, InterThreads)
+        Shape = getattr(self.Session, 'InputShape', None) or [None, 4, None, None]
+        self.DimF = DimF or (Shape[2] if isinstance(Shape[2], int) else 3072)
+        self.DimT = DimT or (Shape[3] if isinstance(Shape[3], int) else 256)
+        self.NFFT = NFFT or 2 * self.DimF
+        self.Hop = Hop
+        self.Bins = self.NFFT // 2 + 1
+        self.ChunkSize = Hop * (self.DimT - 1)
+        self.Trim = self.NFFT // 2
+        self.GenSize = self.ChunkSize - 2 * self.Trim
+        self.Step = max(1, round(self.GenSize * (1 - Overlap)))
+        self.Window = np.hanning(self.NFFT + 1)[:-1].astype(np.float32) # Periodic
+        self.Weights = self.getWeights()
+        self.Target = Target
+        self.Stem = Stem or ('Instrumental' if 'dereverb' in Path(ModelPath).as_posix().lower() else 'Vocal') # What the model predicts
+        self.SampleRate = SampleRate
+        self.BatchSize = max(1, BatchSize)
+        self.Symmetric = Symmetric
+
+    def getWeights(self):
+        Ramp = self.GenSize - self.Step
+        Weights = np.ones(self.GenSize, dtype = np.float32)
+        if Ramp > 0:
+            Weights[:Ramp] = (np.arange(Ramp) + 1) / (Ramp + 1)
+            Weights[-Ramp:] = Weights[:Ramp][::-1]
+        return Weights
+
+    def stft(self, Waves: np.ndarray):
+        '''
+        (batch, 2, ChunkSize) waves to (batch, 4, DimF, DimT) spectrograms, laid out as torch.stft(center = True) does
+        '''
+        Padded = np.pad(Waves, ((0, 0), (0, 0), (self.Trim, self.Trim)), mode = 'reflect')
+        Frames = np.lib.stride_tricks.sliding_window_view(Padded, self.NFFT, axis = -1)[:, :, ::self.Hop] * self.Window
+        Spec = np.fft.rfft(Frames, axis = -1).transpose(0, 1, 3, 2)[:, :, :self.DimF] # (batch, 2, DimF, DimT)
+        return np.stack([Spec.real, Spec.imag], axis = 2).reshape(len(Waves), 4, self.DimF, self.DimT).astype(np.float32)
+
+    def istft(self, Spec: np.ndarray):
+        '''
+        (batch, 4, DimF, DimT) spectrograms back to (batch, 2, ChunkSize) waves
+        '''
+        Spec = Spec.reshape(len(Spec), 2, 2, self.DimF, self.DimT)
+        Spec = np.pad(Spec[:, :, 0] + 1j * Spec[:, :, 1], ((0, 0), (0, 0), (0, self.Bins - self.DimF), (0, 0)))
+        Frames = np.fft.irfft(Spec.transpose(0, 1, 3, 2), n = self.NFFT, axis = -1) * self.Window # (batch, 2, DimT, NFFT)
+        Length = self.NFFT + self.Hop * (self.DimT - 1)
+        Waves = OverlapAdd(np.zeros((len(Spec), 2, Length), dtype = np.float64), Frames, 0, self.Hop)
+        Envelope = OverlapAdd(np.zeros(Length, dtype = np.float64), np.tile(self.Window ** 2, (self.DimT, 1)), 0, self.Hop)
+        Waves /= np.where(Envelope > 1e-11, Envelope, 1.)
+        return Waves[:, :, self.Trim : self.Trim + self.ChunkSize].astype(np.float32)
+
+    def runBatch(self, Waves: np.ndarray):
+        Spec = self.stft(Waves)
+        if self.Symmetric:
+            Pred = self.Session.run(Spec) * 0.5 - self.Session.run(-Spec) * 0.5
+        else:
+            Pred = self.Session.run(Spec)
+        return self.istft(Pred)
+
+    def separateMany(self, Items: list, SampleRate: int):
+        '''
+        Separate a list of (frames, channels) clips together, sharing batches between them
+        '''
+        Prepared = []
+        for Audio in Items:
+            Audio = Audio.reshape(-1, 1) if Audio.ndim == 1 else Audio
+            Stereo = np.repeat(Audio, 2, axis = 1) if Audio.shape[1] == 1 else Audio[:, :2]
+            Prepared.append(Resample(Stereo.astype(np.float32), SampleRate, self.SampleRate).T) # (2, samples)
+        # Every chunk covers GenSize samples of its clip, with Trim samples of context on both sides
+        Chunks = []
+        for ItemIndex, Mix in enumerate(Prepared):
+            Length = Mix.shape[1]
+            for Position in range(0, max(Length, 1), self.Step):
+                Chunks.append((ItemIndex, Position))
+                if Position + self.GenSize >= Length:
+                    break
+        Outputs = [np.zeros((2, Mix.shape[1] + self.GenSize), dtype = np.float32) for Mix in Prepared]
+        Totals = [np.zeros(Mix.shape[1] + self.GenSize, dtype = np.float32) for Mix in Prepared]
+        for Start in range(0, len(Chunks), self.BatchSize):
+            Batch = Chunks[Start : Start + self.BatchSize]
+            Waves = np.zeros((len(Batch), 2, self.ChunkSize), dtype = np.float32)
+            for Index, (ItemIndex, Position) in enumerate(Batch):
+                Mix = Prepared[ItemIndex]
+                Begin, End = Position - self.Trim, min(Position - self.Trim + self.ChunkSize, Mix.shape[1])
+                Waves[Index, :, max(0, -Begin) : End - Begin] = Mix[:, max(0, Begin) : End]
+            Results = self.runBatch(Waves)
+            for Index, (ItemIndex, Position) in enumerate(Batch):
+                Outputs[ItemIndex][:, Position : Position + self.GenSize] += Results[Index, :, self.Trim : self.Trim + self.GenSize] * self.Weights
+                Totals[ItemIndex][Position : Position + self.GenSize] += self.Weights
+        Separated = []
+        for Audio, Mix, Output, Total in zip(Items, Prepared, Outputs, Totals):
+            Length = Mix.shape[1]
+            Pred = Output[:, :Length] / np.where(Total[:Length] > 0, Total[:Length], 1.)
+            Result = Pred if self.Stem == self.Target else Mix - Pred
+            Result = Resample(Result.T, self.SampleRate, SampleRate)[:len(Audio)]
+            Separated.append(Result.mean(axis = 1, keepdims = True) if Audio.ndim == 1 or Audio.shape[1] == 1 else Result)
+        return [Result.reshape(-1) if Audio.ndim == 1 else Result for Audio, Result in zip(Items, Separated)]
+
+    def __call__(self, Audio: np.ndarray, SampleRate: int):
+        return self.separateMany([Audio], SampleRate)[0]
+
+
+def LoadSeparator(ModelPath: Optional[str], Target: str = 'Vocal', **Options):
+    if ModelPath is None or not Path(ModelPath).exists():
+        raise Exception(f"Model not found: {ModelPath}")
+    return Separator(ModelPath, Target, **Options)
+
+##############################################################################################################################
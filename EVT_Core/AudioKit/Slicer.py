@@ -0,0 +1,370 @@
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from .IO import Subtypes, AudioReader, AudioWriter, WavView, WavBytes, OutputStems
+from .Archive import ShardWriter
+
+##############################################################################################################################
+
+def FrameRMS(Padded: np.ndarray, WinSize: int, HopSize: int, Count: Optional[int] = None, ChunkFrames: int = 4096):
+    '''
+    RMS of the frames of a padded signal, frame k covering Padded[k * HopSize : k * HopSize + WinSize],
+    the samples are squared once and the frames are strided views over the squares summed a chunk at a time
+    '''
+    Count = max(0, (len(Padded) - WinSize) // HopSize + 1) if Count is None else Count
+    Squares = np.square(Padded[:(Count - 1) * HopSize + WinSize] if Count > 0 else Padded[:0])
+    RMS = np.empty(Count, dtype = np.float32)
+    for Start in range(0, Count, ChunkFrames):
+        Stop = min(Start + ChunkFrames, Count)
+        Frames = np.lib.stride_tricks.as_strided(
+            Squares[Start * HopSize:],
+            shape = (Stop - Start, WinSize),
+            strides = (Squares.strides[0] * HopSize, Squares.strides[0]),
+            writeable = False
+        )
+        RMS[Start:Stop] = np.sqrt(Frames.sum(axis = 1) / WinSize)
+    return RMS
+
+
+def SilentRuns(Silent: np.ndarray):
+    '''
+    Run-length encode a mask of silent frames into the starts and ends of its silent runs
+    '''
+    Edges = np.flatnonzero(np.diff(Silent.astype(np.int8), prepend = np.int8(0), append = np.int8(0)))
+    return Edges[0::2], Edges[1::2]
+
+
+def getRMS(Samples: np.ndarray, WinSize: int, HopSize: int):
+    '''
+    RMS of centered frames (the signal is padded with half a window of zeros on both sides)
+    '''
+    Padded = np.pad(Samples.astype(np.float32, copy = False), (WinSize // 2, WinSize // 2), mode = 'constant')
+    return FrameRMS(Padded, WinSize, HopSize)
+
+##############################################################################################################################
+
+class Slicer:
+    '''
+    Cut a recording at its silent parts (ported from openvpi/audio-slicer), all times are in milliseconds
+    '''
+    def __init__(self,
+        SampleRate: int,
+        Threshold: float = -40.,
+        Audio_Length_Min: int = 5000,
+        Silent_Interval_Min: int = 300,
+        Hop_Size: int = 20,
+        Silence_Kept_Max: int = 5000
+    ):
+        if not Audio_Length_Min >= Silent_Interval_Min >= Hop_Size:
+            raise Exception("Audio_Length_Min >= Silent_Interval_Min >= Hop_Size must hold")
+        if not Silence_Kept_Max >= Hop_Size:
+            raise Exception("Silence_Kept_Max >= Hop_Size must hold")
+        Interval = SampleRate * Silent_Interval_Min / 1000
+        self.SampleRate = SampleRate
+        self.Threshold = 10 ** (Threshold / 20.)
+        self.HopSize = round(SampleRate * Hop_Size / 1000)
+        self.WinSize = min(round(Interval), 4 * self.HopSize)
+        self.LengthMin = round(SampleRate * Audio_Length_Min / 1000 / self.HopSize)
+        self.IntervalMin = round(Interval / self.HopSize)
+        self.KeptMax = round(SampleRate * Silence_Kept_Max / 1000 / self.HopSize)
+
+    def getTags(self, RMSList: np.ndarray):
+        '''
+        Return the ranges of frames to cut away, visiting only the silent runs that can lead to a cut
+        '''
+        ArgMin = lambda Begin, End: int(RMSList[Begin : End + 1].argmin()) + Begin
+        Total = RMSList.shape[0]
+        Starts, Ends = SilentRuns(RMSList < self.Threshold)
+        Candidates = (Ends - Starts >= self.IntervalMin) | (Starts == 0) | (Ends == Total)
+        Tags = []
+        ClipStart = 0
+        for Start, End in zip(Starts[Candidates].tolist(), Ends[Candidates].tolist()):
+            Tag = self.getTrailingTag(Start, Total, ArgMin) if End == Total else self.checkSilence(Start, End, ClipStart, ArgMin)
+            if Tag is not None:
+                Tags.append(Tag)
+                ClipStart = Tag[1]
+        return Tags
+
+    def checkSilence(self, SilenceStart: int, Index: int, ClipStart: int, ArgMin: object):
+        '''
+        Return the tag of a silence that ended at the given frame, or None if it is not to be cut at
+        '''
+        IsLeadingSilence = SilenceStart == 0 and Index > self.KeptMax
+        NeedSliceMiddle = Index - SilenceStart >= self.IntervalMin and Index - ClipStart >= self.LengthMin
+        return self.getTag(SilenceStart, Index, ArgMin) if IsLeadingSilence or NeedSliceMiddle else None
+
+    def getTrailingTag(self, SilenceStart: int, Total: int, ArgMin: object):
+        if Total - SilenceStart < self.IntervalMin:
+            return None
+        return (ArgMin(SilenceStart, min(Total, SilenceStart + self.KeptMax)), Total + 1)
+
+    def getTag(self, SilenceStart: int, Index: int, ArgMin: object):
+        '''
+        Pick the frames to cut away from a silence that ended at the given frame,
+        ArgMin(Begin, End) gives the quietest frame in [Begin, End]
+        '''
+        if Index - SilenceStart <= self.KeptMax:
+            Pos = ArgMin(SilenceStart, Index)
+            return (0, Pos) if SilenceStart == 0 else (Pos, Pos)
+        PosL = ArgMin(SilenceStart, SilenceStart + self.KeptMax) if SilenceStart != 0 else None
+        PosR = ArgMin(Index - self.KeptMax, Index)
+        if SilenceStart == 0:
+            return (0, PosR)
+        if Index - SilenceStart <= self.KeptMax * 2:
+            Pos = ArgMin(Index - self.KeptMax, SilenceStart + self.KeptMax)
+            return (min(PosL, Pos), max(PosR, Pos))
+        return (PosL, PosR)
+
+    def getRanges(self, Samples: np.ndarray):
+        '''
+        Return the [Begin, End) sample ranges of the clips of a mono signal
+        '''
+        Length = Samples.shape[0]
+        if (Length + self.HopSize - 1) // self.HopSize <= self.LengthMin:
+            return [(0, Length)]
+        RMSList = getRMS(Samples, self.WinSize, self.HopSize)
+        return TagsToRanges(self.getTags(RMSList), RMSList.shape[0], self.HopSize, Length)
+
+    def slice(self, Waveform: np.ndarray):
+        '''
+        Cut a waveform of shape (samples,) or (samples, channels) into clips
+        '''
+        Samples = Waveform.mean(axis = 1) if Waveform.ndim > 1 else Waveform
+        return [Waveform[Begin:End] for Begin, End in self.getRanges(Samples)]
+
+
+def TagsToRanges(Tags: list, Total: int, HopSize: int, Length: int):
+    if len(Tags) == 0:
+        return [(0, Length)]
+    Ranges = []
+    if Tags[0][0] > 0:
+        Ranges.append((0, Tags[0][0]))
+    for Index in range(len(Tags) - 1):
+        Ranges.append((Tags[Index][1], Tags[Index + 1][0]))
+    if Tags[-1][1] < Total:
+        Ranges.append((Tags[-1][1], Total))
+    return [(Begin * HopSize, min(Length, End * HopSize)) for Begin, End in Ranges]
+
+##############################################################################################################################
+
+class StreamingSlicer(Slicer):
+    '''
+    Slicer fed block by block, giving out each clip as soon as its end is known.
+    Only the samples of the window being worked on and the RMS frames of the current silence are kept,
+    so memory doesn't grow with the length of the recording, and the clips are the same as Slicer's
+    '''
+    def __init__(self, SampleRate: int, **Params):
+        super().__init__(SampleRate, **Params)
+        self.Buffer = np.zeros(self.WinSize // 2, dtype = np.float32) # Padded samples from frame NextFrame on
+        self.Length = 0
+        self.NextFrame = 0
+        self.Frames = np.zeros(0, dtype = np.float32) # RMS frames kept from FramesStart on
+        self.FramesStart = 0
+        self.SilenceStart = None
+        self.LeftPos = None # Quietest frame in [SilenceStart, SilenceStart + KeptMax] once known
+        self.ClipStart = 0
+        self.LastTag = None
+        self.Held = [] # Clips held back until the recording is known not to be too short for slicing
+        self.Released = False
+
+    def argMin(self, Begin: int, End: int):
+        if self.LeftPos is not None and (Begin, End) == (self.SilenceStart, self.SilenceStart + self.KeptMax):
+            return self.LeftPos
+        return int(self.Frames[Begin - self.FramesStart : End - self.FramesStart + 1].argmin()) + Begin
+
+    def endSilence(self, Index: int):
+        Tag = self.checkSilence(self.SilenceStart, Index, self.ClipStart, self.argMin)
+        if Tag is not None:
+            self.ClipStart = Tag[1]
+            self.addTag(Tag)
+        self.SilenceStart = None
+        self.LeftPos = None
+
+    def step(self, RMSList: np.ndarray):
+        '''
+        Take in the next RMS frames, deciding on every silence that ends among them
+        '''
+        Offset = self.FramesStart + len(self.Frames)
+        Count = len(RMSList)
+        if Count == 0:
+            return
+        self.Frames = np.concatenate([self.Frames, RMSList])
+        Starts, Ends = SilentRuns(RMSList < self.Threshold)
+        if self.SilenceStart is not None and (len(Starts) == 0 or Starts[0] > 0):
+            self.endSilence(Offset) # The silence going on ended right at the first frame
+        for Start, End in zip(Starts.tolist(), Ends.tolist()):
+            if self.SilenceStart is None:
+                self.SilenceStart = Offset + Start
+            if End < Count:
+                self.endSilence(Offset + End)
+        # Drop the frames no later decision can look at
+        Next = Offset + Count
+        if self.SilenceStart is None:
+            self.Frames, self.FramesStart = self.Frames[:0], Next
+        else:
+            if self.LeftPos is None and Next - 1 >= self.SilenceStart + self.KeptMax:
+                self.LeftPos = self.argMin(self.SilenceStart, self.SilenceStart + self.KeptMax)
+            if self.LeftPos is not None and Next - self.KeptMax > self.FramesStart:
+                self.Frames = self.Frames[Next - self.KeptMax - self.FramesStart:]
+                self.FramesStart = Next - self.KeptMax
+
+    def addTag(self, Tag: tuple):
+        if self.LastTag is not None:
+            Range = (self.LastTag[1], Tag[0])
+        else:
+            Range = (0, Tag[0]) if Tag[0] > 0 else None
+        self.LastTag = Tag
+        if Range is not None:
+            self.Held.append((Range[0] * self.HopSize, Range[1] * self.HopSize))
+
+    def release(self):
+        if not self.Released and self.Length > self.LengthMin * self.HopSize:
+            self.Released = True
+        if self.Released:
+            Ranges, self.Held = self.Held, []
+            return Ranges
+        return []
+
+    def unneeded(self):
+        '''
+        Return the [Begin, End) samples that no clip still to come can take in, or None.
+        That is the middle of a silence going on that is sure to be cut at, as clips keep at most KeptMax frames of it on either side
+        '''
+        if not self.Released or self.SilenceStart is None:
+            return None
+        if self.SilenceStart > 0 and (self.NextFrame - self.SilenceStart < self.IntervalMin or self.NextFrame - self.ClipStart < self.LengthMin):
+            return None # Might still end up inside a clip
+        Begin, End = self.SilenceStart + self.KeptMax, self.NextFrame - self.KeptMax
+        return (Begin * self.HopSize, End * self.HopSize) if End > Begin else None
+
+    def process(self, Count: int):
+        self.step(FrameRMS(self.Buffer, self.WinSize, self.HopSize, Count))
+        self.NextFrame += Count
+        self.Buffer = self.Buffer[Count * self.HopSize:]
+
+    def feed(self, Block: np.ndarray):
+        '''
+        Take in a block of shape (samples,) or (samples, channels) and return the clips finished so far
+        '''
+        Samples = Block.mean(axis = 1) if Block.ndim > 1 else Block
+        self.Buffer = np.concatenate([self.Buffer, Samples.astype(np.float32, copy = False)])
+        self.Length += len(Samples)
+        self.process(max(0, (len(self.Buffer) - self.WinSize) // self.HopSize + 1))
+        return self.release()
+
+    def finish(self):
+        '''
+        End the recording and return the remaining clips
+        '''
+        self.Buffer = np.concatenate([self.Buffer, np.zeros(self.WinSize // 2, dtype = np.float32)])
+        self.process(max(0, (len(self.Buffer) - self.WinSize) // self.HopSize + 1))
+        if (self.Length + self.HopSize - 1) // self.HopSize <= self.LengthMin:
+            return [(0, self.Length)]
+        Total = self.NextFrame
+        Tag = self.getTrailingTag(self.SilenceStart, Total, self.argMin) if self.SilenceStart is not None else None
+        self.addTag(Tag) if Tag is not None else None
+        if self.LastTag is None:
+            self.Held.append((0, self.Length))
+        elif self.LastTag[1] < Total:
+            self.Held.append((self.LastTag[1] * self.HopSize, Total * self.HopSize))
+        Ranges = [(Begin, min(self.Length, End)) for Begin, End in self.release()]
+        self.Buffer = np.zeros(0, dtype = np.float32)
+        return Ranges
+
+##############################################################################################################################
+
+def SliceFile(
+    InputPath: str,
+    OutputDir: str,
+    Threshold: float = -40.,
+    Audio_Length_Min: int = 5000,
+    Silent_Interval_Min: int = 300,
+    Hop_Size: int = 20,
+    Silence_Kept_Max: int = 5000,
+    BlockSize: int = 65536,
+    Copy: bool = True,
+    Archive: Optional[object] = None,
+    Stem: Optional[str] = None
+):
+    '''
+    Slice an audio file of any length block by block, writing each clip out as soon as it is found.
+    Clips of a WAV file are copied out of it byte for byte unless Copy is off, the audio is only decoded for finding the silence.
+    With an Archive (a ShardWriter) the clips become members of its shards and their names are returned instead of paths
+    '''
+    OutputPaths = []
+    try:
+        View = WavView(InputPath) if Copy else None
+    except Exception:
+        View = None # Not a WAV file the samples can be copied from, clips are re-encoded
+    with AudioReader(InputPath) as Reader:
+        Subtype = Reader.Subtype if Reader.Subtype in Subtypes else 'PCM_16'
+        SlicerItem = StreamingSlicer(
+            Reader.SampleRate,
+            Threshold = Threshold,
+            Audio_Length_Min = Audio_Length_Min,
+            Silent_Interval_Min = Silent_Interval_Min,
+            Hop_Size = Hop_Size,
+            Silence_Kept_Max = Silence_Kept_Max
+        )
+
+        def Write(Ranges: list):
+            for Begin, End in Ranges:
+                if End <= Begin:
+                    continue
+                OutputPath = Path(OutputDir).joinpath(f"{Stem or Path(InputPath).stem}_{len(OutputPaths)}.wav").as_posix()
+                if Archive is not None:
+                    Parts = View.parts(Begin, End) if View is not None else [WavBytes(Reader.read(Begin, End), Reader.SampleRate, Subtype)]
+                    OutputPaths.append(Archive.add(Path(OutputPath).name, *Parts))
+                    continue
+                if View is not None:
+                    OutputPaths.append(View.write(OutputPath, Begin, End))
+                    continue
+                with AudioWriter(OutputPath, Reader.SampleRate, Reader.Channels, Subtype) as Writer:
+                    for Start in range(Begin, End, BlockSize):
+                        Writer.write(Reader.read(Start, min(Start + BlockSize, End)))
+                OutputPaths.append(OutputPath)
+
+        for Block in Reader.blocks(BlockSize):
+            Write(SlicerItem.feed(Block))
+        Write(SlicerItem.finish())
+    View.close() if View is not None else None
+    return OutputPaths
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Slicer", description = "Slice long recordings at their silent parts")
+    parser.add_argument("inputs",                nargs = '+', help = "audio files to slice")
+    parser.add_argument("--output",              help = "dir to write the clips to", required = True)
+    parser.add_argument("--threshold",           help = "RMS threshold in dB", type = float, default = -40.)
+    parser.add_argument("--min-length",          help = "shortest clip in ms", type = int, default = 5000)
+    parser.add_argument("--min-interval",        help = "shortest silence to cut at in ms", type = int, default = 300)
+    parser.add_argument("--hop-size",            help = "frame length in ms", type = int, default = 20)
+    parser.add_argument("--max-silence-kept",    help = "longest silence kept around a clip in ms", type = int, default = 5000)
+    parser.add_argument("--block-size",          help = "samples read at a time", type = int, default = 65536)
+    parser.add_argument("--reencode",            help = "write the clips through the encoder even if they could be copied", action = "store_true")
+    parser.add_argument("--shard-size",          help = "pack the clips into tar shards of at most this many MB instead of a file each", type = float, default = None)
+    args = parser.parse_args()
+
+    Archive = ShardWriter(args.output, MaxSize = args.shard_size) if args.shard_size is not None else None
+    Stems = OutputStems(args.inputs)
+    for InputPath in args.inputs:
+        OutputPaths = SliceFile(
+            InputPath,
+            args.output,
+            Threshold = args.threshold,
+            Audio_Length_Min = args.min_length,
+            Silent_Interval_Min = args.min_interval,
+            Hop_Size = args.hop_size,
+            Silence_Kept_Max = args.max_silence_kept,
+            BlockSize = args.block_size,
+            Copy = not args.reencode,
+            Archive = Archive,
+            Stem = Stems[InputPath]
+        )
+        print(f"{InputPath}: {len(OutputPaths)} clip(s)", flush = True)
+    print(f"Index of the shards: {Archive.close()}", flush = True) if Archive is not None else None
+
+##############################################################################################################################
@@ -0,0 +1,287 @@
+import os
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Optional, Callable
+
+from .Embeddings import EmbeddingStore, BatchEmbedder, FeatureMethods
+from .Search import DefaultANNSize, Normalize, Similarities, BuildIndex
+from .Cache import PCMCache
+
+##############################################################################################################################
+
+# Written next to the speaker data of a run: {AudioSpeakersData_Name}_Similarities.npy and .json
+SimilaritiesSuffix = '_Similarities'
+
+# Audio files that are identified in an input dir
+AudioSuffixes = ['.wav', '.flac', '.mp3', '.aac', '.ogg', '.m4a', '.wma', '.aiff', '.au']
+
+# Speaker profiles are .npz files, given in place of the reference audio of a speaker
+ProfileSuffix = '.npz'
+
+##############################################################################################################################
+
+def SimilaritiesPaths(AudioSpeakersData_Path: str):
+    Stem = Path(AudioSpeakersData_Path).with_suffix('').as_posix() + SimilaritiesSuffix
+    return f"{Stem}.npy", f"{Stem}.json"
+
+
+def SaveSimilarities(AudioSpeakersData_Path: str, Matrix: np.ndarray, Clips: list, Speakers: list, Threshold: Optional[float] = None):
+    '''
+    Keep the clip x speaker similarity matrix of a run as float16 next to its speaker data,
+    so that the speakers can be assigned again at another threshold without the model.
+    The labels also hold the most similar speaker of every clip and its similarity, which is all a new threshold needs
+    '''
+    MatrixPath, LabelsPath = SimilaritiesPaths(AudioSpeakersData_Path)
+    Matrix = np.asarray(Matrix, dtype = np.float16).reshape(len(Clips), len(Speakers))
+    with open(f"{MatrixPath}.tmp", mode = 'wb') as File:
+        np.save(File, Matrix)
+    os.replace(f"{MatrixPath}.tmp", MatrixPath)
+    Best, Scores = BestSpeakers(Matrix)
+    with open(LabelsPath, mode = 'w', encoding = 'utf-8') as File:
+        json.dump({'Clips': Clips, 'Speakers': Speakers, 'Threshold': Threshold, 'Best': Best.tolist(), 'Scores': np.round(Scores, 4).tolist()}, File, ensure_ascii = False)
+    return MatrixPath
+
+
+def LoadSimilarities(AudioSpeakersData_Path: str):
+    '''
+    Return the similarity matrix of a run as a read-only map, its clips and its speakers
+    '''
+    MatrixPath, LabelsPath = SimilaritiesPaths(AudioSpeakersData_Path)
+    with open(LabelsPath, mode = 'r', encoding = 'utf-8') as File:
+        Labels = json.load(File)
+    return np.load(MatrixPath, mmap_mode = 'r'), Labels['Clips'], Labels['Speakers']
+
+
+def BestSpeakers(Matrix: np.ndarray, BlockRows: int = 65536):
+    '''
+    The most similar speaker of every clip and that similarity, taken a block of rows at a time (-1 and 0 without speakers)
+    '''
+    Best = np.full(len(Matrix), -1, dtype = np.int64)
+    Scores = np.zeros(len(Matrix), dtype = np.float32)
+    if Matrix.shape[1] == 0:
+        return Best, Scores
+    for Start in range(0, len(Matrix), BlockRows):
+        Block = np.asarray(Matrix[Start : Start + BlockRows], dtype = np.float32)
+        Best[Start : Start + len(Block)] = Block.argmax(axis = 1)
+        Scores[Start : Start + len(Block)] = Block[np.arange(len(Block)), Best[Start : Start + len(Block)]]
+    return Best, Scores
+
+
+def Assign(Matrix: np.ndarray, Speakers: list, Threshold: float):
+    '''
+    Give every clip the speaker it is most similar to if that similarity reaches the threshold, or '' if none does.
+    Returns the speakers and the similarities
+    '''
+    Best, Similarities = BestSpeakers(Matrix)
+    return [Speakers[Index] if Index >= 0 and Similarity >= Threshold else '' for Index, Similarity in zip(Best.tolist(), Similarities.tolist())], Similarities
+
+
+def WriteAudioSpeakersData(AudioSpeakersData_Path: str, Clips: list, Assigned: list, Similarities: np.ndarray):
+    os.makedirs(Path(AudioSpeakersData_Path).parent, exist_ok = True)
+    with open(AudioSpeakersData_Path, mode = 'w', encoding = 'utf-8') as File:
+        File.writelines(f"{Clip}|{Speaker}|{Similarity:.4f}\n" for Clip, Speaker, Similarity in zip(Clips, Assigned, np.asarray(Similarities).tolist()))
+
+##############################################################################################################################
+
+def IsProfile(FilePath: str):
+    return Path(FilePath).suffix.lower() == ProfileSuffix
+
+
+def Enroll(
+    Name: str,
+    Files: list,
+    Model_Path: str,
+    Feature_Method: str,
+    Duration_of_Audio: float,
+    Embed: Callable,
+    Profile_Path: str,
+    StoreDir: Optional[str] = None,
+    OutlierCut: float = 2.5,
+    BatchSize: int = 1024
+):
+    '''
+    Build the profile of a speaker from many clips: the normalized mean of their embeddings, taken again without the clips
+    that fall more than OutlierCut deviations below the others, and how closely the kept clips gather around it.
+    The profile also records the model, feature method and duration it was made with, returns its path
+    '''
+    Store = EmbeddingStore(Model_Path, Feature_Method, Duration_of_Audio, StoreDir)
+    Embeddings = Store.get(Files, Embed, BatchSize)
+    Embedded = Embeddings.any(axis = 1) # Clips that couldn't be read come back as zero rows
+    Files, Embeddings = [FilePath for FilePath, Done in zip(Files, Embedded.tolist()) if Done], Normalize(Embeddings[Embedded])
+    if len(Embeddings) == 0:
+        raise Exception(f"No clips to enroll {Name} from")
+    Kept = np.ones(len(Embeddings), dtype = bool)
+    Centroid = Normalize(Embeddings.mean(axis = 0))
+    if len(Embeddings) > 2:
+        Scores = Embeddings @ Centroid
+        Kept = Scores >= Scores.mean() - OutlierCut * max(float(Scores.std()), 1e-6)
+        Centroid = Normalize(Embeddings[Kept].mean(axis = 0))
+    Scores = Embeddings[Kept] @ Centroid
+    Meta = dict(
+        Name = Name,
+        Clips = int(Kept.sum()),
+        Dropped = [FilePath for FilePath, Keep in zip(Files, Kept.tolist()) if not Keep],
+        Mean = float(Scores.mean()),
+        Std = float(Scores.std()),
+        Min = float(Scores.min()),
+        **Store.Meta
+    )
+    os.makedirs(Path(Profile_Path).parent, exist_ok = True)
+    with open(f"{Profile_Path}.tmp", mode = 'wb') as File:
+        np.savez(File, Centroid = Centroid.astype(np.float32), Meta = np.array(json.dumps(Meta, ensure_ascii = False)))
+    os.replace(f"{Profile_Path}.tmp", Profile_Path)
+    return Profile_Path
+
+
+def LoadProfile(Profile_Path: str):
+    '''
+    Return the centroid embedding of a speaker profile and what it records
+    '''
+    with np.load(Profile_Path, allow_pickle = False) as Profile:
+        return Profile['Centroid'].astype(np.float32), json.loads(str(Profile['Meta']))
+
+
+def GetReferences(StdAudioSpeaker: dict, Store: EmbeddingStore, Embed: Callable, BatchSize: int = 1024):
+    '''
+    One reference embedding per speaker, from the profile given for it or else from its reference audio
+    '''
+    References = {}
+    for Speaker, FilePath in StdAudioSpeaker.items():
+        if not IsProfile(FilePath):
+            continue
+        Centroid, Meta = LoadProfile(FilePath)
+        if any(Meta.get(Key) != Store.Meta.get(Key) for Key in ['Model_Hash', 'Feature_Method', 'Duration_of_Audio']):
+            raise Exception(f"Profile of {Speaker} ({FilePath}) was made with another model, feature method or duration, enroll the speaker again")
+        References[Speaker] = Centroid
+    Audio = {Speaker: FilePath for Speaker, FilePath in StdAudioSpeaker.items() if Speaker not in References}
+    References.update(zip(Audio.keys(), Store.get(list(Audio.values()), Embed, BatchSize)))
+    for Speaker, FilePath in Audio.items():
+        if not References[Speaker].any():
+            raise Exception(f"Reference audio of {Speaker} ({FilePath}) couldn't be embedded")
+    return np.stack([References[Speaker] for Speaker in StdAudioSpeaker]) if References else np.zeros((0, Store.Meta.get('Dim') or 0), dtype = np.float32)
+
+##############################################################################################################################
+
+def Identify(
+    StdAudioSpeaker: dict,
+    Audio_Dir_Input: str,
+    Model_Path: str,
+    Feature_Method: str,
+    DecisionThreshold: float,
+    Duration_of_Audio: float,
+    Output_Root: str,
+    Output_Dir_Name: str,
+    AudioSpeakersData_Name: str,
+    Embed: Callable,
+    StoreDir: Optional[str] = None,
+    BatchSize: int = 1024,
+    ANNSize: Optional[int] = DefaultANNSize,
+    SaveMatrix: bool = True
+):
+    '''
+    Identify the speakers of the audio in a dir against one reference audio or profile per speaker, taking embeddings from the store
+    and computing only the missing ones with Embed (file paths in, embeddings out) BatchSize files at a time.
+    Unless SaveMatrix is off, the full similarity matrix is computed and saved and the clips are assigned from it, so that
+    rescoring it later at the same threshold gives the same speakers. Without it, clips are matched to the references through
+    one matrix multiply per chunk, or through an IVF index once there are ANNSize references or more.
+    Writes the speaker data (path|speaker|similarity lines), returns its path
+    '''
+    Clips = sorted(File.as_posix() for File in Path(Audio_Dir_Input).rglob('*') if File.suffix.lower() in AudioSuffixes)
+    Speakers = list(StdAudioSpeaker.keys())
+    Store = EmbeddingStore(Model_Path, Feature_Method, Duration_of_Audio, StoreDir)
+    References = GetReferences(StdAudioSpeaker, Store, Embed, BatchSize)
+    Embeddings = Store.get(Clips, Embed, BatchSize)
+    if SaveMatrix:
+        Matrix = Similarities(Embeddings, References, DType = 'float16')
+        Indexes, Scores = BestSpeakers(Matrix)
+    else:
+        Scores, Indexes = BuildIndex(References, ANNSize).search(Embeddings, 1)
+        Scores, Indexes = (Scores[:, 0], Indexes[:, 0]) if len(Speakers) else (np.zeros(len(Clips), dtype = np.float32), np.full(len(Clips), -1))
+    Embedded = Embeddings.any(axis = 1) # Clips that couldn't be read are zero rows
+    Assigned = [Speakers[Index] if Done and Index >= 0 and Score >= DecisionThreshold else '' for Score, Index, Done in zip(Scores.tolist(), Indexes.tolist(), Embedded.tolist())]
+    AudioSpeakersData_Path = Path(Output_Root).joinpath(Output_Dir_Name, f"{AudioSpeakersData_Name}.txt").as_posix()
+    WriteAudioSpeakersData(AudioSpeakersData_Path, Clips, Assigned, np.maximum(Scores, -1.))
+    SaveSimilarities(AudioSpeakersData_Path, Matrix, Clips, Speakers, DecisionThreshold) if SaveMatrix else None
+    return AudioSpeakersData_Path
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m AudioKit.Speakers", description = "Work with the results of speaker identification")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    parser_identify = subparsers.add_parser("identify", help = "identify the speakers of the audio in a dir")
+    parser_identify.add_argument("input",            help = "dir of the audio to identify")
+    parser_identify.add_argument("--speaker",        help = "name and reference audio (or profile) of a speaker", nargs = 2, action = "append", metavar = ("NAME", "AUDIO"), required = True)
+    parser_identify.add_argument("--model",          help = "ONNX or TorchScript export of the speaker model", required = True)
+    parser_identify.add_argument("--feature-method", help = "feature method of the model", choices = FeatureMethods, required = True)
+    parser_identify.add_argument("--threshold",      help = "similarity a clip needs to get a speaker", type = float, default = 0.6)
+    parser_identify.add_argument("--duration",       help = "longest audio per clip in seconds, 0 for no limit", type = float, default = 3.)
+    parser_identify.add_argument("--output-root",    help = "dir to write the results to", required = True)
+    parser_identify.add_argument("--output-dir-name", help = "subdir of the results", default = 'VPR')
+    parser_identify.add_argument("--data-name",      help = "name of the speaker data", default = 'AudioSpeakerData')
+    parser_identify.add_argument("--store",          help = "dir of the embedding store", default = None)
+    parser_identify.add_argument("--batch-size",     help = "clips per forward pass", type = int, default = 32)
+    parser_identify.add_argument("--threads",        help = "threads of the model and of decoding", type = int, default = None)
+    parser_identify.add_argument("--cache",          help = "decode through the shared PCM cache", action = "store_true")
+    parser_identify.add_argument("--no-matrix",      help = "don't save the similarity matrix (no rescoring later), many references are then searched through an IVF index", action = "store_true")
+
+    parser_enroll = subparsers.add_parser("enroll", help = "build the profile of a speaker from many clips")
+    parser_enroll.add_argument("inputs",           nargs = '+', help = "clips of the speaker or dirs of them")
+    parser_enroll.add_argument("--name",           help = "name of the speaker", required = True)
+    parser_enroll.add_argument("--output",         help = "profile to write (.npz)", required = True)
+    parser_enroll.add_argument("--model",          help = "ONNX or TorchScript export of the speaker model", required = True)
+    parser_enroll.add_argument("--feature-method", help = "feature method of the model", choices = FeatureMethods, required = True)
+    parser_enroll.add_argument("--duration",       help = "longest audio per clip in seconds, 0 for no limit", type = float, default = 3.)
+    parser_enroll.add_argument("--store",          help = "dir of the embedding store", default = None)
+    parser_enroll.add_argument("--batch-size",     help = "clips per forward pass", type = int, default = 32)
+    parser_enroll.add_argument("--threads",        help = "threads of the model and of decoding", type = int, default = None)
+    parser_enroll.add_argument("--cache",          help = "decode through the shared PCM cache", action = "store_true")
+
+    parser_rescore = subparsers.add_parser("rescore", help = "assign the speakers of a run again at another threshold from its similarity matrix")
+    parser_rescore.add_argument("data",        help = "speaker data (.txt) of the run")
+    parser_rescore.add_argument("--threshold", help = "similarity a clip needs to get a speaker", type = float, required = True)
+    args = parser.parse_args()
+
+    if args.command == "identify":
+        print(Identify(
+            dict(args.speaker),
+            args.input,
+            args.model,
+            args.feature_method,
+            args.threshold,
+            args.duration,
+            args.output_root,
+            args.output_dir_name,
+            args.data_name,
+            BatchEmbedder(args.model, args.feature_method, args.duration, args.batch_size, args.threads, Cache = PCMCache() if args.cache else None),
+            args.store,
+            32 * args.batch_size,
+            SaveMatrix = not args.no_matrix
+        ), flush = True)
+    if args.command == "enroll":
+        Files = []
+        for Input in args.inputs:
+            Files.extend(sorted(File.as_posix() for File in Path(Input).rglob('*') if File.suffix.lower() in AudioSuffixes) if Path(Input).is_dir() else [Input])
+        Profile_Path = Enroll(
+            args.name,
+            Files,
+            args.model,
+            args.feature_method,
+            args.duration,
+            BatchEmbedder(args.model, args.feature_method, args.duration, args.batch_size, args.threads, Cache = PCMCache() if args.cache else None),
+            args.output,
+            args.store
+        )
+        Meta = LoadProfile(Profile_Path)[1]
+        print(f"{Profile_Path}: {Meta['Clips']} clip(s) kept, {len(Meta['Dropped'])} dropped, similarity to the centroid {Meta['Mean']:.3f} +- {Meta['Std']:.3f}", flush = True)
+    if args.command == "rescore":
+        Matrix, Clips, Speakers = LoadSimilarities(args.data)
+        Assigned, Similarities = Assign(Matrix, Speakers, args.threshold)
+        WriteAudioSpeakersData(args.data, Clips, Assigned, Similarities)
+        for Speaker in Speakers + ['']:
+            print(f"{Speaker or '-':>20}: {Assigned.count(Speaker)} clip(s)", flush = True)
+
+##############################################################################################################################
@@ -0,0 +1,3 @@
+'''
+Audio engines shared by the core tools (reading/writing, slicing)
+'''
@@ -0,0 +1,73 @@
+import os
+import signal
+import threading
+from pathlib import Path
+from typing import Optional
+
+##############################################################################################################################
+
+# Exit code of a run that stopped because it was asked to
+ExitCode = 130
+
+# Signals that ask for a graceful stop, a second one stops right away
+CancelSignals = [Sig for Sig in (getattr(signal, 'SIGTERM', None), getattr(signal, 'SIGINT', None), getattr(signal, 'SIGBREAK', None)) if Sig is not None]
+
+##############################################################################################################################
+
+class Cancelled(Exception):
+    '''
+    Raised at a safe point once a stop has been asked for
+    '''
+    pass
+
+
+# Set by a cancel signal
+Requested = threading.Event()
+
+# File whose existence asks for a stop, written by the GUI or the scheduler
+CancelPath = None
+
+# Whether the signal handlers are in use (they can only be set from the main thread)
+Installed = False
+
+
+def HandleSignal(Sig: int, Frame: object):
+    Requested.set()
+    signal.signal(Sig, signal.default_int_handler if Sig == getattr(signal, 'SIGINT', None) else signal.SIG_DFL)
+    print("Stopping after the current batch (send the signal again to stop right away)", flush = True)
+
+
+def install(CancelFile: Optional[str] = None):
+    '''
+    Listen for cancel signals and set the cancel file (given or from EVT_CANCEL_PATH)
+    '''
+    global Installed
+    Installed = threading.current_thread() is threading.main_thread()
+    reset(CancelFile)
+
+
+def reset(CancelFile: Optional[str] = None):
+    '''
+    Get ready for the next run, listening for cancel signals again if they were used up
+    '''
+    global CancelPath
+    CancelPath = CancelFile if CancelFile is not None else (os.environ.get('EVT_CANCEL_PATH') or None)
+    Requested.clear()
+    for Sig in CancelSignals if Installed else []:
+        signal.signal(Sig, HandleSignal)
+
+
+def isRequested():
+    if not Requested.is_set() and CancelPath is not None and Path(CancelPath).exists():
+        Requested.set()
+    return Requested.is_set()
+
+
+def check():
+    '''
+    Stop here if a stop has been asked for
+    '''
+    if isRequested():
+        raise Cancelled("Stopped on request")
+
+##############################################################################################################################
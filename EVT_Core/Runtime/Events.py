@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import traceback
+from typing import Optional
+
+##############################################################################################################################
+
+class EventSink:
+    '''
+    Write events as JSON lines to a file descriptor or a file
+    '''
+    def __init__(self, EventPath: Optional[str] = None, EventFD: Optional[int] = None):
+        self.File = None
+        if EventFD is not None:
+            self.File = os.fdopen(EventFD, mode = 'a', encoding = 'utf-8', closefd = False)
+        elif EventPath is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(EventPath)), exist_ok = True)
+            self.File = open(EventPath, mode = 'a', encoding = 'utf-8')
+
+    @classmethod
+    def fromEnv(cls):
+        '''
+        Open the sink given by EVT_EVENT_FD or EVT_EVENT_PATH, if any
+        '''
+        EventFD = os.environ.get('EVT_EVENT_FD', '')
+        return cls(EventPath = os.environ.get('EVT_EVENT_PATH') or None, EventFD = int(EventFD) if EventFD.isdigit() else None)
+
+    def emit(self, Type: str, **Fields):
+        if self.File is None:
+            return
+        try:
+            self.File.write(json.dumps({'Type': Type, 'Time': time.time(), **Fields}, ensure_ascii = False, default = str) + '\n')
+            self.File.flush()
+        except (OSError, ValueError):
+            self.File = None
+
+    def close(self):
+        if self.File is not None:
+            self.File.close()
+            self.File = None
+
+
+# The sink that events of the current job go to
+Sink = EventSink()
+
+
+def setSink(NewSink: Optional[EventSink]):
+    global Sink
+    Sink.close() if Sink is not NewSink else None
+    Sink = NewSink if NewSink is not None else EventSink()
+
+
+def emit(Type: str, **Fields):
+    Sink.emit(Type, **Fields)
+
+
+def emitError(Error: BaseException, Stage: Optional[str] = None):
+    '''
+    Report an exception with its type, message and traceback
+    '''
+    emit(
+        'Error',
+        Stage = Stage,
+        Error = type(Error).__name__,
+        Message = str(Error),
+        Traceback = ''.join(traceback.format_exception(type(Error), Error, Error.__traceback__))
+    )
+
+
+class Progress:
+    '''
+    Track items done of a stage and report them with throughput and ETA
+    '''
+    def __init__(self, Stage: str, Total: Optional[int] = None, Interval: float = 0.5):
+        self.Stage = Stage
+        self.Total = Total
+        self.Interval = Interval
+        self.Done = 0
+        self.StartTime = time.time()
+        self.EmitTime = 0.
+
+    def update(self, Step: int = 1, Done: Optional[int] = None, Total: Optional[int] = None, Force: bool = False):
+        self.Done = self.Done + Step if Done is None else Done
+        self.Total = Total if Total is not None else self.Total
+        Now = time.time()
+        if not Force and Now - self.EmitTime < self.Interval and self.Done != self.Total:
+            return
+        self.EmitTime = Now
+        Elapsed = Now - self.StartTime
+        Rate = self.Done / Elapsed if Elapsed > 0 else None
+        emit(
+            'Progress',
+            Stage = self.Stage,
+            Done = self.Done,
+            Total = self.Total,
+            Rate = round(Rate, 3) if Rate is not None else None,
+            ETA = round((self.Total - self.Done) / Rate, 1) if Rate and self.Total is not None else None
+        )
+
+    def close(self):
+        self.update(Step = 0, Force = True)
+
+
+def InstallTqdmHook(DefaultStage: str):
+    '''
+    Report the progress bars of third-party code (tqdm) as progress events
+    '''
+    try:
+        from tqdm import std
+    except ImportError:
+        return
+    if getattr(std.tqdm, '_EVT_Hooked', False):
+        return
+    Init, Update, Close = std.tqdm.__init__, std.tqdm.update, std.tqdm.close
+
+    def __init__(self, *args, **kwargs):
+        Init(self, *args, **kwargs)
+        self._EVT_Progress = Progress(getattr(self, 'desc', '').strip(': ') or DefaultStage, self.total)
+
+    def update(self, n = 1):
+        Result = Update(self, n)
+        Tracker = getattr(self, '_EVT_Progress', None)
+        Tracker.update(Done = self.n, Total = self.total) if Tracker is not None else None
+        return Result
+
+    def close(self):
+        Tracker = getattr(self, '_EVT_Progress', None)
+        if Tracker is not None:
+            Tracker.update(Done = self.n, Total = self.total, Force = True)
+            self._EVT_Progress = None
+        return Close(self)
+
+    std.tqdm.__init__, std.tqdm.update, std.tqdm.close = __init__, update, close
+    std.tqdm._EVT_Hooked = True
+
+##############################################################################################################################
@@ -0,0 +1,389 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from . import Events, Control
+from .Manifest import PerFileTools, RunIncremental
+
+##############################################################################################################################
+
+# Version of the job schema, bump it when the params of a tool change
+SchemaVersion = 1
+
+# Params of each tool in calling order: {Tool: [(Name, Type, Optional)]}
+Schemas = {
+    'Audio_Processing': [
+        ('Media_Dir_Input', 'path', False),
+        ('Media_Format_Output', 'str', True),
+        ('SampleRate', 'str', True),
+        ('SampleWidth', 'str', True),
+        ('ToMono', 'bool', False),
+        ('Denoise_Audio', 'bool', False),
+        ('Denoise_Model_Path', 'path', False),
+        ('Denoise_Target', 'str', False),
+        ('Slice_Audio', 'bool', False),
+        ('RMS_Threshold', 'float', False),
+        ('Audio_Length_Min', 'int', False),
+        ('Silent_Interval_Min', 'int', False),
+        ('Hop_Size', 'int', False),
+        ('Silence_Kept_Max', 'int', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False)
+    ],
+    'Voice_Identifying': [
+        ('StdAudioSpeaker', 'dict', False),
+        ('Audio_Dir_Input', 'path', False),
+        ('Model_Path', 'path', False),
+        ('Model_Type', 'str', False),
+        ('Feature_Method', 'str', False),
+        ('DecisionThreshold', 'float', False),
+        ('Duration_of_Audio', 'float', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False),
+        ('AudioSpeakersData_Name', 'str', False)
+    ],
+    'Voice_Transcribing': [
+        ('Model_Path', 'path', False),
+        ('Audio_Dir', 'path', False),
+        ('Verbose', 'bool', False),
+        ('Add_LanguageInfo', 'bool', False),
+        ('Condition_on_Previous_Text', 'bool', False),
+        ('fp16', 'bool', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False)
+    ],
+    'Dataset_Creating_GPTSoVITS': [
+        ('SRT_Dir', 'path', False),
+        ('AudioSpeakersData_Path', 'path', False),
+        ('DataFormat', 'str', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False),
+        ('FileList_Name', 'str', False)
+    ],
+    'Dataset_Creating_VITS': [
+        ('SRT_Dir', 'path', False),
+        ('AudioSpeakersData_Path', 'path', False),
+        ('SampleRate', 'str', True),
+        ('SampleWidth', 'str', True),
+        ('ToMono', 'bool', False),
+        ('DataFormat', 'str', False),
+        ('Add_AuxiliaryData', 'bool', False),
+        ('AuxiliaryData_Path', 'path', True),
+        ('TrainRatio', 'float', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False),
+        ('FileList_Name_Training', 'str', False),
+        ('FileList_Name_Validation', 'str', False)
+    ],
+    'Train_GPTSoVITS': [
+        ('FileList_Path', 'path', False),
+        ('FP16_Run', 'bool', False),
+        ('Model_Dir_Pretrained_bert', 'path', False),
+        ('Model_Dir_Pretrained_ssl', 'path', False),
+        ('Model_Path_Pretrained_s1', 'path', False),
+        ('Model_Path_Pretrained_s2G', 'path', False),
+        ('Model_Path_Pretrained_s2D', 'path', False),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False),
+        ('Output_LogDir', 'path', False)
+    ],
+    'Train_VITS': [
+        ('FileList_Path_Training', 'path', False),
+        ('FileList_Path_Validation', 'path', False),
+        ('Epochs', 'int', False),
+        ('Eval_Interval', 'int', False),
+        ('Batch_Size', 'int', False),
+        ('FP16_Run', 'bool', False),
+        ('Keep_Original_Speakers', 'bool', False),
+        ('Config_Path_Load', 'path', True),
+        ('Num_Workers', 'int', False),
+        ('Use_PretrainedModels', 'bool', False),
+        ('Model_Path_Pretrained_G', 'path', True),
+        ('Model_Path_Pretrained_D', 'path', True),
+        ('Output_Root', 'path', False),
+        ('Output_Dir_Name', 'str', False),
+        ('Output_Config_Name', 'str', False),
+        ('Output_LogDir', 'path', False)
+    ],
+    'Convert_GPTSoVITS': [
+        ('Model_Path_Load_s1', 'path', False),
+        ('Model_Path_Load_s2G', 'path', False),
+        ('Model_Dir_Load_bert', 'path', False),
+        ('Model_Dir_Load_ssl', 'path', False),
+        ('FP16_Run', 'bool', False),
+        ('Enable_Batched_Infer', 'bool', False),
+        ('Use_WebUI', 'bool', False)
+    ],
+    'Convert_VITS': [
+        ('Config_Path_Load', 'path', False),
+        ('Model_Path_Load', 'path', False),
+        ('Text', 'str', False),
+        ('Language', 'str', True),
+        ('Speaker', 'str', True),
+        ('EmotionStrength', 'int', False),
+        ('PhonemeDuration', 'int', False),
+        ('SpeechRate', 'int', False),
+        ('Audio_Path_Save', 'path', False)
+    ]
+}
+
+def CheckSpeakerAudio(Params: dict):
+    '''
+    The VPR tool embeds every reference itself, so speaker profiles (.npz) can't stand in for reference audio here
+    '''
+    Profiles = [str(Item) for Item in Params['StdAudioSpeaker'].values() if str(Item).lower().endswith('.npz')]
+    if Profiles:
+        raise Exception(f"Param 'StdAudioSpeaker' takes reference audio only, speaker profiles {Profiles} can be used through 'python -m AudioKit.Speakers identify'")
+
+# Checks on the params of a tool as a whole, run once every param has passed its type check: {Tool: Check(Params)}
+Validators = {
+    'Voice_Identifying': CheckSpeakerAudio
+}
+
+# Params taken by the runtime rather than the tool, given after the tool's params: {Tool: [(Name, Type, Default)]}
+RuntimeParams = {
+    'Audio_Processing': [
+        ('Worker_Count', 'int', 1)
+    ]
+}
+
+# Params whose files decide the result of a job besides the params themselves
+Inputs = {
+    'Audio_Processing': ['Media_Dir_Input', 'Denoise_Model_Path'],
+    'Voice_Identifying': ['StdAudioSpeaker', 'Audio_Dir_Input', 'Model_Path'],
+    'Voice_Transcribing': ['Model_Path', 'Audio_Dir'],
+    'Dataset_Creating_GPTSoVITS': ['SRT_Dir', 'AudioSpeakersData_Path'],
+    'Dataset_Creating_VITS': ['SRT_Dir', 'AudioSpeakersData_Path', 'AuxiliaryData_Path'],
+    'Train_GPTSoVITS': ['FileList_Path'],
+    'Train_VITS': ['FileList_Path_Training', 'FileList_Path_Validation', 'Config_Path_Load'],
+    'Convert_VITS': ['Config_Path_Load', 'Model_Path_Load']
+}
+
+# Params that join into the output path of a job, jobs without one are never skipped
+Outputs = {
+    'Audio_Processing': ['Output_Root', 'Output_Dir_Name'],
+    'Voice_Identifying': ['Output_Root', 'Output_Dir_Name'],
+    'Voice_Transcribing': ['Output_Root', 'Output_Dir_Name'],
+    'Dataset_Creating_GPTSoVITS': ['Output_Root', 'Output_Dir_Name'],
+    'Dataset_Creating_VITS': ['Output_Root', 'Output_Dir_Name'],
+    'Train_GPTSoVITS': ['Output_Root', 'Output_Dir_Name'],
+    'Train_VITS': ['Output_Root', 'Output_Dir_Name'],
+    'Convert_VITS': ['Audio_Path_Save']
+}
+
+##############################################################################################################################
+
+def CheckParam(Name: str, Type: str, Optional: bool, Value: object):
+    '''
+    Check a param against its schema type and return the normalized value
+    '''
+    if Value is None:
+        if Optional:
+            return None
+        raise Exception(f"Param '{Name}' can't be empty")
+    if Type in ('str', 'path'):
+        if not isinstance(Value, str):
+            raise Exception(f"Param '{Name}' should be a string, got {type(Value).__name__}")
+        return Value
+    if Type == 'bool':
+        if not isinstance(Value, bool):
+            raise Exception(f"Param '{Name}' should be a bool, got {type(Value).__name__}")
+        return Value
+    if Type == 'int':
+        if isinstance(Value, bool) or not isinstance(Value, int):
+            raise Exception(f"Param '{Name}' should be an int, got {type(Value).__name__}")
+        return Value
+    if Type == 'float':
+        if isinstance(Value, bool) or not isinstance(Value, (int, float)):
+            raise Exception(f"Param '{Name}' should be a float, got {type(Value).__name__}")
+        return float(Value)
+    if Type == 'dict':
+        if not isinstance(Value, dict):
+            raise Exception(f"Param '{Name}' should be a dict, got {type(Value).__name__}")
+        return {str(Key): Item for Key, Item in Value.items()}
+    raise Exception(f"Unknown type '{Type}' for param '{Name}'")
+
+
+def FingerprintPaths(Paths: list):
+    '''
+    Summarize the files under the given paths by name, size and modification time
+    '''
+    Entries = []
+    for PathItem in Paths:
+        if PathItem is None or not Path(PathItem).exists():
+            Entries.append([str(PathItem), None])
+            continue
+        if Path(PathItem).is_file():
+            Stat = os.stat(PathItem)
+            Entries.append([Path(PathItem).as_posix(), Stat.st_size, Stat.st_mtime_ns])
+            continue
+        for DirPath, DirNames, FileNames in os.walk(PathItem):
+            DirNames.sort()
+            for FileName in sorted(FileNames):
+                FilePath = Path(DirPath).joinpath(FileName)
+                Stat = os.stat(FilePath)
+                Entries.append([FilePath.as_posix(), Stat.st_size, Stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps(Entries).encode('utf-8')).hexdigest()
+
+
+class Job:
+    '''
+    A typed set of params for one run of a core tool
+    '''
+    def __init__(self, Tool: str, Params: dict):
+        if Tool not in Schemas:
+            raise Exception(f"Unknown tool '{Tool}'")
+        self.Tool = Tool
+        self.Params = {}
+        for Name, Type, Optional in Schemas[Tool]:
+            if Name not in Params:
+                raise Exception(f"Missing param '{Name}' for tool '{Tool}'")
+            self.Params[Name] = CheckParam(Name, Type, Optional, Params[Name])
+        for Name, Type, Default in RuntimeParams.get(Tool, []):
+            self.Params[Name] = CheckParam(Name, Type, False, Default if Params.get(Name) is None else Params[Name])
+        Unknown = set(Params) - set(self.Params)
+        if Unknown:
+            raise Exception(f"Unknown params {sorted(Unknown)} for tool '{Tool}'")
+        Validators[Tool](self.Params) if Tool in Validators else None
+
+    @classmethod
+    def fromArgs(cls, Tool: str, Args: list):
+        '''
+        Build a job from params given in calling order, optionally followed by the runtime params
+        '''
+        Names = [Name for Name, _, _ in Schemas.get(Tool, [])]
+        RuntimeNames = [Name for Name, _, _ in RuntimeParams.get(Tool, [])]
+        if len(Args) not in (len(Names), len(Names) + len(RuntimeNames)):
+            raise Exception(f"Tool '{Tool}' takes {len(Names)} params, got {len(Args)}")
+        return cls(Tool, dict(zip(Names + RuntimeNames, Args)))
+
+    @classmethod
+    def fromDict(cls, Spec: dict):
+        '''
+        Build a job from its JSON form, params may be named or given in calling order
+        '''
+        Version = Spec.get('Version', SchemaVersion)
+        if Version != SchemaVersion:
+            raise Exception(f"Unsupported job schema version {Version} (expected {SchemaVersion})")
+        Params = Spec['Params']
+        return cls.fromArgs(Spec['Tool'], Params) if isinstance(Params, list) else cls(Spec['Tool'], Params)
+
+    @classmethod
+    def load(cls, JobPath: str):
+        with open(JobPath, mode = 'r', encoding = 'utf-8') as File:
+            return cls.fromDict(json.load(File))
+
+    def toDict(self):
+        return {'Version': SchemaVersion, 'Tool': self.Tool, 'Params': self.Params}
+
+    def save(self, JobPath: str):
+        os.makedirs(Path(JobPath).parent, exist_ok = True)
+        with open(JobPath, mode = 'w', encoding = 'utf-8') as File:
+            json.dump(self.toDict(), File, ensure_ascii = False, indent = 4)
+
+    def toArgs(self):
+        '''
+        Return the params in calling order
+        '''
+        return tuple(self.Params[Name] for Name, _, _ in Schemas[self.Tool])
+
+    def getInputPaths(self):
+        Paths = []
+        for Name in Inputs.get(self.Tool, []):
+            Value = self.Params[Name]
+            Paths.extend(Value.values() if isinstance(Value, dict) else [Value])
+        return Paths
+
+    def getOutputPath(self):
+        Names = Outputs.get(self.Tool)
+        return Path(*[self.Params[Name] for Name in Names]).as_posix() if Names else None
+
+    def getHash(self):
+        '''
+        Hash the params together with the state of the input files (runtime params don't change the result)
+        '''
+        RuntimeNames = [Name for Name, _, _ in RuntimeParams.get(self.Tool, [])]
+        Params = {Name: Value for Name, Value in self.Params.items() if Name not in RuntimeNames}
+        Content = json.dumps(
+            {'Job': {**self.toDict(), 'Params': Params}, 'Inputs': FingerprintPaths(self.getInputPaths())},
+            ensure_ascii = False,
+            sort_keys = True
+        )
+        return hashlib.sha256(Content.encode('utf-8')).hexdigest()
+
+
+def getRecordPath(RecordDir: str, JobItem: Job):
+    return Path(RecordDir).joinpath(f"{JobItem.Tool}_{hashlib.sha256(str(JobItem.getOutputPath()).encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def isJobFinished(RecordDir: Optional[str], JobItem: Job, JobHash: str):
+    '''
+    Check whether an identical job has finished and its output is left untouched
+    '''
+    OutputPath = JobItem.getOutputPath()
+    if RecordDir is None or OutputPath is None or not Path(OutputPath).exists():
+        return False
+    RecordPath = getRecordPath(RecordDir, JobItem)
+    if not RecordPath.exists():
+        return False
+    try:
+        with open(RecordPath, mode = 'r', encoding = 'utf-8') as File:
+            Record = json.load(File)
+    except (OSError, ValueError):
+        return False
+    return Record.get('Hash') == JobHash and Record.get('Output') == FingerprintPaths([OutputPath])
+
+
+def recordJob(RecordDir: Optional[str], JobItem: Job, JobHash: str):
+    OutputPath = JobItem.getOutputPath()
+    if RecordDir is None or OutputPath is None:
+        return
+    RecordPath = getRecordPath(RecordDir, JobItem)
+    os.makedirs(RecordPath.parent, exist_ok = True)
+    with open(RecordPath, mode = 'w', encoding = 'utf-8') as File:
+        json.dump(
+            {
+                'Hash': JobHash,
+                'Job': JobItem.toDict(),
+                'Output': FingerprintPaths([OutputPath]),
+                'Finished': time.strftime('%Y-%m-%d %H:%M:%S')
+            },
+            File,
+            ensure_ascii = False,
+            indent = 4
+        )
+
+
+def runJob(JobItem: Job, ToolWorker: object, RecordDir: Optional[str] = None, Force: bool = False, Incremental: bool = True):
+    '''
+    Run a job with the given worker unless an identical job has already finished,
+    per-file tools only get the input files that aren't in their manifest yet
+    '''
+    JobHash = JobItem.getHash()
+    if not Force and isJobFinished(RecordDir, JobItem, JobHash):
+        print(f"Skipped {JobItem.Tool}: an identical job has already finished ({JobItem.getOutputPath()})", flush = True)
+        Events.emit('Skipped', Tool = JobItem.Tool, Hash = JobHash, Output = JobItem.getOutputPath())
+        return 'Skipped'
+    Events.emit('Started', Tool = JobItem.Tool, Hash = JobHash)
+    StartTime = time.time()
+    try:
+        Control.check()
+        if Incremental and JobItem.Tool in PerFileTools:
+            RunIncremental(JobItem, ToolWorker, Force)
+        else:
+            ToolWorker.Run(JobItem.toArgs())
+    except Control.Cancelled:
+        print(f"Cancelled {JobItem.Tool}, the finished part is kept", flush = True)
+        Events.emit('Cancelled', Tool = JobItem.Tool, Hash = JobHash, Elapsed = round(time.time() - StartTime, 3))
+        return 'Cancelled'
+    except Exception as e:
+        Events.emitError(e, Stage = JobItem.Tool)
+        raise
+    recordJob(RecordDir, JobItem, JobHash)
+    Events.emit('Finished', Tool = JobItem.Tool, Hash = JobHash, Elapsed = round(time.time() - StartTime, 3))
+    return 'Finished'
+
+##############################################################################################################################
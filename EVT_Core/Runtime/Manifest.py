@@ -0,0 +1,218 @@
+import os
+import math
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+from . import Events, Control
+
+##############################################################################################################################
+
+# Tools that turn each input file into its own output files: {Tool: Stage}
+PerFileTools = {
+    'Audio_Processing': 'Process',
+    'Voice_Identifying': 'VPR',
+    'Voice_Transcribing': 'ASR'
+}
+
+# Params that don't change what a file turns into
+IgnoredParams = ['Media_Dir_Input', 'Audio_Dir_Input', 'Audio_Dir', 'Output_Root', 'Output_Dir_Name', 'Worker_Count']
+
+# Name of the manifest kept in the output dir of a tool
+ManifestName = '.EVT_Manifest.jsonl'
+
+##############################################################################################################################
+
+def HashFile(FilePath: str, ChunkSize: int = 1024 * 1024):
+    Hash = hashlib.sha256()
+    with open(FilePath, mode = 'rb') as File:
+        for Chunk in iter(lambda: File.read(ChunkSize), b''):
+            Hash.update(Chunk)
+    return Hash.hexdigest()
+
+
+def HashParams(Params: dict):
+    Content = json.dumps({Name: Value for Name, Value in Params.items() if Name not in IgnoredParams}, ensure_ascii = False, sort_keys = True)
+    return hashlib.sha256(Content.encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    '''
+    An append-only record of the input files a tool has finished and the outputs each one produced
+    '''
+    def __init__(self, OutputDir: str):
+        self.OutputDir = OutputDir
+        self.ManifestPath = Path(OutputDir).joinpath(ManifestName).as_posix()
+        self.Entries = {}
+        self.load()
+
+    def load(self):
+        if not Path(self.ManifestPath).exists():
+            return
+        with open(self.ManifestPath, mode = 'r', encoding = 'utf-8') as File:
+            for Line in File:
+                try:
+                    Entry = json.loads(Line)
+                except ValueError:
+                    continue # The last line may be cut off by a crash
+                self.Entries[Entry['Input']] = Entry
+
+    def reset(self):
+        self.Entries = {}
+        Path(self.ManifestPath).unlink() if Path(self.ManifestPath).exists() else None
+
+    def check(self, FilePath: str, RelPath: str, ParamsHash: str):
+        '''
+        Return whether a file has been done with the same content and params, and its content hash
+        '''
+        Stat = os.stat(FilePath)
+        Entry = self.Entries.get(RelPath)
+        if Entry is not None and [Entry['Size'], Entry['MTime']] == [Stat.st_size, Stat.st_mtime_ns]:
+            FileHash = Entry['Hash'] # Unchanged since last time, no need to read it again
+        else:
+            FileHash = HashFile(FilePath)
+        Done = (
+            Entry is not None and
+            Entry['Hash'] == FileHash and
+            Entry['Params'] == ParamsHash and
+            all(Path(self.OutputDir).joinpath(Output).exists() for Output in Entry['Outputs'])
+        )
+        return Done, FileHash
+
+    def record(self, Entries: list):
+        '''
+        Append the entries of a finished batch and make sure they reach the disk
+        '''
+        os.makedirs(self.OutputDir, exist_ok = True)
+        with open(self.ManifestPath, mode = 'a', encoding = 'utf-8') as File:
+            for Entry in Entries:
+                File.write(json.dumps(Entry, ensure_ascii = False) + '\n')
+                self.Entries[Entry['Input']] = Entry
+            File.flush()
+            os.fsync(File.fileno())
+
+    def dropOutputs(self, RelPath: str):
+        '''
+        Remove the outputs left by an earlier run of a file that is going to be done again
+        '''
+        Entry = self.Entries.get(RelPath)
+        if Entry is None:
+            return []
+        Removed = []
+        for Output in Entry['Outputs']:
+            OutputPath = Path(self.OutputDir).joinpath(Output)
+            OutputPath.unlink() if OutputPath.exists() else None
+            Removed.append(OutputPath.as_posix())
+        return Removed
+
+
+def MatchOutputs(Files: list, Outputs: list):
+    '''
+    Assign the outputs of a batch to the input files they are named after, and return them with the outputs matching no file.
+    Those are left out of the manifest, as redoing any one file of the batch would otherwise remove them for all the others
+    '''
+    Stems = {File: Path(File).stem for File in Files}
+    Matched = {File: [] for File in Files}
+    Unmatched = []
+    for Output in Outputs:
+        Candidates = [File for File, Stem in Stems.items() if Path(Output).stem.startswith(Stem)]
+        if Candidates:
+            Matched[max(Candidates, key = lambda File: len(Stems[File]))].append(Output)
+        else:
+            Unmatched.append(Output)
+    return Matched, Unmatched
+
+
+def DropSpeakersData(DataPath: str, AudioPaths: list):
+    '''
+    Remove the lines of the given audio files from a speaker data file
+    '''
+    if not AudioPaths or not Path(DataPath).exists():
+        return
+    AudioPaths = set(Path(AudioPath).as_posix() for AudioPath in AudioPaths)
+    with open(DataPath, mode = 'r', encoding = 'utf-8') as File:
+        Lines = File.readlines()
+    with open(DataPath, mode = 'w', encoding = 'utf-8') as File:
+        File.writelines(Line for Line in Lines if Path(Line.split('|', 1)[0]).as_posix() not in AudioPaths)
+
+
+def RunIncremental(JobItem: object, ToolWorker: object, Force: bool = False, BatchSize: int = 8):
+    '''
+    Run a per-file tool only on the input files that are new or changed since the last run,
+    recording every finished batch so that an interrupted run picks up where it stopped,
+    a stop asked for in the middle of a batch takes effect once the batch is recorded.
+    Batches are spread over a process pool if the job asks for more than one worker
+    '''
+    from .Pipeline import Stage, StageInputs, ListFiles
+
+    Name = PerFileTools[JobItem.Tool]
+    Params = JobItem.Params
+    InputRoot = Params[StageInputs[Name]]
+    OutputDir = JobItem.getOutputPath()
+    if not Path(InputRoot).is_dir():
+        raise Exception(f"Input dir not found: {InputRoot}")
+
+    ManifestItem = Manifest(OutputDir)
+    ManifestItem.reset() if Force else None
+    ParamsHash = HashParams(Params)
+    DataPath = Path(OutputDir).joinpath(f"{Params['AudioSpeakersData_Name']}.txt").as_posix() if JobItem.Tool == 'Voice_Identifying' else None
+    if DataPath is not None and not ManifestItem.Entries and Path(DataPath).exists():
+        os.remove(DataPath) # Left by a run without manifest, all of its files are going to be done again
+
+    Files = ListFiles(InputRoot)
+    Pending = {}
+    Removed = []
+    for File in Files:
+        RelPath = Path(File).relative_to(InputRoot).as_posix()
+        Done, FileHash = ManifestItem.check(File, RelPath, ParamsHash)
+        if not Done:
+            Pending[File] = (RelPath, FileHash)
+            Removed.extend(ManifestItem.dropOutputs(RelPath))
+    DropSpeakersData(DataPath, Removed) if DataPath is not None else None
+    print(f"{len(Files) - len(Pending)} of {len(Files)} file(s) already done, {len(Pending)} to go", flush = True)
+    if not Pending:
+        return
+
+    os.makedirs(Params['Output_Root'], exist_ok = True)
+    WorkDir = tempfile.mkdtemp(prefix = '.EVT_Work_', dir = Params['Output_Root'])
+    Tracker = Events.Progress(JobItem.Tool, len(Pending))
+
+    def Record(Batch: list, Outputs: list):
+        Matched, Unmatched = MatchOutputs(Batch, Outputs)
+        for Output in Unmatched:
+            print(f"Warning: {Output} is not named after any input file, it won't be tracked (or removed) by the manifest", flush = True)
+        ManifestItem.record(
+            [
+                {
+                    'Input': Pending[File][0],
+                    'Size': os.stat(File).st_size,
+                    'MTime': os.stat(File).st_mtime_ns,
+                    'Hash': Pending[File][1],
+                    'Params': ParamsHash,
+                    'Outputs': [Path(Output).relative_to(OutputDir).as_posix() for Output in Matched[File]]
+                } for File in Batch
+            ]
+        )
+        Tracker.update(len(Batch))
+
+    Workers = max(1, min(Params.get('Worker_Count', 1), len(Pending)))
+    BatchSize = max(1, min(BatchSize, math.ceil(len(Pending) / Workers)))
+    Batches = [list(Pending.keys())[Index : Index + BatchSize] for Index in range(0, len(Pending), BatchSize)]
+    try:
+        if Workers > 1:
+            from .Shards import RunSharded
+            print(f"Running {len(Batches)} batch(es) with {Workers} processes", flush = True)
+            RunSharded(Name, JobItem.Tool, Params, WorkDir, Batches, InputRoot, Workers, Record)
+        else:
+            StageItem = Stage(Name, JobItem.Tool, Params, WorkDir)
+            StageItem.Worker = ToolWorker
+            for Batch in Batches:
+                Control.check()
+                Record(Batch, StageItem.runBatch(Batch, InputRoot))
+    finally:
+        Tracker.close()
+        shutil.rmtree(WorkDir, ignore_errors = True)
+
+##############################################################################################################################
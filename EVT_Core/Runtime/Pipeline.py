@@ -0,0 +1,549 @@
+import os
+import sys
+import ast
+import json
+import shutil
+import argparse
+import tempfile
+import traceback
+import configparser
+import multiprocessing
+from pathlib import Path
+from queue import Empty
+from typing import Optional
+
+from . import Events, Control
+from .Job import Job, Schemas, RuntimeParams, runJob
+from .Worker import Worker
+
+##############################################################################################################################
+
+# Stages of the toolchain in running order
+StageOrder = ['Process', 'VPR', 'ASR', 'DAT', 'Train']
+
+# Stages that hand finished files to the next stage while still running
+StreamingStages = ['Process', 'VPR', 'ASR']
+
+# Param that takes the input dir of each streaming stage
+StageInputs = {
+    'Process': 'Media_Dir_Input',
+    'VPR': 'Audio_Dir_Input',
+    'ASR': 'Audio_Dir'
+}
+
+# Tool of each stage, '{Model}' is filled with the chosen model type
+StageTools = {
+    'Process': 'Audio_Processing',
+    'VPR': 'Voice_Identifying',
+    'ASR': 'Voice_Transcribing',
+    'DAT': 'Dataset_Creating_{Model}',
+    'Train': 'Train_{Model}'
+}
+
+Models = {
+    'GPT-SoVITS': 'GPTSoVITS',
+    'VITS': 'VITS'
+}
+
+# Config files written by the GUI's ParamsManager
+ConfigFiles = {
+    'Audio_Processing': 'Config_Process.ini',
+    'Voice_Identifying': 'Config_VPR_TDNN.ini',
+    'Voice_Transcribing': 'Config_ASR_Whisper.ini',
+    'Dataset_Creating_GPTSoVITS': 'Config_DAT_GPT-SoVITS.ini',
+    'Dataset_Creating_VITS': 'Config_DAT_VITS.ini',
+    'Train_GPTSoVITS': 'Config_Train_GPT-SoVITS.ini',
+    'Train_VITS': 'Config_Train_VITS.ini'
+}
+
+# Where each param is kept in the config files: {Tool: {Param: (Section, Option)}}, plain values are constants
+ConfigOptions = {
+    'Audio_Processing': {
+        'Media_Dir_Input': ('Input Params', 'Media_Dir_Input'),
+        'Media_Format_Output': ('Output Params', 'Media_Format_Output'),
+        'SampleRate': ('Output Params', 'SampleRate'),
+        'SampleWidth': ('Output Params', 'SampleWidth'),
+        'ToMono': ('Output Params', 'ToMono'),
+        'Denoise_Audio': ('Denoiser Params', 'Denoise_Audio'),
+        'Denoise_Model_Path': ('Denoiser Params', 'Denoise_Model_Path'),
+        'Denoise_Target': ('Denoiser Params', 'Denoise_Target'),
+        'Slice_Audio': ('Slicer Params', 'Slice_Audio'),
+        'RMS_Threshold': ('Slicer Params', 'RMS_Threshold'),
+        'Audio_Length_Min': ('Slicer Params', 'Audio_Length_Min'),
+        'Silent_Interval_Min': ('Slicer Params', 'Silent_Interval_Min'),
+        'Hop_Size': ('Slicer Params', 'Hop_Size'),
+        'Silence_Kept_Max': ('Slicer Params', 'Silence_Kept_Max'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'Output_Dir_Name'),
+        'Worker_Count': ('Input Params', 'Worker_Count')
+    },
+    'Voice_Identifying': {
+        'StdAudioSpeaker': ('Input Params', 'StdAudioSpeaker'),
+        'Audio_Dir_Input': ('Input Params', 'Audio_Dir_Input'),
+        'Model_Path': ('VPR Params', 'Model_Path'),
+        'Model_Type': ('VPR Params', 'Model_Type'),
+        'Feature_Method': ('VPR Params', 'Feature_Method'),
+        'DecisionThreshold': ('VPR Params', 'DecisionThreshold'),
+        'Duration_of_Audio': ('VPR Params', 'Duration_of_Audio'),
+        'Output_Root': ('Output Params', 'Audio_Root_Output'),
+        'Output_Dir_Name': ('Output Params', 'Audio_Dir_Output'),
+        'AudioSpeakersData_Name': ('Output Params', 'FileList_Name')
+    },
+    'Voice_Transcribing': {
+        'Model_Path': ('Whisper Params', 'Model_Path'),
+        'Audio_Dir': ('Input Params', 'Audio_Dir'),
+        'Verbose': ('Whisper Params', 'Verbose'),
+        'Add_LanguageInfo': ('Whisper Params', 'Add_LanguageInfo'),
+        'Condition_on_Previous_Text': ('Whisper Params', 'Condition_on_Previous_Text'),
+        'fp16': ('Whisper Params', 'fp16'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'SRT_Dir_Name')
+    },
+    'Dataset_Creating_GPTSoVITS': {
+        'SRT_Dir': ('Input Params', 'SRT_Dir'),
+        'AudioSpeakersData_Path': ('Input Params', 'WAV_Dir'),
+        'DataFormat': ('GPT-SoVITS Params', 'DataFormat_Path'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'Output_Dir_Name'),
+        'FileList_Name': ('Output Params', 'FileList_Name')
+    },
+    'Dataset_Creating_VITS': {
+        'SRT_Dir': ('Input Params', 'SRT_Dir'),
+        'AudioSpeakersData_Path': ('Input Params', 'WAV_Dir'),
+        'SampleRate': ('VITS Params', 'SampleRate'),
+        'SampleWidth': ('VITS Params', 'SampleWidth'),
+        'ToMono': ('VITS Params', 'ToMono'),
+        'DataFormat': ('VITS Params', 'DataFormat_Path'),
+        'Add_AuxiliaryData': ('VITS Params', 'Add_AuxiliaryData'),
+        'AuxiliaryData_Path': ('VITS Params', 'AuxiliaryData_Path'),
+        'TrainRatio': ('VITS Params', 'TrainRatio'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'Output_Dir_Name'),
+        'FileList_Name_Training': ('Output Params', 'FileList_Name_Training'),
+        'FileList_Name_Validation': ('Output Params', 'FileList_Name_Validation')
+    },
+    'Train_GPTSoVITS': {
+        'FileList_Path': ('Input Params', 'FileList_Path'),
+        'FP16_Run': ('GPT-SoVITS Params', 'FP16_Run'),
+        'Model_Dir_Pretrained_bert': ('GPT-SoVITS Params', 'Model_Dir_Pretrained_bert'),
+        'Model_Dir_Pretrained_ssl': ('GPT-SoVITS Params', 'Model_Dir_Pretrained_ssl'),
+        'Model_Path_Pretrained_s1': ('GPT-SoVITS Params', 'Model_Path_Pretrained_s1'),
+        'Model_Path_Pretrained_s2G': ('GPT-SoVITS Params', 'Model_Path_Pretrained_s2G'),
+        'Model_Path_Pretrained_s2D': ('GPT-SoVITS Params', 'Model_Path_Pretrained_s2D'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'Output_Dir_Name'),
+        'Output_LogDir': ('Output Params', 'Output_LogDir')
+    },
+    'Train_VITS': {
+        'FileList_Path_Training': ('Input Params', 'FileList_Path_Training'),
+        'FileList_Path_Validation': ('Input Params', 'FileList_Path_Validation'),
+        'Epochs': ('VITS Params', 'Epochs'),
+        'Eval_Interval': ('Output Params', 'Eval_Interval'),
+        'Batch_Size': ('VITS Params', 'Batch_Size'),
+        'FP16_Run': ('VITS Params', 'FP16_Run'),
+        'Keep_Original_Speakers': ('VITS Params', 'Keep_Original_Speakers'),
+        'Config_Path_Load': ('VITS Params', 'Config_Path_Load'),
+        'Num_Workers': ('VITS Params', 'Num_Workers'),
+        'Use_PretrainedModels': ('VITS Params', 'Use_PretrainedModels'),
+        'Model_Path_Pretrained_G': ('VITS Params', 'Model_Path_Pretrained_G'),
+        'Model_Path_Pretrained_D': ('VITS Params', 'Model_Path_Pretrained_D'),
+        'Output_Root': ('Output Params', 'Output_Root'),
+        'Output_Dir_Name': ('Output Params', 'Output_Dir_Name'),
+        'Output_Config_Name': 'Config.json',
+        'Output_LogDir': ('Output Params', 'Output_LogDir')
+    }
+}
+
+##############################################################################################################################
+
+def ParseValue(Type: str, Value: Optional[str]):
+    '''
+    Turn a string kept by ParamsManager back into a param of the given type
+    '''
+    if Value is None or Value.strip() in ('', 'None'):
+        return None
+    if Type == 'bool':
+        return {'True': True, 'False': False}[Value.strip()]
+    if Type == 'int':
+        return int(float(Value))
+    if Type == 'float':
+        return float(Value)
+    if Type == 'dict':
+        return ast.literal_eval(Value)
+    return Value
+
+
+def LoadParams(ConfigDir: str, Tool: str):
+    '''
+    Read the params of a tool from the config file the GUI wrote for it
+    '''
+    ConfigPath = Path(ConfigDir).joinpath(ConfigFiles[Tool])
+    if not ConfigPath.exists():
+        raise Exception(f"Config file not found: {ConfigPath.as_posix()}")
+    Parser = configparser.ConfigParser(interpolation = None)
+    Parser.read(ConfigPath, encoding = 'utf-8')
+    Params = {}
+    for Name, Type, _ in Schemas[Tool]:
+        Option = ConfigOptions[Tool][Name]
+        if not isinstance(Option, tuple):
+            Params[Name] = Option
+            continue
+        Section, Key = Option
+        Params[Name] = ParseValue(Type, Parser.get(Section, Key, fallback = None))
+    for Name, Type, Default in RuntimeParams.get(Tool, []):
+        Section, Key = ConfigOptions[Tool][Name]
+        Value = ParseValue(Type, Parser.get(Section, Key, fallback = None))
+        Params[Name] = Default if Value is None else Value
+    return Params
+
+
+def LinkFile(Src: str, Dst: str):
+    '''
+    Make a file visible at another path without copying its data when possible, never over an existing file
+    '''
+    if os.path.lexists(Dst):
+        raise Exception(f"Can't link {Src} to {Dst}: file already exists")
+    os.makedirs(Path(Dst).parent, exist_ok = True)
+    try:
+        os.link(Src, Dst)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(Src), Dst)
+        except OSError:
+            shutil.copy2(Src, Dst)
+
+
+def ListFiles(Dir: str):
+    Files = []
+    for DirPath, DirNames, FileNames in os.walk(Dir):
+        DirNames.sort()
+        Files.extend(Path(DirPath).joinpath(FileName).as_posix() for FileName in sorted(FileNames))
+    return Files
+
+
+def MoveOutputs(BatchOutputDir: str, OutputDir: str, Exclude: list = []):
+    '''
+    Move the outputs of a batch into the stage's output dir and return their new paths
+    '''
+    Moved = {}
+    for File in ListFiles(BatchOutputDir):
+        if File in Exclude:
+            continue
+        Dst = Path(OutputDir).joinpath(Path(File).relative_to(BatchOutputDir))
+        os.makedirs(Dst.parent, exist_ok = True)
+        shutil.move(File, Dst)
+        Moved[File] = Dst.as_posix()
+    return Moved
+
+##############################################################################################################################
+
+class Stage:
+    '''
+    Run a tool on micro-batches of files and forward what each batch produced
+    '''
+    def __init__(self, Name: str, Tool: str, Params: dict, WorkDir: str):
+        self.Name = Name
+        self.Tool = Tool
+        self.Params = Params
+        self.WorkDir = Path(WorkDir).joinpath(Name).as_posix()
+        self.BatchCount = 0
+        self.Worker = None
+
+    @property
+    def OutputDir(self):
+        return Path(self.Params['Output_Root'], self.Params['Output_Dir_Name']).as_posix()
+
+    def runBatch(self, Files: list, InputRoot: Optional[str]):
+        self.Worker = Worker(self.Tool) if self.Worker is None else self.Worker
+        BatchDir = Path(self.WorkDir).joinpath(f'Batch_{self.BatchCount}').as_posix()
+        self.BatchCount += 1
+
+        StagedFiles = {}
+        for File in Files:
+            RelPath = Path(File).relative_to(InputRoot) if InputRoot is not None and Path(File).is_relative_to(InputRoot) else Path(File).name
+            Staged = Path(BatchDir, 'Input', RelPath).as_posix()
+            LinkFile(File, Staged)
+            StagedFiles[Staged] = File
+
+        Params = {
+            **self.Params,
+            StageInputs[self.Name]: Path(BatchDir, 'Input').as_posix(),
+            'Output_Root': BatchDir,
+            'Output_Dir_Name': 'Output'
+        }
+        BatchOutputDir = Path(BatchDir, 'Output').as_posix()
+        runJob(Job(self.Tool, Params), self.Worker, Incremental = False)
+
+        if self.Tool == 'Voice_Identifying':
+            DataPath = Path(BatchOutputDir).joinpath(f"{self.Params['AudioSpeakersData_Name']}.txt").as_posix()
+            Moved = MoveOutputs(BatchOutputDir, self.OutputDir, Exclude = [DataPath])
+            self.mergeSpeakersData(DataPath, {**StagedFiles, **Moved})
+        else:
+            Moved = MoveOutputs(BatchOutputDir, self.OutputDir)
+        shutil.rmtree(BatchDir, ignore_errors = True)
+        return list(Moved.values())
+
+    def mergeSpeakersData(self, DataPath: str, PathMap: dict):
+        '''
+        Append the lines of a batch's speaker data file with its paths pointed at the final files
+        '''
+        if not Path(DataPath).exists():
+            return
+        PathMap = {Path(Src).as_posix(): Dst for Src, Dst in PathMap.items()}
+        with open(DataPath, mode = 'r', encoding = 'utf-8') as File:
+            Lines = File.readlines()
+        MergedPath = Path(self.OutputDir).joinpath(f"{self.Params['AudioSpeakersData_Name']}.txt")
+        with open(MergedPath, mode = 'a', encoding = 'utf-8') as File:
+            for Line in Lines:
+                if not Line.strip():
+                    continue
+                AudioPath, Rest = Line.rstrip('\n').split('|', 1)
+                File.write(f"{PathMap.get(Path(AudioPath).as_posix(), AudioPath)}|{Rest}\n")
+
+
+def RunStage(StageItem: Stage, InputRoot: Optional[str], InQueue: object, OutQueue: Optional[object], BatchSize: int, Total: Optional[int] = None):
+    '''
+    Take files from the upstream queue, run them in micro-batches and pass the outputs downstream
+    '''
+    Events.setSink(Events.EventSink.fromEnv())
+    Control.install()
+    Tracker = Events.Progress(StageItem.Name, Total)
+    Finished = False
+    Failed = False
+    while not Finished and not Control.isRequested():
+        Files = []
+        Item = InQueue.get()
+        while True:
+            if Item is None:
+                Finished = True
+                break
+            Files.extend(Item)
+            if len(Files) >= BatchSize:
+                break
+            try:
+                Item = InQueue.get_nowait()
+            except Empty:
+                break
+        while Files and not Control.isRequested():
+            Batch, Files = Files[:BatchSize], Files[BatchSize:]
+            try:
+                Outputs = StageItem.runBatch(Batch, InputRoot)
+            except Exception as e:
+                traceback.print_exc()
+                Events.emitError(e, Stage = StageItem.Name)
+                Failed = True
+                continue
+            print(f"[{StageItem.Name}] {len(Batch)} file(s) done, {len(Outputs)} output(s) passed on", flush = True)
+            Tracker.update(len(Batch), Force = True)
+            OutQueue.put(Outputs) if OutQueue is not None and Outputs else None
+        if Failed:
+            break
+    if (Failed or Control.isRequested()) and not Finished:
+        while InQueue.get() is not None:
+            pass
+    OutQueue.put(None) if OutQueue is not None else None
+    Tracker.close()
+    sys.exit(1 if Failed else (Control.ExitCode if Control.isRequested() else 0))
+
+
+class Pipeline:
+    '''
+    Chain the tools headlessly with params from the GUI's config files
+    '''
+    def __init__(self,
+        ConfigDir: str,
+        Stages: list = StageOrder,
+        Model: str = 'GPT-SoVITS',
+        BatchSize: int = 8,
+        WorkDir: Optional[str] = None,
+        Prefilter: bool = True,
+        Dedup: bool = False
+    ):
+        Indices = sorted(StageOrder.index(Name) for Name in Stages)
+        if Indices != list(range(Indices[0], Indices[-1] + 1)):
+            raise Exception("Stages of a pipeline should be consecutive")
+        self.Stages = [StageOrder[Index] for Index in Indices]
+        self.Tools = {Name: StageTools[Name].format(Model = Models[Model]) for Name in self.Stages}
+        self.Params = {Name: LoadParams(ConfigDir, Tool) for Name, Tool in self.Tools.items()}
+        self.BatchSize = BatchSize
+        self.WorkDir = WorkDir
+        self.Prefilter = Prefilter
+        self.Dedup = Dedup
+
+    def linkParams(self):
+        '''
+        Point the inputs of each stage at the outputs of the previous one
+        '''
+        Get = lambda Name, Param: self.Params[Name][Param]
+        OutputDir = lambda Name: Path(Get(Name, 'Output_Root'), Get(Name, 'Output_Dir_Name')).as_posix()
+        if 'Process' in self.Stages and 'VPR' in self.Stages:
+            self.Params['VPR']['Audio_Dir_Input'] = OutputDir('Process')
+        if 'VPR' in self.Stages and 'ASR' in self.Stages:
+            self.Params['ASR']['Audio_Dir'] = OutputDir('VPR')
+        if 'VPR' in self.Stages and 'DAT' in self.Stages:
+            self.Params['DAT']['AudioSpeakersData_Path'] = Path(OutputDir('VPR')).joinpath(f"{Get('VPR', 'AudioSpeakersData_Name')}.txt").as_posix()
+        if 'ASR' in self.Stages and 'DAT' in self.Stages:
+            self.Params['DAT']['SRT_Dir'] = OutputDir('ASR')
+        if 'DAT' in self.Stages and 'Train' in self.Stages:
+            if 'FileList_Name' in self.Params['DAT']:
+                self.Params['Train']['FileList_Path'] = Path(OutputDir('DAT')).joinpath(f"{Get('DAT', 'FileList_Name')}.txt").as_posix()
+            else:
+                self.Params['Train']['FileList_Path_Training'] = Path(OutputDir('DAT')).joinpath(f"{Get('DAT', 'FileList_Name_Training')}.txt").as_posix()
+                self.Params['Train']['FileList_Path_Validation'] = Path(OutputDir('DAT')).joinpath(f"{Get('DAT', 'FileList_Name_Validation')}.txt").as_posix()
+
+    def prefilter(self, Files: list):
+        '''
+        Sort the inputs of the Process stage by their headers before anything is decoded:
+        unreadable files and files shorter than a clip are dropped.
+        Returns the files left to process and the files already in the output format
+        '''
+        from AudioKit.Prefilter import Prefilter, Summarize
+        Params = self.Params['Process']
+        Groups, Headers = Prefilter(
+            Files,
+            Audio_Length_Min = Params['Audio_Length_Min'] if Params['Slice_Audio'] else None,
+            SampleRate = int(Params['SampleRate']) if Params['SampleRate'] not in (None, '') else None,
+            ToMono = Params['ToMono'],
+            SampleWidth = Params['SampleWidth'],
+            Media_Format_Output = Params['Media_Format_Output'] if not (Params['Denoise_Audio'] or Params['Slice_Audio']) else None
+        )
+        for Line in Summarize(Groups, Headers):
+            print(f"[Process] {Line}", flush = True)
+        Events.emit('Prefiltered', Stage = 'Process', **{Verdict: len(Paths) for Verdict, Paths in Groups.items()})
+        return Groups['Process'], Groups['Conforming']
+
+    def dedup(self, Files: list):
+        '''
+        Keep one representative of every group of exact or near duplicate inputs, the groups are reported in Duplicates.json
+        under the output root of the Process stage
+        '''
+        from AudioKit.Fingerprint import FindDuplicates, Representatives, Summarize
+        Duplicates = FindDuplicates(Files)
+        ReportPath = Path(self.Params['Process']['Output_Root']).joinpath('Duplicates.json')
+        os.makedirs(ReportPath.parent, exist_ok = True)
+        with open(ReportPath, mode = 'w', encoding = 'utf-8') as File:
+            json.dump(Duplicates, File, ensure_ascii = False, indent = 4)
+        print(f"[Process] {Summarize(Files, Duplicates)}, see {ReportPath.as_posix()}", flush = True)
+        Events.emit('Deduplicated', Stage = 'Process', Groups = len(Duplicates), Dropped = sum(len(Group['Members']) for Group in Duplicates))
+        return Representatives(Files, Duplicates)
+
+    def linkConforming(self, Files: list, InputRoot: str):
+        '''
+        Link the inputs already in the output format into the output dir of the Process stage as they are
+        '''
+        Params = self.Params['Process']
+        Linked = []
+        for File in Files:
+            Dst = Path(Params['Output_Root'], Params['Output_Dir_Name'], Path(File).relative_to(InputRoot)).as_posix()
+            LinkFile(File, Dst) if not Path(Dst).exists() else None
+            Linked.append(Dst)
+        return Linked
+
+    def runStreaming(self, Names: list, WorkDir: str):
+        '''
+        Run the streaming stages side by side in their own processes
+        '''
+        First = self.Stages[0]
+        InputRoot = self.Params[First][StageInputs[First]]
+        if not Path(InputRoot).is_dir():
+            raise Exception(f"Input dir not found: {InputRoot}")
+
+        if 'VPR' in Names:
+            DataPath = Path(self.Params['VPR']['Output_Root'], self.Params['VPR']['Output_Dir_Name'], f"{self.Params['VPR']['AudioSpeakersData_Name']}.txt")
+            DataPath.unlink() if DataPath.exists() else None
+
+        Files = ListFiles(InputRoot)
+        Linked = []
+        if First == 'Process':
+            Files, Conforming = self.prefilter(Files) if self.Prefilter else (Files, [])
+            if self.Dedup:
+                Kept = set(self.dedup(Files + Conforming))
+                Files, Conforming = [File for File in Files if File in Kept], [File for File in Conforming if File in Kept]
+            Linked = self.linkConforming(Conforming, InputRoot)
+        Context = multiprocessing.get_context('spawn')
+        Queues = [Context.Queue() for _ in range(len(Names) + 1)]
+        Processes = []
+        StageItems = [Stage(Name, self.Tools[Name], self.Params[Name], WorkDir) for Name in Names]
+        for Index, (Name, StageItem) in enumerate(zip(Names, StageItems)):
+            Processes.append(
+                Context.Process(
+                    target = RunStage,
+                    args = (StageItem, InputRoot if Index == 0 else StageItems[Index - 1].OutputDir, Queues[Index], Queues[Index + 1] if Index + 1 < len(Names) else None, self.BatchSize, len(Files) if Index == 0 else None),
+                    name = f"EVT_{Name}"
+                )
+            )
+        for Process in Processes:
+            Process.start()
+
+        for Index in range(0, len(Linked), self.BatchSize):
+            Queues[1].put(Linked[Index : Index + self.BatchSize]) if len(Names) > 1 else None # Straight to the stage after Process
+        for Index in range(0, len(Files), self.BatchSize):
+            Queues[0].put(Files[Index : Index + self.BatchSize])
+        Queues[0].put(None) # The first stage stops taking files on cancel and drains the rest
+
+        for Process in Processes:
+            Process.join()
+        Failed = [Name for Name, Process in zip(Names, Processes) if Process.exitcode not in (0, Control.ExitCode)]
+        if Failed:
+            raise Exception(f"Stage(s) failed: {', '.join(Failed)}")
+        Control.check()
+
+    def run(self):
+        self.linkParams()
+        WorkDir = self.WorkDir if self.WorkDir is not None else tempfile.mkdtemp(prefix = 'EVT_Pipeline_')
+        try:
+            Names = [Name for Name in self.Stages if Name in StreamingStages]
+            self.runStreaming(Names, WorkDir) if Names else None
+            for Name in self.Stages:
+                if Name in StreamingStages:
+                    continue
+                print(f"[{Name}] Running {self.Tools[Name]}", flush = True)
+                if runJob(Job(self.Tools[Name], self.Params[Name]), Worker(self.Tools[Name])) == 'Cancelled':
+                    raise Control.Cancelled("Stopped on request")
+        except Control.Cancelled:
+            print("Pipeline cancelled, the finished part is kept", flush = True)
+            Events.emit('Cancelled', Tool = 'Pipeline', Stages = self.Stages)
+            return 'Cancelled'
+        except Exception as e:
+            Events.emitError(e, Stage = 'Pipeline')
+            raise
+        else:
+            Events.emit('Finished', Tool = 'Pipeline', Stages = self.Stages)
+            return 'Finished'
+        finally:
+            shutil.rmtree(WorkDir, ignore_errors = True) if self.WorkDir is None else None
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m Runtime.Pipeline", description = "Run the toolchain headlessly")
+    parser.add_argument("--config",     help = "dir of the config files written by the GUI", required = True)
+    parser.add_argument("--stages",     help = "stages to run",                      nargs = '+', choices = StageOrder, default = StageOrder)
+    parser.add_argument("--model",      help = "model type for creating dataset and training", choices = list(Models.keys()), default = 'GPT-SoVITS')
+    parser.add_argument("--batch-size", help = "number of files per micro-batch",    type = int, default = 8)
+    parser.add_argument("--work-dir",   help = "dir to keep the intermediate files", default = None)
+    parser.add_argument("--no-prefilter", help = "decode every input even if its header shows it would be dropped or is already in the output format", action = "store_true")
+    parser.add_argument("--dedup",      help = "process only one of every group of duplicate inputs, found by audio fingerprints", action = "store_true")
+    parser.add_argument("--events",     help = "file to write progress/error events to as JSON lines", default = None)
+    parser.add_argument("--cancel",     help = "file whose creation asks the pipeline to stop after the current batches", default = None)
+    args = parser.parse_args()
+
+    if args.events is not None:
+        os.environ['EVT_EVENT_PATH'] = os.path.abspath(args.events)
+    if args.cancel is not None:
+        os.environ['EVT_CANCEL_PATH'] = os.path.abspath(args.cancel)
+    Events.setSink(Events.EventSink.fromEnv())
+    Control.install()
+
+    Result = Pipeline(
+        ConfigDir = args.config,
+        Stages = args.stages,
+        Model = args.model,
+        BatchSize = args.batch_size,
+        WorkDir = args.work_dir,
+        Prefilter = not args.no_prefilter,
+        Dedup = args.dedup
+    ).run()
+    sys.exit(Control.ExitCode if Result == 'Cancelled' else 0)
+
+##############################################################################################################################
@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from .Job import Job
+from . import Control
+
+##############################################################################################################################
+
+# Default reservation of each tool: (CPU threads, memory in GB), 0 threads means all cores
+Reservations = {
+    'Audio_Processing': (2, 2),
+    'Voice_Identifying': (2, 3),
+    'Voice_Transcribing': (4, 6),
+    'Dataset_Creating_GPTSoVITS': (2, 2),
+    'Dataset_Creating_VITS': (2, 2),
+    'Train_GPTSoVITS': (0, 12),
+    'Train_VITS': (0, 12),
+    'Convert_GPTSoVITS': (2, 4),
+    'Convert_VITS': (2, 2)
+}
+
+# Env vars that cap the threads used by numerical libraries
+ThreadEnvs = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS']
+
+##############################################################################################################################
+
+def GetSystemResources():
+    '''
+    Return the number of CPU cores and the total memory in GB
+    '''
+    Cores = os.cpu_count() or 1
+    try:
+        import psutil
+        return Cores, psutil.virtual_memory().total / 1024**3
+    except ImportError:
+        pass
+    if Path('/proc/meminfo').exists():
+        with open('/proc/meminfo', mode = 'r') as File:
+            for Line in File:
+                if Line.startswith('MemTotal:'):
+                    return Cores, int(Line.split()[1]) / 1024**2
+    if sys.platform == 'win32':
+        import ctypes
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ('dwLength', ctypes.c_ulong),
+                ('dwMemoryLoad', ctypes.c_ulong),
+                ('ullTotalPhys', ctypes.c_ulonglong),
+                ('ullAvailPhys', ctypes.c_ulonglong),
+                ('ullTotalPageFile', ctypes.c_ulonglong),
+                ('ullAvailPageFile', ctypes.c_ulonglong),
+                ('ullTotalVirtual', ctypes.c_ulonglong),
+                ('ullAvailVirtual', ctypes.c_ulonglong),
+                ('sullAvailExtendedVirtual', ctypes.c_ulonglong)
+            ]
+        Status = MEMORYSTATUSEX()
+        Status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(Status))
+        return Cores, Status.ullTotalPhys / 1024**3
+    return Cores, 8.
+
+
+def IsProcessAlive(PID: Optional[int]):
+    '''
+    Check if a process with the given PID is still running
+    '''
+    if not PID:
+        return False
+    try:
+        import psutil
+        return psutil.pid_exists(PID)
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        Handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, PID) # PROCESS_QUERY_LIMITED_INFORMATION
+        if not Handle:
+            return False
+        ExitCode = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(Handle, ctypes.byref(ExitCode))
+        ctypes.windll.kernel32.CloseHandle(Handle)
+        return ExitCode.value == 259 # STILL_ACTIVE
+    try:
+        os.kill(PID, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class QueueLock:
+    '''
+    Exclusive lock on a queue shared by every process that changes it (schedulers, the GUI and the CLI)
+    '''
+    def __init__(self, LockPath: str):
+        self.LockPath = LockPath
+        self.File = None
+
+    def __enter__(self):
+        self.File = open(self.LockPath, mode = 'a+b')
+        if sys.platform == 'win32':
+            import msvcrt
+            self.File.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.File.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError: # Gives up after 10 seconds, keep waiting
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(self.File.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *Args):
+        if sys.platform == 'win32':
+            import msvcrt
+            self.File.seek(0)
+            msvcrt.locking(self.File.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self.File.fileno(), fcntl.LOCK_UN)
+        self.File.close()
+        self.File = None
+
+
+class JobQueue:
+    '''
+    A persistent queue keeping one JSON file per entry
+    '''
+    def __init__(self, QueueDir: str):
+        self.QueueDir = QueueDir
+        os.makedirs(self.QueueDir, exist_ok = True)
+
+    def getEntryPath(self, Id: str):
+        return Path(self.QueueDir).joinpath(f'{Id}.json').as_posix()
+
+    def lock(self):
+        '''
+        Hold this while reading and writing back entries that other processes may change in the meantime
+        '''
+        return QueueLock(Path(self.QueueDir).joinpath('Queue.lock').as_posix())
+
+    def save(self, Entry: dict):
+        EntryPath = self.getEntryPath(Entry['Id'])
+        with open(f'{EntryPath}.tmp', mode = 'w', encoding = 'utf-8') as File:
+            json.dump(Entry, File, ensure_ascii = False, indent = 4)
+        os.replace(f'{EntryPath}.tmp', EntryPath)
+
+    def get(self, Id: str):
+        try:
+            with open(self.getEntryPath(Id), mode = 'r', encoding = 'utf-8') as File:
+                return json.load(File)
+        except (OSError, ValueError):
+            return None
+
+    def add(self, JobSpec: dict, Priority: int = 0, Threads: Optional[int] = None, Memory: Optional[float] = None):
+        '''
+        Validate a job spec and put it into the queue
+        '''
+        JobItem = Job.fromDict(JobSpec)
+        DefaultThreads, DefaultMemory = Reservations.get(JobItem.Tool, (1, 1))
+        Workers = JobItem.Params.get('Worker_Count', 1)
+        DefaultThreads, DefaultMemory = (max(DefaultThreads, Workers) if DefaultThreads > 0 else 0), DefaultMemory * Workers
+        Entry = {
+            'Id': f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            'Job': JobItem.toDict(),
+            'Priority': Priority,
+            'Threads': DefaultThreads if Threads is None else Threads,
+            'Memory': DefaultMemory if Memory is None else Memory,
+            'Status': 'Queued',
+            'Created': time.time(),
+            'Started': None,
+            'Ended': None
+        }
+        self.save(Entry)
+        return Entry['Id']
+
+    def list(self):
+        '''
+        Return all entries in running order (higher priority first, then first come first served)
+        '''
+        Entries = []
+        for FileName in os.listdir(self.QueueDir):
+            if FileName.endswith('.json'):
+                Entry = self.get(FileName[:-5])
+                Entries.append(Entry) if Entry is not None else None
+        return sorted(Entries, key = lambda Entry: (-Entry['Priority'], Entry['Created']))
+
+    def remove(self, Id: str):
+        '''
+        Drop a waiting entry, or ask the scheduler to stop a running one
+        '''
+        with self.lock():
+            Entry = self.get(Id)
+            if Entry is None:
+                return
+            if Entry['Status'] in ('Running', 'Cancelling'):
+                Entry['Status'] = 'Cancelling'
+                self.save(Entry)
+            else:
+                os.remove(self.getEntryPath(Id))
+
+    def clear(self):
+        '''
+        Drop the entries that have ended
+        '''
+        with self.lock():
+            for Entry in self.list():
+                os.remove(self.getEntryPath(Entry['Id'])) if Entry['Status'] in ('Finished', 'Failed', 'Cancelled') else None
+
+
+class Scheduler:
+    '''
+    Start queued jobs as long as the reserved threads and memory fit the machine
+    '''
+    def __init__(self,
+        Queue: JobQueue,
+        Cores: Optional[int] = None,
+        Memory: Optional[float] = None,
+        MemoryFraction: float = 0.9,
+        RecordDir: Optional[str] = None,
+        CancelTimeout: float = 60.
+    ):
+        self.Queue = Queue
+        SystemCores, SystemMemory = GetSystemResources()
+        self.Cores = SystemCores if Cores is None else Cores
+        self.Memory = (SystemMemory if Memory is None else Memory) * MemoryFraction
+        self.RecordDir = RecordDir
+        self.Running = {}
+        self.Offsets = {}
+        self.CancelTimeout = CancelTimeout
+        self.CancelTimes = {}
+
+    def getReservation(self, Entry: dict):
+        Threads = self.Cores if Entry['Threads'] <= 0 else min(Entry['Threads'], self.Cores)
+        return Threads, min(Entry['Memory'], self.Memory)
+
+    def getUsage(self):
+        Threads, Memory = 0, 0.
+        for Entry, _ in self.Running.values():
+            EntryThreads, EntryMemory = self.getReservation(Entry)
+            Threads += EntryThreads
+            Memory += EntryMemory
+        return Threads, Memory
+
+    def getEventPath(self, Id: str):
+        return Path(self.Queue.QueueDir).joinpath('Events', f'{Id}.jsonl').as_posix()
+
+    def getCancelPath(self, Id: str):
+        return Path(self.Queue.QueueDir).joinpath('Events', f'{Id}.cancel').as_posix()
+
+    def cancel(self, Id: str, Process: subprocess.Popen):
+        '''
+        Ask a running job to stop after its current batch, and kill it if it's still running after the grace period
+        '''
+        CancelPath = Path(self.getCancelPath(Id))
+        if not CancelPath.exists():
+            os.makedirs(CancelPath.parent, exist_ok = True)
+            CancelPath.touch()
+            self.CancelTimes[Id] = time.time()
+        elif time.time() - self.CancelTimes.setdefault(Id, time.time()) > self.CancelTimeout:
+            Process.kill()
+
+    def readEvents(self, Id: str):
+        '''
+        Read the events written since the last call and keep the latest progress of the entry
+        '''
+        EventPath = self.getEventPath(Id)
+        Offset = self.Offsets.get(Id, 0)
+        if not Path(EventPath).exists():
+            return []
+        with open(EventPath, mode = 'rb') as File:
+            File.seek(Offset)
+            Data = File.read()
+        Data = Data[:Data.rfind(b'\n') + 1]
+        self.Offsets[Id] = Offset + len(Data)
+        Received = []
+        for Line in Data.decode('utf-8', errors = 'replace').splitlines():
+            try:
+                Received.append(json.loads(Line))
+            except ValueError:
+                continue
+        return Received
+
+    def start(self, Entry: dict):
+        '''
+        Launch an entry unless it was removed or taken by another scheduler since it was listed
+        '''
+        with self.Queue.lock():
+            Entry = self.Queue.get(Entry['Id'])
+            if Entry is None or Entry['Status'] != 'Queued':
+                return
+            JobPath = Path(self.Queue.QueueDir).joinpath('Jobs', f"{Entry['Id']}.json")
+            Job.fromDict(Entry['Job']).save(JobPath)
+            Threads, _ = self.getReservation(Entry)
+            Args = [sys.executable, '-m', 'Runtime', JobPath.as_posix()]
+            Args += ['--records', self.RecordDir] if self.RecordDir is not None else []
+            Args += ['--events', self.getEventPath(Entry['Id'])]
+            Args += ['--cancel', self.getCancelPath(Entry['Id'])]
+            Process = subprocess.Popen(
+                Args,
+                cwd = Path(__file__).parents[1].as_posix(),
+                env = {**os.environ, **{Env: str(Threads) for Env in ThreadEnvs}, 'EVT_NUM_THREADS': str(Threads)}
+            )
+            Entry.update({'Status': 'Running', 'Started': time.time(), 'PID': Process.pid, 'Scheduler': os.getpid()})
+            self.Queue.save(Entry)
+        self.Running[Entry['Id']] = (Entry, Process)
+        print(f"Started {Entry['Job']['Tool']} ({Entry['Id']}) with {Threads} thread(s)", flush = True)
+
+    def reap(self):
+        '''
+        Pass on the progress of running entries and settle the ended ones, merging into the stored entries under the lock
+        so that a stop request written in the meantime is never overwritten
+        '''
+        for Id, (Entry, Process) in list(self.Running.items()):
+            Received = self.readEvents(Id)
+            for Event in Received:
+                if Event.get('Type') == 'Progress':
+                    Entry['Progress'] = {Key: Event.get(Key) for Key in ('Stage', 'Done', 'Total', 'Rate', 'ETA')}
+                if Event.get('Type') == 'Error':
+                    Entry['Error'] = f"{Event.get('Error')}: {Event.get('Message')}"
+            Ended = Process.poll() is not None
+            with self.Queue.lock():
+                Latest = self.Queue.get(Id)
+                if Ended:
+                    Entry['Status'] = 'Cancelled' if Latest is None or Latest['Status'] == 'Cancelling' or Process.returncode == Control.ExitCode else ('Finished' if Process.returncode == 0 else 'Failed')
+                    Entry['Ended'] = time.time()
+                Changes = {Key: Entry[Key] for Key in ('Progress', 'Error', 'Status', 'Ended') if Key in Entry and (Ended or Key != 'Status')}
+                self.Queue.save({**Latest, **Changes}) if Latest is not None and (Received or Ended) else None
+            if not Ended:
+                self.cancel(Id, Process) if Latest is not None and Latest['Status'] == 'Cancelling' else None
+                continue
+            del self.Running[Id]
+            self.Offsets.pop(Id, None)
+            self.CancelTimes.pop(Id, None)
+            Path(self.getCancelPath(Id)).unlink() if Path(self.getCancelPath(Id)).exists() else None
+            print(f"{Entry['Status']} {Entry['Job']['Tool']} ({Id})", flush = True)
+
+    def recover(self):
+        '''
+        Put back the entries left running by a scheduler that is gone, once their own process has ended as well
+        (entries of another live scheduler on the same queue are left to it)
+        '''
+        with self.Queue.lock():
+            for Entry in self.Queue.list():
+                if Entry['Status'] not in ('Running', 'Cancelling') or Entry['Id'] in self.Running:
+                    continue
+                if IsProcessAlive(Entry.get('Scheduler')) or IsProcessAlive(Entry.get('PID')):
+                    continue
+                Entry['Status'] = 'Queued' if Entry['Status'] == 'Running' else 'Cancelled'
+                self.Queue.save(Entry)
+
+    def schedule(self):
+        '''
+        Start waiting entries in order until the next one doesn't fit
+        '''
+        for Entry in self.Queue.list():
+            if Entry['Status'] != 'Queued':
+                continue
+            Threads, Memory = self.getReservation(Entry)
+            UsedThreads, UsedMemory = self.getUsage()
+            if self.Running and (UsedThreads + Threads > self.Cores or UsedMemory + Memory > self.Memory):
+                break
+            try:
+                self.start(Entry)
+            except Exception as e:
+                with self.Queue.lock():
+                    Entry = self.Queue.get(Entry['Id'])
+                    self.Queue.save({**Entry, 'Status': 'Failed', 'Ended': time.time(), 'Error': str(e)}) if Entry is not None else None
+
+    def run(self, Watch: bool = False, Interval: float = 1.):
+        '''
+        Run the queue until it's drained (or forever if watching for new entries)
+        '''
+        print(f"Scheduling with {self.Cores} thread(s) and {self.Memory:.1f} GB of memory", flush = True)
+        while True:
+            self.reap()
+            self.recover()
+            self.schedule()
+            if not Watch and not self.Running and not any(Entry['Status'] == 'Queued' for Entry in self.Queue.list()):
+                break
+            time.sleep(Interval)
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m Runtime.Scheduler", description = "Queue jobs and run them within the machine's resources")
+    parser.add_argument("--queue", help = "dir of the job queue", required = True)
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+    parser_add = subparsers.add_parser("add", help = "put a job file into the queue")
+    parser_add.add_argument("job",        help = "path to the job file")
+    parser_add.add_argument("--priority", help = "higher runs first",           type = int,   default = 0)
+    parser_add.add_argument("--threads",  help = "CPU threads to reserve",      type = int,   default = None)
+    parser_add.add_argument("--memory",   help = "memory to reserve in GB",     type = float, default = None)
+    parser_list = subparsers.add_parser("list", help = "show the queue")
+    parser_remove = subparsers.add_parser("remove", help = "remove or stop a job")
+    parser_remove.add_argument("id", help = "id of the job")
+    parser_clear = subparsers.add_parser("clear", help = "remove the jobs that have ended")
+    parser_run = subparsers.add_parser("run", help = "run the queued jobs")
+    parser_run.add_argument("--watch",   help = "keep waiting for new jobs",    action = "store_true")
+    parser_run.add_argument("--cores",   help = "CPU threads to use in total",  type = int,   default = None)
+    parser_run.add_argument("--memory",  help = "memory to use in total in GB", type = float, default = None)
+    parser_run.add_argument("--records", help = "dir to keep records of finished jobs", default = None)
+    parser_run.add_argument("--cancel-timeout", help = "seconds a cancelled job gets to stop by itself", type = float, default = 60.)
+    args = parser.parse_args()
+
+    Queue = JobQueue(args.queue)
+    if args.command == "add":
+        with open(args.job, mode = 'r', encoding = 'utf-8') as File:
+            print(Queue.add(json.load(File), args.priority, args.threads, args.memory))
+    if args.command == "list":
+        for Entry in Queue.list():
+            print(f"{Entry['Id']}  {Entry['Status']:<10}  P{Entry['Priority']:<3}  {Entry['Threads']:>2}T  {Entry['Memory']:>5.1f}GB  {Entry['Job']['Tool']}")
+    if args.command == "remove":
+        Queue.remove(args.id)
+    if args.command == "clear":
+        Queue.clear()
+    if args.command == "run":
+        Scheduler(Queue, args.cores, args.memory, RecordDir = args.records, CancelTimeout = args.cancel_timeout).run(args.watch)
+
+##############################################################################################################################
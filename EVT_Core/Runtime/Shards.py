@@ -0,0 +1,72 @@
+import os
+import signal
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from . import Control
+from .Pipeline import Stage
+from .Scheduler import ThreadEnvs
+
+##############################################################################################################################
+
+# Stage of the current pool process
+ShardStage = None
+
+
+def InitShard(Name: str, Tool: str, Params: dict, WorkDir: str, Threads: int):
+    '''
+    Set up a pool process: cap its threads, leave Ctrl+C to the parent and give it its own work dir
+    '''
+    global ShardStage
+    for Env in ThreadEnvs + ['EVT_NUM_THREADS']:
+        os.environ[Env] = str(Threads)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ShardStage = Stage(Name, Tool, Params, Path(WorkDir).joinpath(f'Shard_{os.getpid()}').as_posix())
+
+
+def RunShard(Files: list, InputRoot: str):
+    return ShardStage.runBatch(Files, InputRoot)
+
+
+def RunSharded(
+    Name: str,
+    Tool: str,
+    Params: dict,
+    WorkDir: str,
+    Batches: list,
+    InputRoot: str,
+    Workers: int,
+    Callback: object
+):
+    '''
+    Spread the batches over a pool of processes and hand each finished batch with its outputs to the callback,
+    on cancel the batches not started yet are dropped and the running ones are waited for
+    '''
+    Threads = max(1, int(os.environ.get('EVT_NUM_THREADS') or os.cpu_count() or 1) // Workers)
+    with ProcessPoolExecutor(
+        max_workers = Workers,
+        mp_context = multiprocessing.get_context('spawn'),
+        initializer = InitShard,
+        initargs = (Name, Tool, Params, WorkDir, Threads)
+    ) as Executor:
+        Futures = {Executor.submit(RunShard, Batch, InputRoot): Batch for Batch in Batches}
+        Running = set(Futures)
+        Error = None
+        while Running:
+            Done, Running = wait(Running, timeout = 0.5, return_when = FIRST_COMPLETED)
+            for Future in Done:
+                if Future.cancelled():
+                    continue
+                if Future.exception() is not None:
+                    Error = Error or Future.exception()
+                    continue
+                Callback(Futures[Future], Future.result())
+            if Error is not None or Control.isRequested():
+                for Future in Running:
+                    Future.cancel()
+        if Error is not None:
+            raise Error
+    Control.check()
+
+##############################################################################################################################
@@ -0,0 +1,142 @@
+import os
+import sys
+import inspect
+import argparse
+import importlib
+import traceback
+from functools import lru_cache
+from multiprocessing.connection import Listener
+
+from . import Events, Control
+from .Job import Job, runJob
+
+##############################################################################################################################
+
+# Tools that can be served by a worker: {Tool: (Module, Attribute, Methods)}
+Tools = {
+    'Audio_Processing': ('AudioProcessor.Process', 'Audio_Processing', ['Process_Audio']),
+    'Voice_Identifying': ('VPR.Identify', 'Voice_Identifying', ['GetModel', 'Inference']),
+    'Voice_Transcribing': ('Whisper.Transcribe', 'Voice_Transcribing', ['Transcriber']),
+    'Dataset_Creating_GPTSoVITS': ('GPT_SoVITS.Create', 'Dataset_Creating', ['CallingFunctions']),
+    'Dataset_Creating_VITS': ('VITS.Create', 'Dataset_Creating', ['CallingFunctions']),
+    'Train_GPTSoVITS': ('GPT_SoVITS.Train', 'Train', []),
+    'Train_VITS': ('VITS.Train', 'Train', []),
+    'Convert_GPTSoVITS': ('GPT_SoVITS.Convert', 'Convert', []),
+    'Convert_VITS': ('VITS.Convert', 'Convert', [])
+}
+
+# Methods that only load models, and the params that decide which model gets loaded
+SetupMethods = {
+    'Voice_Identifying': (['GetModel'], ['Model_Path', 'Model_Type', 'Feature_Method'])
+}
+
+# Model loaders living in the tool's module that are safe to memoize
+ModelLoaders = {
+    'Voice_Transcribing': ['load_model']
+}
+
+##############################################################################################################################
+
+class Worker:
+    '''
+    Import a core tool once and keep its loaded models between jobs
+    '''
+    def __init__(self, Tool: str):
+        ModuleName, Attribute, self.Methods = Tools[Tool]
+        Events.InstallTqdmHook(Tool)
+        self.Module = importlib.import_module(ModuleName)
+        self.Target = getattr(self.Module, Attribute)
+
+        # Follow the thread reservation given by the scheduler
+        if 'torch' in sys.modules and os.environ.get('EVT_NUM_THREADS', '').isdigit():
+            sys.modules['torch'].set_num_threads(int(os.environ['EVT_NUM_THREADS']))
+
+        self.SetupMethods, self.ModelParams = SetupMethods.get(Tool, ([], []))
+        self.ModelKey = None
+        self.ModelAttributes = {}
+
+        for Loader in ModelLoaders.get(Tool, []):
+            if callable(getattr(self.Module, Loader, None)):
+                setattr(self.Module, Loader, lru_cache(maxsize = 1)(getattr(self.Module, Loader)))
+
+    def getModelKey(self, Params: tuple):
+        '''
+        Return the params that decide the loaded model, or None if they can't be told apart
+        '''
+        try:
+            Arguments = inspect.signature(self.Target).bind(*Params)
+        except TypeError:
+            return None
+        Arguments.apply_defaults()
+        if not all(Name in Arguments.arguments for Name in self.ModelParams):
+            return None
+        return tuple(repr(Arguments.arguments[Name]) for Name in self.ModelParams)
+
+    def Run(self, Params: tuple):
+        if not inspect.isclass(self.Target):
+            self.Target(*Params)
+            return
+
+        Instance = self.Target(*Params)
+        ModelKey = self.getModelKey(Params) if self.SetupMethods else None
+        Reusable = ModelKey is not None and ModelKey == self.ModelKey
+        if Reusable:
+            Instance.__dict__.update(self.ModelAttributes)
+        for Method in self.Methods:
+            if Method not in self.SetupMethods:
+                getattr(Instance, Method)()
+                continue
+            if Reusable:
+                continue
+            if Method == self.SetupMethods[0]:
+                self.ModelKey, self.ModelAttributes = None, {}
+            Before = dict(vars(Instance))
+            getattr(Instance, Method)()
+            # Keep whatever the setup (re)assigned, including attributes that __init__ pre-declared
+            self.ModelAttributes.update({Name: Value for Name, Value in vars(Instance).items() if Name not in Before or Before[Name] is not Value})
+            self.ModelKey = ModelKey
+
+
+def Serve(Tool: str):
+    '''
+    Serve job specs for the given tool over a local connection until the client disconnects
+    '''
+    AuthKey = bytes.fromhex(os.environ['EVT_WORKER_AUTHKEY'])
+    with Listener(('127.0.0.1', 0), authkey = AuthKey) as Server:
+        Host, Port = Server.address
+        print(f"Worker for {Tool} listening on {Host}:{Port}", flush = True)
+        ToolWorker = Worker(Tool)
+        Control.install()
+        with Server.accept() as Connection:
+            while True:
+                try:
+                    Request = Connection.recv()
+                except EOFError:
+                    break
+                Status, Error = 'Failed', None
+                Control.reset(Request.get('CancelPath'))
+                Events.setSink(Events.EventSink(Request.get('EventPath')) if Request.get('EventPath') else Events.EventSink.fromEnv())
+                try:
+                    JobItem = Job.fromDict(Request['Job'])
+                    if JobItem.Tool != Tool:
+                        raise Exception(f"Worker for {Tool} can't run jobs of {JobItem.Tool}")
+                    Status = runJob(JobItem, ToolWorker, Request.get('RecordDir'), Request.get('Force', False))
+                except Exception as e:
+                    traceback.print_exc()
+                    Error = f"{type(e).__name__}: {e}"
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    Events.setSink(None)
+                Connection.send((Status, Error))
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tool", help = "name of the tool to serve", choices = list(Tools.keys()), required = True)
+    args = parser.parse_args()
+
+    Serve(args.tool)
+
+##############################################################################################################################
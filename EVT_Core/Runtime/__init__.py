@@ -0,0 +1,3 @@
+'''
+Runtime helpers shared by the core tools (worker processes, job handling)
+'''
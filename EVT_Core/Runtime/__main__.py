@@ -0,0 +1,31 @@
+import sys
+import argparse
+from pathlib import Path
+
+from . import Events, Control
+from .Job import Job, runJob
+from .Worker import Worker
+
+##############################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m Runtime", description = "Run a core tool with a JSON job file")
+    parser.add_argument("job",       help = "path to the job file")
+    parser.add_argument("--records", help = "dir to keep records of finished jobs", default = None)
+    parser.add_argument("--force",   help = "run even if an identical job has finished", action = "store_true")
+    parser.add_argument("--events",  help = "file to write progress/error events to as JSON lines", default = None)
+    parser.add_argument("--cancel",  help = "file whose creation asks the run to stop after the current batch", default = None)
+    args = parser.parse_args()
+
+    Events.setSink(Events.EventSink(args.events) if args.events is not None else Events.EventSink.fromEnv())
+    Control.install(args.cancel)
+    JobItem = Job.load(args.job)
+    Result = runJob(
+        JobItem,
+        Worker(JobItem.Tool),
+        RecordDir = args.records if args.records is not None else Path(args.job).parent.joinpath('Records').as_posix(),
+        Force = args.force
+    )
+    sys.exit(Control.ExitCode if Result == 'Cancelled' else 0)
+
+##############################################################################################################################
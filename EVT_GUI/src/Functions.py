@@ -1,4 +1,5 @@
 import os
+import time
 import platform
 from typing import Union, Optional
 from PySide6.QtCore import Qt, QObject, Signal, Slot, QThread, QPoint
@@ -372,6 +373,25 @@ def Function_AnimateProgressBar(
         ProgressBar.setRange(MinValue, MaxValue)
         ProgressBar.setValue(MaxValue)
 
+
+def Function_UpdateProgressBar(
+    ProgressBar: QProgressBar,
+    Event: dict
+):
+    '''
+    Function to show the progress reported by a core tool
+    '''
+    Done, Total = Event.get('Done'), Event.get('Total')
+    if not Total:
+        return
+    ProgressBar.setRange(0, Total)
+    ProgressBar.setValue(min(Done, Total))
+    Text = f"{Event.get('Stage')}  {Done}/{Total}"
+    Text += f"  {Event['Rate']:.2f}/s" if Event.get('Rate') else ""
+    Text += f"  剩余 {time.strftime('%H:%M:%S', time.gmtime(Event['ETA']))}" if Event.get('ETA') is not None else ""
+    ProgressBar.setFormat(Text)
+    ProgressBar.setTextVisible(True)
+
 ##############################################################################################################################
 
 def Function_SetWidgetValue(
@@ -499,7 +519,9 @@ def Function_SetMethodExecutor(
     Params: Optional[tuple] = None,
     ParamsFrom: Optional[list[QObject]] = None,
     EmptyAllowed: Optional[list[QObject]] = None,
-    SuccessEvents: Optional[list] = None
+    SuccessEvents: Optional[list] = None,
+    QueueMethod: Optional[object] = None,
+    QueueViewer: Optional[object] = None
 ):
     '''
     Function to execute outer class methods
@@ -517,6 +539,7 @@ def Function_SetMethodExecutor(
         )
     ) if hasattr(ClassInstance, 'errChk') else None
     ClassInstance.finished.connect(lambda: FunctionSignals.Signal_TaskStatus.emit(QualName, 'Finished')) if hasattr(ClassInstance, 'finished') else None
+    ClassInstance.progress.connect(lambda Event: Function_UpdateProgressBar(ProgressBar, Event)) if hasattr(ClassInstance, 'progress') and ProgressBar else None
 
     if not isinstance(ClassInstance, QThread):
         WorkerThread = QThread()
@@ -563,10 +586,14 @@ def Function_SetMethodExecutor(
         WorkerThread.finished.connect(TempButton.deleteLater)
 
     @Slot()
-    def TerminateMethod():
+    def TerminateMethod(Graceful: bool = True):
         '''
-        Terminate the running thread
+        Terminate the running thread, or let it stop by itself after saving what's done if it can
         '''
+        if Graceful and hasattr(ClassInstance, 'Cancel') and WorkerThread.isRunning():
+            (ProgressBar.setFormat("正在停止..."), ProgressBar.setTextVisible(True)) if ProgressBar else None
+            return ClassInstance.Cancel()
+
         if not WorkerThread.isFinished():
             try:
                 WorkerThread.terminate()
@@ -589,10 +616,32 @@ def Function_SetMethodExecutor(
                 ButtonEvents = {QMessageBox.Yes: lambda: TerminateMethod()}
             )
         )
-        FunctionSignals.Signal_ForceQuit.connect(TerminateMethod)
+        FunctionSignals.Signal_ForceQuit.connect(lambda: TerminateMethod(Graceful = False))
     else:
         pass
 
+    @Slot()
+    def EnqueueMethod(Priority: int):
+        '''
+        Put the task into the job queue instead of running it right away
+        '''
+        Args = Params
+        if ParamsFrom not in ([], None):
+            Args = Function_ParamsChecker(ParamsFrom, EmptyAllowed)
+            if Args == "Abort":
+                return print("Aborted.")
+        QueueMethod(Args, Priority)
+
+    if ExecuteButton is not None and QueueMethod is not None:
+        QueueMenu = QMenu(ExecuteButton)
+        QueueMenu.addAction("加入任务队列（高优先级）").triggered.connect(lambda: EnqueueMethod(1))
+        QueueMenu.addAction("加入任务队列").triggered.connect(lambda: EnqueueMethod(0))
+        QueueMenu.addAction("加入任务队列（低优先级）").triggered.connect(lambda: EnqueueMethod(-1))
+        QueueMenu.addSeparator() if QueueViewer is not None else None
+        QueueMenu.addAction("查看任务队列").triggered.connect(QueueViewer) if QueueViewer is not None else None
+        ExecuteButton.setContextMenuPolicy(Qt.CustomContextMenu)
+        ExecuteButton.customContextMenuRequested.connect(lambda Pos: QueueMenu.exec(ExecuteButton.mapToGlobal(Pos)))
+
 ##############################################################################################################################
 
 def Function_UpdateChecker(
@@ -4,13 +4,18 @@ import time
 import json
 import hashlib
 import argparse
+import secrets
+import platform
+import threading
 import subprocess
 from pathlib import Path
 from glob import glob
+from typing import Optional
 from datetime import date, datetime
 from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client
 from PySide6 import __file__ as PySide6_File
-from PySide6.QtCore import Qt, QObject, Signal, Slot, QThread
+from PySide6.QtCore import Qt, QObject, Signal, Slot, QThread, QTimer
 from PySide6.QtCore import QCoreApplication as QCA
 from PySide6.QtGui import QColor, QPixmap, QIcon, QTextCursor
 from QEasyWidgets import QFunctions as QFunc
@@ -59,6 +64,12 @@ Config.editConfig('Info', 'CurrentVersion', str(CurrentVersion))
 Config.editConfig('Info', 'ExecuterName', str(QFunc.GetFileInfo()[0]))
 
 
+# Set up dirs for job files
+JobDir = QFunc.NormPath(Path(ProfileDir).joinpath('Jobs'))
+JobRecordDir = QFunc.NormPath(Path(JobDir).joinpath('Records'))
+QueueDir = QFunc.NormPath(Path(JobDir).joinpath('Queue'))
+
+
 # Set up environment variables while python file is not compiled
 if IsFileCompiled == False:
     QFunc.SetEnvVar( # Redirect PATH variable 'QT_QPA_PLATFORM_PLUGIN_PATH' to Pyside6 '/plugins/platforms' folder's path
@@ -109,112 +120,385 @@ class Execute_Update_Checking(QObject):
 
 ##############################################################################################################################
 
-# Tools: AudioProcessor
-class Execute_Audio_Processing(QObject):
+# Tools: OutputForwarder
+def Forward_Output(Line: str):
     '''
-    Change media format to WAV (and denoise) and cut off the silent parts
+    Pass a line of a core process's console output on to the terminal and the log, without keeping it
+    '''
+    sys.stdout.write(Line) if sys.stdout is not None else None
+    with open(LogPath, mode = 'a', encoding = 'utf-8') as Log:
+        Log.write(Line)
+
+
+# Tools: CoreWorker
+class Core_Worker:
+    '''
+    Keep a core tool imported (with its models loaded) in a long-lived process and send jobs to it
+    '''
+    Workers = {}
+
+    def __init__(self, Tool: str):
+        self.Tool = Tool
+        self.Process = None
+        self.Connection = None
+
+    @classmethod
+    def get(cls, Tool: str):
+        if Tool not in cls.Workers:
+            cls.Workers[Tool] = cls(Tool)
+        return cls.Workers[Tool]
+
+    @classmethod
+    def shutdownAll(cls):
+        for Worker in list(cls.Workers.values()):
+            Worker.terminate()
+
+    def isAlive(self):
+        return self.Process is not None and self.Process.poll() is None and self.Connection is not None
+
+    def start(self):
+        AuthKey = secrets.token_hex(16)
+        self.Process = subprocess.Popen(
+            ['python', '-m', 'Runtime.Worker', '--tool', self.Tool],
+            cwd = CoreDir,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.STDOUT,
+            env = {**os.environ, 'EVT_WORKER_AUTHKEY': AuthKey, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'},
+            creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+        )
+        Address = None
+        for Line in iter(self.Process.stdout.readline, b''):
+            Line = Line.decode('utf-8', errors = 'replace')
+            Forward_Output(Line)
+            if 'listening on' in Line:
+                Host, Port = Line.strip().rsplit(' ', 1)[-1].rsplit(':', 1)
+                Address = (Host, int(Port))
+                break
+        if Address is None:
+            raise Exception(f"Failed to start worker for {self.Tool}")
+        self.Connection = Client(Address, authkey = bytes.fromhex(AuthKey))
+        threading.Thread(target = self.readOutput, daemon = True).start()
+
+    def readOutput(self):
+        for Line in iter(self.Process.stdout.readline, b''):
+            Forward_Output(Line.decode('utf-8', errors = 'replace'))
+
+    def run(self, Params: tuple, EventPath: Optional[str] = None, CancelPath: Optional[str] = None):
+        '''
+        Run a job and return its error, the progress and errors in detail go to the event file
+        '''
+        try:
+            self.start() if not self.isAlive() else None
+        except Exception as e:
+            self.terminate()
+            return None, f"Error occurred: failed to start worker for {self.Tool} ({e})"
+        try:
+            self.Connection.send({'Job': {'Tool': self.Tool, 'Params': list(Params)}, 'RecordDir': JobRecordDir, 'EventPath': EventPath, 'CancelPath': CancelPath})
+            Error = self.Connection.recv()[1]
+            Error = f"Error occurred in {self.Tool}: {Error}" if Error is not None else None
+        except (EOFError, OSError) as e:
+            self.terminate()
+            Error = f"Error occurred: worker for {self.Tool} exited unexpectedly ({e})"
+        return None, Error
+
+    def terminate(self):
+        try:
+            self.Connection.close() if self.Connection is not None else None
+        except OSError:
+            pass
+        QFunc.ProcessTerminator(self.Process.pid) if self.Process is not None else None
+        self.Process = None
+        self.Connection = None
+
+
+def Create_Job(Tool: str, Params: tuple):
+    '''
+    Write the params into a job file for the core entry point (python -m Runtime)
+    '''
+    os.makedirs(JobDir, exist_ok = True)
+    JobPath = QFunc.NormPath(Path(JobDir).joinpath(f"{Tool}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.json"))
+    with open(JobPath, mode = 'w', encoding = 'utf-8') as File:
+        json.dump({'Tool': Tool, 'Params': list(Params)}, File, ensure_ascii = False, indent = 4)
+    return JobPath
+
+
+def Use_Core_Worker():
+    return Config.getValue('Tools', 'WarmWorker', 'Enabled') == 'Enabled'
+
+
+# Tools: EventReader
+class Event_Reader:
+    '''
+    Follow the JSON-lines event file of a core tool and pass on its progress
+    '''
+    def __init__(self, EventPath: str, Callback: Optional[object] = None, Interval: float = 0.2):
+        self.EventPath = EventPath
+        self.Callback = Callback
+        self.Interval = Interval
+        self.Offset = 0
+        self.Received = False
+        self.Error = None
+        self.Finished = False
+        self.Cancelled = False
+        self.Stopped = threading.Event()
+        self.Thread = threading.Thread(target = self.follow, daemon = True)
+
+    def start(self):
+        self.Thread.start()
+
+    def stop(self):
+        self.Stopped.set()
+        self.Thread.join()
+        self.read()
+
+    def follow(self):
+        while not self.Stopped.wait(self.Interval):
+            self.read()
+
+    def read(self):
+        '''
+        Handle the lines written since the last read, leaving a partly written line for the next one
+        '''
+        if not Path(self.EventPath).exists():
+            return
+        with open(self.EventPath, mode = 'rb') as File:
+            File.seek(self.Offset)
+            Data = File.read()
+        Data = Data[:Data.rfind(b'\n') + 1]
+        self.Offset += len(Data)
+        for Line in Data.decode('utf-8', errors = 'replace').splitlines():
+            try:
+                Event = json.loads(Line)
+            except ValueError:
+                continue
+            self.handle(Event)
+
+    def handle(self, Event: dict):
+        self.Received = True
+        if Event.get('Type') == 'Progress':
+            self.Callback(Event) if self.Callback is not None else None
+        if Event.get('Type') == 'Error':
+            self.Error = Event
+        if Event.get('Type') in ('Finished', 'Skipped'):
+            self.Finished = True
+        if Event.get('Type') == 'Cancelled':
+            self.Cancelled = True
+
+
+def Create_EventPath(Tool: str):
+    os.makedirs(Path(JobDir).joinpath('Events'), exist_ok = True)
+    return QFunc.NormPath(Path(JobDir).joinpath('Events', f"{Tool}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.jsonl"))
+
+
+def Get_CancelPath(EventPath: str):
+    return QFunc.NormPath(Path(EventPath).with_suffix('.cancel'))
+
+
+def Request_Cancel(CancelPath: str, Terminator: object, Timeout: float = 60.):
+    '''
+    Ask a running core tool to stop after its current batch, and stop it by force if it's still running after the timeout
+    '''
+    Path(CancelPath).touch()
+    Timer = threading.Timer(Timeout, lambda: Terminator() if Path(CancelPath).exists() else None)
+    Timer.daemon = True
+    Timer.start()
+
+
+# Exit code of a core run that stopped on request (Runtime.Control.ExitCode)
+Cancelled_ExitCode = 130
+
+# Tools that stop between files on a cancel request (Runtime.Manifest.PerFileTools), the others can only be stopped by force
+Cancellable_Tools = ['Audio_Processing', 'Voice_Identifying', 'Voice_Transcribing']
+
+
+def Check_Result(Reader: Event_Reader, Error: Optional[str] = None, ReturnCode: int = 0, Terminated: bool = False):
+    '''
+    Decide the error message of a finished task from its events and its exit code (or the worker's error)
+    '''
+    if Terminated:
+        return "任务已终止，尚未写入磁盘的进度（如训练中还未保存为检查点的部分）已丢失"
+    if Reader.Cancelled or ReturnCode == Cancelled_ExitCode:
+        return "任务已取消，已完成的部分均已保留"
+    if Reader.Error is not None:
+        return f"Error occurred in {Reader.Error.get('Stage')}: {Reader.Error.get('Error')}: {Reader.Error.get('Message')}（详情请见终端输出信息）"
+    if Error is not None:
+        return Error + "（详情请见终端输出信息）"
+    if ReturnCode != 0:
+        return f"Error occurred: exited with code {ReturnCode}（详情请见终端输出信息）"
+    if Reader.Received and not Reader.Finished:
+        return "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
+    return None
+
+
+# Tools: CoreToolExecutor
+class Core_Tool_Executor(QObject):
+    '''
+    Run a core tool in the warm worker or a subprocess, following its events, and stop it on request
     '''
     started = Signal()
     finished = Signal()
 
     errChk = Signal(str)
+    progress = Signal(dict)
 
     def __init__(self):
         super().__init__()
 
+    def Run_Core_Tool(self, Tool: str, Params: tuple, UseWorker: bool = True):
+        '''
+        Run the tool with the given params and return its error (None if it finished fine)
+        '''
+        self.Tool, self.Terminated = Tool, False
+        EventPath = Create_EventPath(Tool)
+        Reader = Event_Reader(EventPath, self.progress.emit)
+        Reader.start()
+        self.CancelPath = Get_CancelPath(EventPath)
+        self.Worker = Core_Worker.get(Tool) if UseWorker and Use_Core_Worker() else None
+        if self.Worker is not None:
+            Error, ReturnCode = self.Worker.run(Params, EventPath, self.CancelPath)[1], 0
+        else:
+            JobPath = Create_Job(Tool, Params)
+            self.Process = subprocess.Popen(
+                ['python', '-m', 'Runtime', JobPath, '--records', JobRecordDir, '--events', EventPath, '--cancel', self.CancelPath],
+                cwd = CoreDir,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.STDOUT,
+                env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'},
+                creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+            )
+            for Line in iter(self.Process.stdout.readline, b''):
+                Forward_Output(Line.decode('utf-8', errors = 'replace'))
+            Error, ReturnCode = None, self.Process.wait()
+        Reader.stop()
+        Path(self.CancelPath).unlink(missing_ok = True)
+        self.CancelPath = None
+        return Check_Result(Reader, Error, ReturnCode, self.Terminated)
+
+    def Terminate(self):
+        if getattr(self, 'Worker', None) is not None:
+            return self.Worker.terminate()
+        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
+
+    def Cancel(self):
+        '''
+        Let a per-file tool stop after its current batch, stop any other tool right away as it would never check the request
+        '''
+        if getattr(self, 'CancelPath', None) is not None and self.Tool in Cancellable_Tools:
+            return Request_Cancel(self.CancelPath, self.Terminate)
+        self.Terminated = True
+        self.Terminate()
+
+
+# Tools: JobScheduler
+class Job_Scheduler:
+    '''
+    Queue jobs and keep a scheduler process running them within the machine's resources
+    '''
+    Process = None
+
+    @classmethod
+    def isAlive(cls):
+        return cls.Process is not None and cls.Process.poll() is None
+
+    @classmethod
+    def call(cls, *Args: str):
+        Result = subprocess.run(
+            ['python', '-m', 'Runtime.Scheduler', '--queue', QueueDir, *Args],
+            cwd = CoreDir,
+            capture_output = True,
+            env = {**os.environ, 'PYTHONIOENCODING': 'utf-8'},
+            creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+        )
+        if Result.returncode != 0:
+            Errors = Result.stderr.decode('utf-8', errors = 'replace').strip().splitlines()
+            raise Exception(Errors[-1] if Errors else f"Failed to call the scheduler ({Result.returncode})")
+        return Result.stdout.decode('utf-8', errors = 'replace')
+
+    @classmethod
+    def start(cls):
+        if cls.isAlive():
+            return
+        cls.Process = subprocess.Popen(
+            ['python', '-m', 'Runtime.Scheduler', '--queue', QueueDir, 'run', '--watch', '--records', JobRecordDir],
+            cwd = CoreDir,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.STDOUT,
+            env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'},
+            creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+        )
+        threading.Thread(target = cls.readOutput, args = (cls.Process, ), daemon = True).start()
+
+    @classmethod
+    def readOutput(cls, Process: subprocess.Popen):
+        for Line in iter(Process.stdout.readline, b''):
+            Forward_Output(Line.decode('utf-8', errors = 'replace'))
+
+    @classmethod
+    def enqueue(cls, Tool: str, Params: tuple, Priority: int = 0):
+        cls.call('add', Create_Job(Tool, Params), '--priority', str(Priority))
+        cls.start()
+
+    @classmethod
+    def remove(cls, Id: str):
+        cls.call('remove', Id)
+
+    @classmethod
+    def clear(cls):
+        cls.call('clear')
+
+    @classmethod
+    def getEntries(cls):
+        Entries = []
+        for EntryPath in glob(Path(QueueDir).joinpath('*.json').as_posix()):
+            try:
+                with open(EntryPath, mode = 'r', encoding = 'utf-8') as File:
+                    Entries.append(json.load(File))
+            except (OSError, ValueError):
+                pass
+        return sorted(Entries, key = lambda Entry: (-Entry['Priority'], Entry['Created']))
+
+    @classmethod
+    def shutdown(cls):
+        QFunc.ProcessTerminator(cls.Process.pid) if cls.isAlive() else None
+        cls.Process = None
+
+##############################################################################################################################
+
+# Tools: AudioProcessor
+class Execute_Audio_Processing(Core_Tool_Executor):
+    '''
+    Change media format to WAV (and denoise) and cut off the silent parts
+    '''
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from AudioProcessor.Process import Audio_Processing; '
-                f"AudioConvertandSlice = Audio_Processing{str(Params)}; "
-                'AudioConvertandSlice.Process_Audio()"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Audio_Processing', Params)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # Tools: VoiceIdentifier
-class Execute_Voice_Identifying_VPR(QObject):
+class Execute_Voice_Identifying_VPR(Core_Tool_Executor):
     '''
     Contrast the voice and filter out the similar ones
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from VPR.Identify import Voice_Identifying; '
-                f"AudioContrastInference = Voice_Identifying{str(Params)}; "
-                'AudioContrastInference.GetModel(); '
-                'AudioContrastInference.Inference()"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Voice_Identifying', Params)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # Tools: VoiceTranscriber
-class Execute_Voice_Transcribing_Whisper(QObject):
+class Execute_Voice_Transcribing_Whisper(Core_Tool_Executor):
     '''
     Transcribe WAV content to SRT
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
@@ -227,259 +511,84 @@ class Execute_Voice_Transcribing_Whisper(QObject):
             "日":       "ja",
             "japanese": "ja"
         }
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from Whisper.Transcribe import Voice_Transcribing; '
-                f"WAVtoSRT = Voice_Transcribing{str(QFunc.ItemReplacer(LANGUAGES, Params))}; "
-                'WAVtoSRT.Transcriber()"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Voice_Transcribing', QFunc.ItemReplacer(LANGUAGES, Params))
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # Tools: DatasetCreator
-class Execute_Dataset_Creating_GPTSoVITS(QObject):
+class Execute_Dataset_Creating_GPTSoVITS(Core_Tool_Executor):
     '''
     Convert the whisper-generated SRT to CSV and split the WAV
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from GPT_SoVITS.Create import Dataset_Creating; '
-                f"SRTtoCSVandSplitAudio = Dataset_Creating{str(Params)}; "
-                'SRTtoCSVandSplitAudio.CallingFunctions()"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Dataset_Creating_GPTSoVITS', Params)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
 
-
-class Execute_Dataset_Creating_VITS(QObject):
+class Execute_Dataset_Creating_VITS(Core_Tool_Executor):
     '''
     Convert the whisper-generated SRT to CSV and split the WAV
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from VITS.Create import Dataset_Creating; '
-                f"SRTtoCSVandSplitAudio = Dataset_Creating{str(Params)}; "
-                'SRTtoCSVandSplitAudio.CallingFunctions()"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Dataset_Creating_VITS', Params)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # Tools: VoiceTrainer
-class Execute_Voice_Training_GPTSoVITS(QObject):
+class Execute_Voice_Training_GPTSoVITS(Core_Tool_Executor):
     '''
     Preprocess and then start training
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from GPT_SoVITS.Train import Train; '
-                f'Train{str(Params)}"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Train_GPTSoVITS', Params, UseWorker = False)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
-class Execute_Voice_Training_VITS(QObject):
+class Execute_Voice_Training_VITS(Core_Tool_Executor):
     '''
     Preprocess and then start training
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from VITS.Train import Train; '
-                f'Train{str(Params)}"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Train_VITS', Params, UseWorker = False)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # Tools: VoiceConverter
-class Execute_Voice_Converting_GPTSoVITS(QObject):
+class Execute_Voice_Converting_GPTSoVITS(Core_Tool_Executor):
     '''
     Inference model
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
 
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from GPT_SoVITS.Convert import Convert; '
-                f'Convert{str(Params)}"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Convert_GPTSoVITS', Params)
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 def Get_Speakers(Config_Path_Load):
     try:
@@ -490,18 +599,10 @@ def Get_Speakers(Config_Path_Load):
     except:
         return str()
 
-class Execute_Voice_Converting_VITS(QObject):
+class Execute_Voice_Converting_VITS(Core_Tool_Executor):
     '''
     Inference model
     '''
-    started = Signal()
-    finished = Signal()
-
-    errChk = Signal(str)
-
-    def __init__(self):
-        super().__init__()
-
     @Slot(tuple)
     def Execute(self, Params: tuple):
         self.started.emit()
@@ -514,33 +615,11 @@ class Execute_Voice_Converting_VITS(QObject):
             "日":       "JA",
             "Japanese": "JA"
         }
-        CMD = QFunc.SubprocessManager(CommunicateThroughConsole = True)
-        self.Process = CMD.create(
-            Args = [
-                f'cd "{CoreDir}"',
-                'python -c "'
-                'from VITS.Convert import Convert; '
-                f'Convert{str(QFunc.ItemReplacer(LANGUAGES, Params))}"'
-            ]
-        )
-        Output, Error = CMD.monitor(
-            ShowProgress = True,
-            DecodeResult = True,
-            LogPath = LogPath
-        )[:2]
-        if 'error' in str(Error).lower():
-            Error += "（详情请见终端输出信息）"
-        elif 'traceback' in str(Output).lower():
-            Error = "执行完成，但疑似中途出错\n（详情请见终端输出信息）"
-        else:
-            Error = None
+        Error = self.Run_Core_Tool('Convert_VITS', QFunc.ItemReplacer(LANGUAGES, Params))
         self.errChk.emit(str(Error))
 
         self.finished.emit()
 
-    def Terminate(self):
-        QFunc.ProcessTerminator(self.Process.pid) if hasattr(self, 'Process') else None
-
 
 # ClientFunc: GetModelsInfo
 class CustomSignals_ModelView(QObject):
@@ -880,6 +959,8 @@ class MainWindow(Window_MainWindow):
         self.MonitorUsage.start()
 
     def closeEvent(self, event):
+        Core_Worker.shutdownAll()
+        Job_Scheduler.shutdown()
         FunctionSignals.Signal_ForceQuit.emit()
         FunctionSignals.Signal_TaskStatus.connect(QApplication.instance().exit)
         super().closeEvent(event)
@@ -1263,6 +1344,88 @@ class MainWindow(Window_MainWindow):
         )
         ChildWindow_TTS.exec()
 
+    def enqueueJob(self, Tool: str, Params: tuple, Priority: int = 0):
+        try:
+            Job_Scheduler.enqueue(Tool, Params, Priority)
+        except Exception as e:
+            return MessageBoxBase.pop(self, QMessageBox.Warning, "Failure", f"加入任务队列失败：\n{e}")
+        MessageBoxBase.pop(self, QMessageBox.Information, "Tip", "已加入任务队列")
+
+    def showJobQueue(self):
+        ChildWindow_Queue = Window_ChildWindow_Queue(self)
+
+        ChildWindow_Queue.ui.Button_Close.clicked.connect(ChildWindow_Queue.close)
+        ChildWindow_Queue.ui.Button_Maximize.clicked.connect(lambda: ChildWindow_Queue.showNormal() if ChildWindow_Queue.isMaximized() else ChildWindow_Queue.showMaximized())
+
+        QFunc.Function_SetText(
+            Widget = ChildWindow_Queue.ui.Label_Title,
+            Text = QFunc.SetRichText(
+                Title = QCA.translate('ChildWindow_Queue', "任务队列")
+            )
+        )
+        QFunc.Function_SetText(
+            Widget = ChildWindow_Queue.ui.Label_Text,
+            Text = QFunc.SetRichText(
+                Body = QCA.translate('ChildWindow_Queue', "队列中的任务会按优先级依次执行，并在CPU与内存余量足够时并行\n右键各工具的执行按钮即可将任务加入队列")
+            )
+        )
+
+        StatusTexts = {
+            'Queued': "等待中",
+            'Running': "执行中",
+            'Cancelling': "终止中",
+            'Finished': "已完成",
+            'Failed': "失败",
+            'Cancelled': "已取消"
+        }
+        def Refresh():
+            ChildWindow_Queue.ui.Table_Queue.setValue(
+                [
+                    (
+                        Entry['Id'],
+                        Entry['Job']['Tool'],
+                        Entry['Priority'],
+                        StatusTexts.get(Entry['Status'], Entry['Status']) + (
+                            f" {Entry['Progress']['Done']}/{Entry['Progress']['Total']}" if Entry['Status'] == 'Running' and Entry.get('Progress', {}).get('Total') else ""
+                        ),
+                        f"{Entry['Threads'] if Entry['Threads'] > 0 else '全部'}线程 / {Entry['Memory']}GB",
+                        datetime.fromtimestamp(Entry['Created']).strftime('%Y-%m-%d %H:%M:%S')
+                    ) for Entry in Job_Scheduler.getEntries()
+                ]
+            )
+
+        ChildWindow_Queue.ui.Table_Queue.setHorizontalHeaderLabels(['工具', '优先级', '状态', '资源', '加入时间', '管理'])
+        ChildWindow_Queue.ui.Table_Queue.Remove.connect(
+            lambda Id: MessageBoxBase.pop(self,
+                QMessageBox.Question, "Ask",
+                "确认移除该任务？（执行中的任务将被终止）",
+                QMessageBox.Yes|QMessageBox.No,
+                {
+                    QMessageBox.Yes: lambda: (
+                        Job_Scheduler.remove(Id),
+                        Refresh()
+                    )
+                }
+            )
+        )
+
+        ChildWindow_Queue.ui.Button_Clear.setText(QCA.translate('ChildWindow_Queue', "清除已结束"))
+        ChildWindow_Queue.ui.Button_Clear.clicked.connect(
+            lambda: (
+                Job_Scheduler.clear(),
+                Refresh()
+            )
+        )
+        ChildWindow_Queue.ui.Button_Refresh.setText(QCA.translate('ChildWindow_Queue', "刷新"))
+        ChildWindow_Queue.ui.Button_Refresh.clicked.connect(Refresh)
+
+        Timer = QTimer(ChildWindow_Queue)
+        Timer.timeout.connect(Refresh)
+        Timer.start(3000)
+
+        Refresh()
+        ChildWindow_Queue.exec()
+
     def chkUpdate(self):
         FunctionSignals.Signal_ReadyToUpdate.connect(
             lambda: (
@@ -1300,6 +1463,11 @@ class MainWindow(Window_MainWindow):
         # Logo
         self.setWindowIcon(QIcon(QFunc.NormPath(Path(ResourceDir).joinpath('assets/images/Logo.ico'))))
 
+        # Resume the job queue
+        MainWindowSignals.Signal_MainWindowShown.connect(
+            lambda: Job_Scheduler.start() if any(Entry['Status'] in ('Queued', 'Running') for Entry in Job_Scheduler.getEntries()) else None
+        )
+
         #############################################################
         ########################## TitleBar #########################
         #############################################################
@@ -1946,6 +2114,32 @@ class MainWindow(Window_MainWindow):
             ChildItemText = QCA.translate('MainWindow', "媒体输入目录")
         )
 
+        QFunc.Function_SetText(
+            Widget = self.ui.Label_Process_WorkerCount,
+            Text = QFunc.SetRichText(
+                Body = QCA.translate('MainWindow', "并行进程数\n同时处理不同文件的进程数量，启用降噪时每个进程都会加载一份模型，请留意内存占用。")
+            )
+        )
+        self.ui.SpinBox_Process_WorkerCount.setRange(1, os.cpu_count() or 1)
+        self.ui.SpinBox_Process_WorkerCount.setSingleStep(1)
+        ParamsManager_Process.SetParam(
+            Widget = self.ui.SpinBox_Process_WorkerCount,
+            Section = 'Input Params',
+            Option = 'Worker_Count',
+            DefaultValue = 1
+        )
+        self.ui.Button_Process_WorkerCount_MoreActions.SetMenu(
+            ActionEvents = {
+                "重置": lambda: ParamsManager_Process.ResetParam(self.ui.SpinBox_Process_WorkerCount)
+            }
+        )
+        Function_AddToTreeWidget(
+            Widget = self.ui.Label_Process_WorkerCount,
+            TreeWidget = self.ui.TreeWidget_Catalogue_Process,
+            RootItemText = QCA.translate('MainWindow', "输入参数"),
+            ChildItemText = QCA.translate('MainWindow', "并行进程数")
+        )
+
         self.ui.GroupBox_Process_DenoiserParams.setTitle(QCA.translate('MainWindow', "降噪参数"))
         Function_AddToTreeWidget(
             Widget = self.ui.GroupBox_Process_DenoiserParams,
@@ -2482,7 +2676,8 @@ class MainWindow(Window_MainWindow):
                 self.ui.SpinBox_Process_HopSize,
                 self.ui.SpinBox_Process_SilenceKeptMax,
                 self.ui.LineEdit_Process_OutputRoot,
-                self.ui.LineEdit_Process_OutputDirName
+                self.ui.LineEdit_Process_OutputDirName,
+                self.ui.SpinBox_Process_WorkerCount
             ],
             EmptyAllowed = [
                 self.ui.ComboBox_Process_MediaFormatOutput,
@@ -2494,7 +2689,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Audio_Processing', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
 
         #############################################################
@@ -2919,7 +3116,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Voice_Identifying', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
 
         #############################################################
@@ -3295,7 +3494,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Voice_Transcribing', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
 
         #############################################################
@@ -3605,7 +3806,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Dataset_Creating_GPTSoVITS', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
 
         # VITS - ParamsManager
@@ -4129,7 +4332,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Dataset_Creating_VITS', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
 
         #############################################################
@@ -4646,7 +4851,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Train_GPTSoVITS', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
         FunctionSignals.Signal_TaskStatus.connect(
             lambda Task, Status: MessageBoxBase.pop(self,
@@ -5290,7 +5497,9 @@ class MainWindow(Window_MainWindow):
                     QMessageBox.Information, "Tip",
                     "当前任务已执行结束。"
                 )
-            ]
+            ],
+            QueueMethod = lambda Params, Priority: self.enqueueJob('Train_VITS', Params, Priority),
+            QueueViewer = self.showJobQueue
         )
         FunctionSignals.Signal_TaskStatus.connect(
             lambda Task, Status: MessageBoxBase.pop(self,
@@ -6119,6 +6328,27 @@ class MainWindow(Window_MainWindow):
             TakeEffect = False
         )
 
+        self.ui.Label_Setting_WarmWorker.setText(QCA.translate('MainWindow', "保持工具进程常驻以跳过重复的启动与模型加载"))
+        self.ui.CheckBox_Setting_WarmWorker.setChecked(
+            {
+                'Enabled': True,
+                'Disabled': False
+            }.get(Config.getValue('Tools', 'WarmWorker', 'Enabled'))
+        )
+        Function_ConfigureCheckBox(
+            CheckBox = self.ui.CheckBox_Setting_WarmWorker,
+            CheckedText = "已启用",
+            CheckedEvents = [
+                lambda: Config.editConfig('Tools', 'WarmWorker', 'Enabled')
+            ],
+            UncheckedText = "未启用",
+            UncheckedEvents = [
+                lambda: Config.editConfig('Tools', 'WarmWorker', 'Disabled'),
+                lambda: Core_Worker.shutdownAll()
+            ],
+            TakeEffect = True
+        )
+
         self.ui.GroupBox_Settings_Tools_Path.setTitle(QCA.translate('MainWindow', "路径设置"))
 
         self.ui.Label_Process_OutputRoot.setText(QCA.translate('MainWindow', "音频处理输出目录"))
@@ -483,6 +483,66 @@ class Table_DATResult(TableBase):
                 pass
         return ValueList
 
+class Table_JobQueue(TableBase):
+    '''
+    '''
+    Remove = Signal(str)
+
+    def __init__(self, parent: QWidget = None):
+        super().__init__(parent)
+
+        self.setRowCount(0)
+        self.setColumnCount(0)
+        self.setIndexHeaderVisible(True)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+
+    def setHorizontalHeaderLabels(self, Headers: list):
+        self.HorizontalHeaderLabels = Headers
+        self.ColumnCount = len(Headers)
+
+    def addRow(self, Param: tuple):
+        Id, Tool, Priority, Status, Resources, Created = Param
+
+        RowHeight = 30
+        def SetColumnLayout(ColumnLayout):
+            ColumnLayout.setContentsMargins(0, 0, 0, 0)
+            ColumnLayout.setSpacing(0)
+
+        ColumnLayouts = []
+        for Text in (Tool, Priority, Status, Resources, Created):
+            Label = LabelBase()
+            QFunc.Function_SetText(Label, str(Text))
+            ColumnLayout = QHBoxLayout()
+            SetColumnLayout(ColumnLayout)
+            ColumnLayout.addWidget(Label)
+            ColumnLayouts.append(ColumnLayout)
+
+        RemoveButton = ButtonBase()
+        RemoveButton.setBorderless(True)
+        RemoveButton.setTransparent(True)
+        RemoveButton.setText("-")
+        RemoveButton.setToolTip("移除/终止")
+        RemoveButton.clicked.connect(lambda: self.Remove.emit(Id))
+        ColumnLayout_Management = QHBoxLayout()
+        SetColumnLayout(ColumnLayout_Management)
+        ColumnLayout_Management.addWidget(RemoveButton)
+        ColumnLayouts.append(ColumnLayout_Management)
+
+        super().addRow(
+            ColumnLayouts,
+            [QHeaderView.Stretch, QHeaderView.Interactive, QHeaderView.Interactive, QHeaderView.Interactive, QHeaderView.Stretch, QHeaderView.Fixed],
+            [None, None, None, None, None, RowHeight],
+            RowHeight
+        )
+
+    def setValue(self, Params: list = [['id', 'tool', 'priority', 'status', 'resources', 'created'], ]):
+        self.clearRows()
+        super().setColumnCount(self.columnCount())
+        super().setHorizontalHeaderLabels(self.HorizontalHeaderLabels)
+        for Param in Params:
+            QApplication.processEvents()
+            self.addRow(Param)
+
 ##############################################################################################################################
 
 class Frame_RangeSetting(QFrame):
@@ -11,6 +11,7 @@ from windows.ui.UI_ChildWindow_ASR import Ui_ChildWindow_ASR
 from windows.ui.UI_ChildWindow_DAT import Ui_ChildWindow_DAT
 from windows.ui.UI_ChildWindow_DAT import Ui_ChildWindow_DAT
 from windows.ui.UI_ChildWindow_TTS import Ui_ChildWindow_TTS
+from windows.ui.UI_ChildWindow_Queue import Ui_ChildWindow_Queue
 
 ##############################################################################################################################
 
@@ -73,6 +74,17 @@ class Window_ChildWindow_TTS(ChildWindowBase):
 
         self.setTitleBar(self.ui.TitleBar)
 
+
+class Window_ChildWindow_Queue(ChildWindowBase):
+    ui = Ui_ChildWindow_Queue()
+
+    def __init__(self, parent = None):
+        super().__init__(parent, min_width = 960, min_height = 540)
+
+        self.ui.setupUi(self)
+
+        self.setTitleBar(self.ui.TitleBar)
+
 ##############################################################################################################################
 
 class MessageBox_Stacked(MessageBoxBase):
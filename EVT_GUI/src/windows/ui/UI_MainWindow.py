@@ -1642,6 +1642,63 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_20.addWidget(self.Frame_Process_MediaDirInput)
 
+        self.Frame_Process_WorkerCount = QFrame(self.Frame_Process_InputParams_BasicSettings)
+        self.Frame_Process_WorkerCount.setObjectName(u"Frame_Process_WorkerCount")
+        self.Frame_Process_WorkerCount.setMinimumSize(QSize(0, 105))
+        self.Frame_Process_WorkerCount.setStyleSheet(u"QFrame {\n"
+"	background-color: transparent;\n"
+"	border-width: 0px;\n"
+"	border-style: solid;\n"
+"}\n"
+"QFrame:hover {\n"
+"	background-color: rgba(36, 36, 36, 12);\n"
+"}")
+        self.gridLayout_123 = QGridLayout(self.Frame_Process_WorkerCount)
+        self.gridLayout_123.setSpacing(12)
+        self.gridLayout_123.setObjectName(u"gridLayout_123")
+        self.gridLayout_123.setContentsMargins(21, 12, 21, 12)
+        self.Label_Process_WorkerCount = LabelBase(self.Frame_Process_WorkerCount)
+        self.Label_Process_WorkerCount.setObjectName(u"Label_Process_WorkerCount")
+        sizePolicy5.setHeightForWidth(self.Label_Process_WorkerCount.sizePolicy().hasHeightForWidth())
+        self.Label_Process_WorkerCount.setSizePolicy(sizePolicy5)
+        self.Label_Process_WorkerCount.setStyleSheet(u"QLabel {\n"
+"	/*text-align: center;*/\n"
+"	background-color: transparent;\n"
+"	padding: 0px;\n"
+"	border-width: 0px;\n"
+"	border-radius: 0px;\n"
+"	border-style: solid;\n"
+"}")
+
+        self.gridLayout_123.addWidget(self.Label_Process_WorkerCount, 0, 0, 1, 1)
+
+        self.HorizontalSpacer_Process_WorkerCount = QSpacerItem(445, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+
+        self.gridLayout_123.addItem(self.HorizontalSpacer_Process_WorkerCount, 0, 1, 1, 1)
+
+        self.Button_Process_WorkerCount_MoreActions = MenuButton(self.Frame_Process_WorkerCount)
+        self.Button_Process_WorkerCount_MoreActions.setObjectName(u"Button_Process_WorkerCount_MoreActions")
+        self.Button_Process_WorkerCount_MoreActions.setMinimumSize(QSize(27, 27))
+        self.Button_Process_WorkerCount_MoreActions.setMaximumSize(QSize(27, 27))
+        self.Button_Process_WorkerCount_MoreActions.setStyleSheet(u"QPushButton {\n"
+"	border-width: 1px;\n"
+"	border-style: solid;\n"
+"	border-color: rgb(123, 123, 123);\n"
+"}")
+
+        self.gridLayout_123.addWidget(self.Button_Process_WorkerCount_MoreActions, 0, 2, 1, 1)
+
+        self.SpinBox_Process_WorkerCount = SpinBoxBase(self.Frame_Process_WorkerCount)
+        self.SpinBox_Process_WorkerCount.setObjectName(u"SpinBox_Process_WorkerCount")
+        self.SpinBox_Process_WorkerCount.setMinimumSize(QSize(0, 27))
+        self.SpinBox_Process_WorkerCount.setMinimum(-999999)
+        self.SpinBox_Process_WorkerCount.setMaximum(999999)
+
+        self.gridLayout_123.addWidget(self.SpinBox_Process_WorkerCount, 1, 0, 1, 3)
+
+
+        self.verticalLayout_20.addWidget(self.Frame_Process_WorkerCount)
+
 
         self.verticalLayout_150.addWidget(self.Frame_Process_InputParams_BasicSettings)
 
@@ -9946,6 +10003,78 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_76.addWidget(self.Frame_Setting_Synchronizer)
 
+        self.Frame_Setting_WarmWorker = QFrame(self.GroupBox_Settings_Tools_Function)
+        self.Frame_Setting_WarmWorker.setObjectName(u"Frame_Setting_WarmWorker")
+        self.Frame_Setting_WarmWorker.setMinimumSize(QSize(0, 90))
+        self.Frame_Setting_WarmWorker.setStyleSheet(u"QFrame {\n"
+"	background-color: transparent;\n"
+"	border-width: 0px;\n"
+"	border-style: solid;\n"
+"}\n"
+"QFrame:hover {\n"
+"	background-color: rgba(36, 36, 36, 12);\n"
+"}")
+        self.horizontalLayout_80 = QHBoxLayout(self.Frame_Setting_WarmWorker)
+        self.horizontalLayout_80.setSpacing(12)
+        self.horizontalLayout_80.setObjectName(u"horizontalLayout_80")
+        self.horizontalLayout_80.setContentsMargins(21, 12, 21, 12)
+        self.Label_Setting_WarmWorker = LabelBase(self.Frame_Setting_WarmWorker)
+        self.Label_Setting_WarmWorker.setObjectName(u"Label_Setting_WarmWorker")
+        sizePolicy4.setHeightForWidth(self.Label_Setting_WarmWorker.sizePolicy().hasHeightForWidth())
+        self.Label_Setting_WarmWorker.setSizePolicy(sizePolicy4)
+        self.Label_Setting_WarmWorker.setStyleSheet(u"QLabel {\n"
+"	font-size: 15px;\n"
+"	/*text-align: center;*/\n"
+"	background-color: transparent;\n"
+"	padding: 0px;\n"
+"	border-width: 0px;\n"
+"	border-radius: 0px;\n"
+"	border-style: solid;\n"
+"}")
+
+        self.horizontalLayout_80.addWidget(self.Label_Setting_WarmWorker)
+
+        self.CheckBox_Setting_WarmWorker = QCheckBox(self.Frame_Setting_WarmWorker)
+        self.CheckBox_Setting_WarmWorker.setObjectName(u"CheckBox_Setting_WarmWorker")
+        sizePolicy5.setHeightForWidth(self.CheckBox_Setting_WarmWorker.sizePolicy().hasHeightForWidth())
+        self.CheckBox_Setting_WarmWorker.setSizePolicy(sizePolicy5)
+        self.CheckBox_Setting_WarmWorker.setMinimumSize(QSize(0, 30))
+        self.CheckBox_Setting_WarmWorker.setStyleSheet(u"QCheckBox {\n"
+"	font-size: 15px;\n"
+"	spacing: 12.3px;\n"
+"	background-color: transparent;\n"
+"	padding: 0px;\n"
+"	border-width: 0px;\n"
+"	border-radius: 6px;\n"
+"	border-style: solid;\n"
+"}\n"
+"QCheckBox:hover {\n"
+"}\n"
+"\n"
+"QCheckBox::indicator {\n"
+"	width: 30px;\n"
+"	height: 30px;\n"
+"    background-color: transparent;\n"
+"	padding: 0px;\n"
+"	border-width: 0px;\n"
+"	border-radius: 6px;\n"
+"	border-style: solid;\n"
+"}\n"
+"QCheckBox::indicator:hover {\n"
+"	background-color: rgba(255, 255, 255, 21);\n"
+"}\n"
+"QCheckBox::indicator:unchecked {\n"
+"	border-image: url(:/CheckBox_Icon/images/icons/ToggleOff.png);\n"
+"}\n"
+"QCheckBox::indicator:checked {\n"
+"	border-image: url(:/CheckBox_Icon/images/icons/ToggleOn.png);\n"
+"}")
+
+        self.horizontalLayout_80.addWidget(self.CheckBox_Setting_WarmWorker)
+
+
+        self.verticalLayout_76.addWidget(self.Frame_Setting_WarmWorker)
+
 
         self.verticalLayout_34.addWidget(self.GroupBox_Settings_Tools_Function)
 
@@ -10927,6 +11056,7 @@ class Ui_MainWindow(object):
 
         self.GroupBox_Process_InputParams.setTitle(QCoreApplication.translate("MainWindow", u"GroupBox1", None))
         self.Label_Process_MediaDirInput.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
+        self.Label_Process_WorkerCount.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.GroupBox_Process_DenoiserParams.setTitle(QCoreApplication.translate("MainWindow", u"GroupBox2", None))
         self.Label_Process_DenoiseAudio.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.CheckBox_Process_DenoiseAudio.setText(QCoreApplication.translate("MainWindow", u"CheckBox", None))
@@ -11171,6 +11301,8 @@ class Ui_MainWindow(object):
         self.CheckBox_Setting_AutoReset.setText(QCoreApplication.translate("MainWindow", u"CheckBox", None))
         self.Label_Setting_Synchronizer.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.CheckBox_Setting_Synchronizer.setText(QCoreApplication.translate("MainWindow", u"CheckBox", None))
+        self.Label_Setting_WarmWorker.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
+        self.CheckBox_Setting_WarmWorker.setText(QCoreApplication.translate("MainWindow", u"CheckBox", None))
         self.GroupBox_Settings_Tools_Path.setTitle(QCoreApplication.translate("MainWindow", u"GroupBox", None))
         self.Label_Process_OutputRoot.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.Label_VPR_TDNN_OutputRoot.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))